@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'leads',
     'lead_enquiries',
     'accounts',
+    'api',
     'crispy_forms',
     'crispy_bootstrap5',
     'widget_tweaks',
@@ -93,6 +94,18 @@ DATABASES = {
 }
 
 
+# 快取 (main/caching.py)
+# 資料版本號必須所有程序共用，某個 worker 寫入後其他 worker 才會知道快取失效，不能用預設的 LocMemCache (每個程序各自一份)
+# 預設放在資料庫 (migration 會建立資料表，不用另外架設服務)；有 Redis 時可在 local_settings.py 改用
+# django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'bwp_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -130,6 +143,32 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 上傳時一邊接收一邊計算SHA-256，附件依內容去重存放
+FILE_UPLOAD_HANDLERS = [
+    'lead_enquiries.uploadhandlers.HashingMemoryFileUploadHandler',
+    'lead_enquiries.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# 附件下載交給前端代理伺服器傳檔，Python只負責驗證權限
+# None: 由Django串流傳送 / 'x-accel-redirect': nginx / 'x-sendfile': Apache mod_xsendfile
+ATTACHMENT_SENDFILE_BACKEND = None
+# nginx 設定成 internal 的 location，例如 location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+ATTACHMENT_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# 通知信 (notifications.py)，開發時直接印在 console
+DEFAULT_FROM_EMAIL = 'BWP Lead Management <noreply@localhost>'
+if DEBUG:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# 異動資料流 (main/changes.py) 只讀到幾秒前的資料，避免漏掉寫入中還沒 commit 的交易
+CHANGE_FEED_LAG_SECONDS = 5
+
+# 銷售分析 cube (main/analytics.py)，資料異動後等幾秒再在背景重算，這段時間內的異動一起算
+SALES_CUBE_REFRESH_DELAY = 30
+
+# 操作紀錄即時推送 (main/activity.py)，每個程序每隔幾秒查一次其他程序寫入的操作紀錄
+ACTIVITY_POLL_INTERVAL = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -17,8 +17,6 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
-from django.conf.urls.static import static
-from django.conf import settings
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,7 +24,6 @@ urlpatterns = [
     path('leads/',include('leads.urls')),
     path('accounts/',include('accounts.urls')),
     path('lead_enquiries/',include('lead_enquiries.urls')),
+    path('api/',include('api.urls')),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# 附件不再以MEDIA_URL公開，改由 lead_enquiries 的下載view驗證權限後傳送
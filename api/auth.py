@@ -0,0 +1,36 @@
+# api/auth.py
+# API 的登入驗證：瀏覽器用原本的 session，排程程式 (資料倉儲同步等) 用 HTTP Basic 帶帳號密碼
+# 未登入回傳 401 JSON，不轉到登入頁
+
+import base64
+import binascii
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.http import JsonResponse
+
+
+def _basic_auth_user(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, credentials = header.partition(' ')
+    if scheme.lower() != 'basic' or not credentials:
+        return None
+    try:
+        username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+def api_login_required(view_func):
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            user = _basic_auth_user(request)
+            if user is None or not user.is_active:
+                response = JsonResponse({'error': '需要登入'}, status=401)
+                response['WWW-Authenticate'] = 'Basic realm="api"'
+                return response
+            request.user = user
+        return view_func(request, *args, **kwargs)
+    return wrapper
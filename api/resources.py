@@ -0,0 +1,211 @@
+# api/resources.py
+# 唯讀 API 的資源定義和查詢
+# 每種資源對應一個 model：對外的欄位名稱 → ORM 路徑 (可跨 FK)，查詢一律用 values() 只讀出要求的欄位，不建立 model 物件
+# fields= 指定要哪些欄位，ids= 一個 IN 查詢取回多筆，include= 的子資料每種一個 IN 查詢，不會每筆各查一次
+# 列表的篩選條件沿用網頁列表的 _get_filtered_*_queryset，分頁改用主鍵的 cursor (keyset)，翻到後面也不會變慢
+
+import base64
+import binascii
+import json
+
+from lead_enquiries.models import Enquiry, EnquiryItem
+from lead_enquiries.views import _get_filtered_enquiries_queryset
+from leads.models import PotentialCustomer, Contacts
+from leads.views import _get_filtered_customers_queryset
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+MAX_IDS = 500
+
+
+class ApiError(Exception):
+    pass
+
+
+class Resource:
+    def __init__(self, name, fields, default_fields, base, list_filter=None, parent_filters=None, includes=None,
+                 depends_on=()):
+        self.name = name
+        self.fields = fields # 對外欄位名稱: ORM 路徑
+        self.default_fields = default_fields
+        self.base = base # base()，所有未刪除的資料 (include 時用)
+        self.list_filter = list_filter # list_filter(request)，套用列表的篩選條件，沒有時用 base()
+        self.parent_filters = parent_filters or {} # GET 參數: ORM 路徑，例如 ?customer=3
+        self.includes = includes or {} # include 名稱: (子資源, 子資源指向這個資源的 ORM 路徑)
+        self.depends_on = depends_on # 欄位透過外鍵讀取的其他 model (ETag 要一起看它們有沒有異動)
+
+    # fields 參數轉成欄位列表，id 一定會回傳
+    def parse_fields(self, value):
+        if not value:
+            return self.default_fields
+        names = ['id'] + [name.strip() for name in value.split(',') if name.strip() and name.strip() != 'id']
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"{self.name} 沒有欄位 {', '.join(unknown)}")
+        return names
+
+    def parse_includes(self, value):
+        names = [name.strip() for name in (value or '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.includes]
+        if unknown:
+            raise ApiError(f"{self.name} 不能 include {', '.join(unknown)}")
+        return names
+
+    def filtered(self, request):
+        queryset = self.list_filter(request) if self.list_filter else self.base()
+        for param, path in self.parent_filters.items():
+            value = request.GET.get(param)
+            if value:
+                queryset = queryset.filter(**{path: _parse_int(value, param)})
+        return queryset
+
+    # values() 讀出指定欄位，extra 是內部要用但不一定回傳的路徑 (例如分組用的外鍵)
+    def values(self, queryset, names, extra=(), limit=None):
+        paths = [self.fields[name] for name in names]
+        rows = queryset.values(*dict.fromkeys(paths + list(extra)))
+        if limit is not None:
+            rows = rows[:limit]
+        return [({name: row[self.fields[name]] for name in names}, row) for row in rows]
+
+
+def _parse_int(value, param):
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'{param} 必須是整數')
+
+
+def parse_ids(value):
+    ids = [_parse_int(pk.strip(), 'ids') for pk in value.split(',') if pk.strip()]
+    if len(ids) > MAX_IDS:
+        raise ApiError(f'ids 一次最多 {MAX_IDS} 筆')
+    return ids
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    limit = _parse_int(value, 'limit')
+    if limit <= 0:
+        raise ApiError('limit 必須是正整數')
+    return min(limit, MAX_LIMIT)
+
+
+def encode_cursor(last_pk):
+    return base64.urlsafe_b64encode(json.dumps({'after': last_pk}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['after'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise ApiError('cursor 格式錯誤')
+
+
+ITEMS = Resource(
+    'items',
+    fields={
+        'id': 'pk', 'enquiry': 'enquiry_id', 'product': 'product_id', 'item_name': 'item_name',
+        'item_spec': 'item_spec', 'material': 'material', 'unit_price': 'unit_price', 'exchange_rate': 'exchange_rate',
+        'quantity': 'quantity', 'cost': 'cost', 'cost_rate': 'cost_rate', 'supplier': 'supplier', 'note': 'note',
+        'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'enquiry', 'item_name', 'item_spec', 'material', 'unit_price', 'exchange_rate', 'quantity'],
+    base=lambda: EnquiryItem.objects.filter(enquiry__deleted_at__isnull=True),
+    parent_filters={'enquiry': 'enquiry_id'},
+)
+
+ENQUIRIES = Resource(
+    'enquiries',
+    fields={
+        'id': 'pk', 'bwp_no': 'bwp_no', 'customer': 'potential_customer_id',
+        'customer_name': 'potential_customer__company_name', 'enquiry_no': 'enquiry_no', 'status': 'status',
+        'is_pinned': 'is_pinned', 'created_by': 'created_by__username', 'created_at': 'created_at',
+        'updated_at': 'updated_at', 'next_followup_due': 'next_followup_due',
+    },
+    default_fields=['id', 'bwp_no', 'customer', 'customer_name', 'enquiry_no', 'status', 'created_by', 'created_at'],
+    base=lambda: Enquiry.objects.all(),
+    list_filter=_get_filtered_enquiries_queryset,
+    parent_filters={'customer': 'potential_customer_id'},
+    includes={'items': (ITEMS, 'enquiry_id')},
+    depends_on=(PotentialCustomer,),
+)
+
+CONTACTS = Resource(
+    'contacts',
+    fields={
+        'id': 'pk', 'customer': 'potential_customer_id', 'name': 'name', 'position': 'position', 'phone': 'phone',
+        'email': 'email', 'notes': 'notes', 'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'customer', 'name', 'position', 'phone', 'email'],
+    base=lambda: Contacts.objects.filter(potential_customer__deleted_at__isnull=True),
+    parent_filters={'customer': 'potential_customer_id'},
+)
+
+CUSTOMERS = Resource(
+    'customers',
+    fields={
+        'id': 'pk', 'company_name': 'company_name', 'country': 'country', 'address': 'address', 'phone': 'phone',
+        'email': 'email', 'website': 'website', 'currency': 'currency', 'status': 'status',
+        'company_type': 'company_type', 'industries': 'industries', 'required_products': 'required_products',
+        'rank': 'rank', 'source': 'source', 'sales_incharge': 'sales_incharge__username',
+        'is_visitable': 'is_visitable', 'is_pinned': 'is_pinned', 'notes': 'notes', 'created_at': 'created_at',
+        'updated_at': 'updated_at', 'last_contacted_at': 'last_contacted_at',
+    },
+    default_fields=['id', 'company_name', 'country', 'status', 'rank', 'sales_incharge', 'last_contacted_at'],
+    base=lambda: PotentialCustomer.objects.all(),
+    list_filter=_get_filtered_customers_queryset,
+    includes={'contacts': (CONTACTS, 'potential_customer_id'), 'enquiries': (ENQUIRIES, 'potential_customer_id')},
+)
+
+RESOURCES = {resource.name: resource for resource in (CUSTOMERS, CONTACTS, ENQUIRIES, ITEMS)}
+
+
+# 回應內容用到的 model：資源本身、外鍵讀取的 model、要求 include 的子資源
+def source_models(resource, include_param):
+    models = [resource.base().model, *resource.depends_on]
+    for name in (include_param or '').split(','):
+        if name.strip() in resource.includes:
+            models.append(resource.includes[name.strip()][0].base().model)
+    return list(dict.fromkeys(models))
+
+
+# 一次讀出所有父資料的子資料 (每種 include 一個 IN 查詢)，依外鍵分組放進父資料
+def _attach_includes(resource, objects, includes):
+    parent_ids = [obj['id'] for obj in objects]
+    for name, names in includes.items():
+        child, fk_path = resource.includes[name]
+        grouped = {pk: [] for pk in parent_ids}
+        rows = child.values(child.base().filter(**{f'{fk_path}__in': parent_ids}).order_by('pk'), names,
+                            extra=[fk_path])
+        for data, row in rows:
+            grouped[row[fk_path]].append(data)
+        for obj in objects:
+            obj[name] = grouped[obj['id']]
+
+
+# 讀出一頁資料，回傳 (資料列表, 下一頁的 cursor)
+# 有 ids 時只取回這些編號 (不分頁)；否則依主鍵往後讀 limit 筆
+def fetch(resource, request, ids=None):
+    names = resource.parse_fields(request.GET.get('fields'))
+    # 子資料用 fields[<include 名稱>]= 指定欄位
+    includes = {name: resource.includes[name][0].parse_fields(request.GET.get(f'fields[{name}]'))
+                for name in resource.parse_includes(request.GET.get('include'))}
+    queryset = resource.filtered(request).order_by('pk')
+    next_cursor = None
+    if ids is not None:
+        objects = [data for data, _ in resource.values(queryset.filter(pk__in=ids), names)]
+    else:
+        limit = parse_limit(request.GET.get('limit'))
+        after = decode_cursor(request.GET.get('cursor'))
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        objects = [data for data, _ in resource.values(queryset, names, limit=limit + 1)]
+        if len(objects) > limit:
+            objects = objects[:limit]
+            next_cursor = encode_cursor(objects[-1]['id'])
+    if objects and includes:
+        _attach_includes(resource, objects, includes)
+    return objects, next_cursor
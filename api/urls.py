@@ -0,0 +1,19 @@
+# api/urls.py
+
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('changes/<str:feed>/', views.changes, name='changes'),
+    # 唯讀 API，之後格式有不相容的修改時另開 v2
+    path('v1/customers/', views.resource_list, {'resource': 'customers'}, name='v1_customers'),
+    path('v1/customers/<int:pk>/', views.resource_detail, {'resource': 'customers'}, name='v1_customer'),
+    path('v1/contacts/', views.resource_list, {'resource': 'contacts'}, name='v1_contacts'),
+    path('v1/contacts/<int:pk>/', views.resource_detail, {'resource': 'contacts'}, name='v1_contact'),
+    path('v1/enquiries/', views.resource_list, {'resource': 'enquiries'}, name='v1_enquiries'),
+    path('v1/enquiries/<int:pk>/', views.resource_detail, {'resource': 'enquiries'}, name='v1_enquiry'),
+    path('v1/items/', views.resource_list, {'resource': 'items'}, name='v1_items'),
+    path('v1/items/<int:pk>/', views.resource_detail, {'resource': 'items'}, name='v1_item'),
+]
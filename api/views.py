@@ -0,0 +1,117 @@
+# api/views.py
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import etag, require_GET
+
+from main.caching import get_data_version, LEADS_SCOPE, ENQUIRIES_SCOPE
+from main.changes import FEEDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorError, decode_cursor, dumps, read_changes
+from .auth import api_login_required
+from .resources import RESOURCES, ApiError, fetch, parse_ids, source_models
+
+NDJSON_DEFAULT_ROWS = 50000
+
+
+def _positive_int(value, default, maximum):
+    try:
+        value = int(value) if value else default
+    except ValueError:
+        return None
+    return min(value, maximum) if value > 0 else None
+
+
+# 一頁一頁讀出異動，每筆一行 JSON，最後一行是下一次要帶的 cursor
+def _iter_ndjson(feed, cursor, max_rows):
+    sent = 0
+    while True:
+        changes, cursor, has_more = read_changes(feed, cursor, min(DEFAULT_PAGE_SIZE, max_rows - sent))
+        for change in changes:
+            yield dumps(change) + '\n'
+        sent += len(changes)
+        if not has_more or sent >= max_rows:
+            break
+    yield dumps({'next_cursor': cursor, 'has_more': has_more}) + '\n'
+
+
+# 異動資料流 - cursor 之後新增、修改、刪除的資料 (見main/changes.py)
+# ?cursor= 上一次回傳的 next_cursor，不帶從頭讀起
+# ?format=json (預設) 回傳一頁，limit 為每頁筆數；format=ndjson 連續輸出多頁，limit 為最多筆數
+@require_GET
+@api_login_required
+def changes(request, feed):
+    if feed not in FEEDS:
+        raise Http404
+    cursor = request.GET.get('cursor', '')
+    try:
+        decode_cursor(cursor)
+    except CursorError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if request.GET.get('format') == 'ndjson':
+        max_rows = _positive_int(request.GET.get('limit'), NDJSON_DEFAULT_ROWS, NDJSON_DEFAULT_ROWS)
+        if max_rows is None:
+            return JsonResponse({'error': 'limit 必須是正整數'}, status=400)
+        response = StreamingHttpResponse(_iter_ndjson(feed, cursor, max_rows), content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    limit = _positive_int(request.GET.get('limit'), DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    if limit is None:
+        return JsonResponse({'error': 'limit 必須是正整數'}, status=400)
+    rows, next_cursor, has_more = read_changes(feed, cursor, limit)
+    response = JsonResponse({'feed': feed, 'changes': rows, 'next_cursor': next_cursor, 'has_more': has_more},
+                            json_dumps_params={'ensure_ascii': False})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+# ETag 由相關資料表的 (筆數, 最後更新時間)、資料版本號和網址組成，資料沒有異動時不用讀出資料就能回 304
+# 資料表的狀態直接查資料庫，任何程序寫入都看得到；資料版本號補上不會更新 updated_at 的衍生欄位 (下次追蹤日、最後聯絡時間)
+def _resource_etag(request, resource, *args, **kwargs):
+    stamps = [tuple(model._base_manager.aggregate(Count('pk'), Max('updated_at')).values())
+              for model in source_models(RESOURCES[resource], request.GET.get('include'))]
+    key = f'v1:{stamps}:{get_data_version(LEADS_SCOPE)}:{get_data_version(ENQUIRIES_SCOPE)}:{request.get_full_path()}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _json(data, status=200):
+    response = JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# 唯讀 API 列表 (見resources.py)
+# ?fields=id,company_name 指定欄位，?include=contacts 一起帶出子資料，?fields[contacts]=name 指定子資料欄位
+# ?ids=1,2,3 一次取回多筆；否則依編號分頁，?cursor= 帶上一頁回傳的 next_cursor
+# 篩選條件和網頁列表相同 (q、status、owner...)，另外可用 ?customer=、?enquiry= 篩選子資料
+@require_GET
+@api_login_required
+@etag(_resource_etag)
+def resource_list(request, resource):
+    resource = RESOURCES[resource]
+    try:
+        if 'ids' in request.GET:
+            ids = parse_ids(request.GET['ids'])
+            objects, _ = fetch(resource, request, ids=ids)
+            found = {obj['id'] for obj in objects}
+            return _json({'data': objects, 'missing': [pk for pk in ids if pk not in found]})
+        objects, next_cursor = fetch(resource, request)
+    except ApiError as e:
+        return _json({'error': str(e)}, status=400)
+    return _json({'data': objects, 'next_cursor': next_cursor, 'has_more': next_cursor is not None})
+
+
+# 唯讀 API 單筆資料，同樣支援 fields、include
+@require_GET
+@api_login_required
+@etag(_resource_etag)
+def resource_detail(request, resource, pk):
+    try:
+        objects, _ = fetch(RESOURCES[resource], request, ids=[pk])
+    except ApiError as e:
+        return _json({'error': str(e)}, status=400)
+    if not objects:
+        return _json({'error': '找不到資料'}, status=404)
+    return _json({'data': objects[0]})
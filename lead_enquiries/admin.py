@@ -15,3 +15,22 @@ class EnquiryAdmin(admin.ModelAdmin):
     model = Enquiry
     list_display = ('bwp_no','potential_customer','status')
     inlines = [EnquiryItemInline,EnquiryTrackInline]
+
+# 產品目錄，品項存檔時自動建立
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'spec', 'material', 'created_at')
+    search_fields = ('name', 'spec', 'material')
+    readonly_fields = ('lookup_key',)
+
+# 匯率表，新增匯率後可執行 revalue_enquiries 重估進行中的報價單
+@admin.register(CurrencyRate)
+class CurrencyRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'rate', 'effective_date', 'created_at')
+    list_filter = ('currency',)
+    date_hierarchy = 'effective_date'
+
+# 報價單號計數器，需要時可調整下一個流水號 (已被用掉的號碼發號時會自動跳過)
+@admin.register(BwpNumberCounter)
+class BwpNumberCounterAdmin(admin.ModelAdmin):
+    list_display = ('year', 'next_value')
@@ -0,0 +1,265 @@
+# lead_enquiries/archive.py
+# 冷資料封存
+# 拒絕往來的客戶、已失去的報價單，超過 N 個月沒有任何動靜，就連同子資料搬到封存資料表
+# 一般列表、統計、索引都不用再掃過這些資料；列表勾選「包含已封存」時才查封存表，也可以一鍵還原
+# 資料用 Django serializer 轉成 JSON 存放，還原時用 raw save 寫回，主鍵、建立時間等都維持原值
+
+import json
+
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Prefetch, Q
+from django.utils import timezone
+
+from leads.models import PotentialCustomer, Contacts, ContactLogs, ArchivedCustomer
+from leads.scoring import mark_for_rescore
+from main.analytics import mark_customers_dirty, mark_enquiries_dirty
+from main.caching import bump_data_version, LEADS_SCOPE, ENQUIRIES_SCOPE
+from .models import Enquiry, EnquiryItem, EnquiryTrack, EnquiryAttachment, ArchivedEnquiry
+from .purge import purge_enquiry, raw_delete_in_chunks
+
+ARCHIVE_BATCH_SIZE = 100
+CUSTOMER_ARCHIVE_STATUS = 'refused'
+ENQUIRY_ARCHIVE_STATUS = 'lost'
+
+
+class ArchiveConflict(Exception):
+    pass
+
+
+# N 個月前的同一天 (月底超出時取該月最後一天)
+def months_ago(months, now=None):
+    now = now or timezone.now()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    month += 1
+    day = now.day
+    while True:
+        try:
+            return now.replace(year=year, month=month, day=day)
+        except ValueError:
+            day -= 1
+
+
+def _inactive(field, cutoff):
+    return Q(**{f'{field}__isnull': True}) | Q(**{f'{field}__lt': cutoff})
+
+
+# 拒絕往來，且客戶資料、聯絡紀錄、報價單在 cutoff 之後都沒有異動的客戶
+def _inactive_customers(cutoff):
+    return PotentialCustomer.objects.filter(status=CUSTOMER_ARCHIVE_STATUS, updated_at__lt=cutoff).annotate(
+        last_log_at=Max('logs__created_at'),
+        last_enquiry_at=Max('enquiries__updated_at'),
+    ).filter(_inactive('last_log_at', cutoff), _inactive('last_enquiry_at', cutoff))
+
+
+# 客戶還有不是已失去的報價單 (成交、進行中)
+# 這種客戶不封存：報價單會跟著客戶搬出，歷史成交金額就會從銷售分析、排行榜、評分、匯出裡消失
+def _has_kept_enquiries():
+    return Exists(Enquiry.objects.filter(potential_customer=OuterRef('pk')).exclude(status=ENQUIRY_ARCHIVE_STATUS))
+
+
+# 可封存的客戶：沒有動靜的拒絕往來客戶，且底下的報價單都已失去
+def archivable_customers(cutoff):
+    return _inactive_customers(cutoff).filter(~_has_kept_enquiries())
+
+
+# 沒有動靜的拒絕往來客戶中，因為還有成交或進行中的報價單而保留的 (封存指令顯示用)
+def retained_customers(cutoff):
+    return _inactive_customers(cutoff).filter(_has_kept_enquiries())
+
+
+# 可封存的報價單：已失去，且報價單、追蹤紀錄在 cutoff 之後都沒有異動
+def archivable_enquiries(cutoff):
+    return Enquiry.objects.filter(status=ENQUIRY_ARCHIVE_STATUS, updated_at__lt=cutoff).annotate(
+        last_track_at=Max('tracks__created_at'),
+    ).filter(_inactive('last_track_at', cutoff))
+
+
+def _serialize(objects):
+    return json.loads(serializers.serialize('json', objects))
+
+
+def _latest(*values):
+    return max(value for value in values if value is not None)
+
+
+def _build_archived_enquiry(enquiry, archived_customer=None):
+    items = list(enquiry.items.all())
+    tracks = list(enquiry.tracks.all())
+    attachments = list(enquiry.attachments.all())
+    return ArchivedEnquiry(
+        original_pk=enquiry.pk,
+        bwp_no=enquiry.bwp_no,
+        customer_pk=enquiry.potential_customer_id,
+        company_name=enquiry.potential_customer.company_name,
+        status=enquiry.status,
+        created_by_id=enquiry.created_by_id,
+        archived_customer=archived_customer,
+        last_activity_at=_latest(enquiry.updated_at, *(track.created_at for track in tracks)),
+        payload={
+            'enquiry': _serialize([enquiry])[0],
+            'items': _serialize(items),
+            'tracks': _serialize(tracks),
+            'attachments': _serialize(attachments),
+        },
+        attachment_files=[attachment.file.name for attachment in attachments if attachment.file],
+    )
+
+
+# 刪除報價單和子資料，附件只刪紀錄，實體檔案和引用次數保留給封存資料
+def _delete_enquiry_rows(enquiry_ids):
+    raw_delete_in_chunks(EnquiryItem.objects.filter(enquiry_id__in=enquiry_ids))
+    raw_delete_in_chunks(EnquiryTrack.objects.filter(enquiry_id__in=enquiry_ids))
+    raw_delete_in_chunks(EnquiryAttachment.objects.filter(enquiry_id__in=enquiry_ids))
+    raw_delete_in_chunks(Enquiry.all_objects.filter(pk__in=enquiry_ids))
+
+
+def _enquiry_prefetch():
+    return Enquiry.objects.select_related('potential_customer').prefetch_related('items', 'tracks', 'attachments')
+
+
+# 封存一批客戶 (含聯絡人、聯絡紀錄、所有報價單，報價單都是已失去的)，整批一個交易
+def _archive_customer_batch(customer_ids):
+    # 客戶底下已標記刪除、還沒清掉的報價單先清除
+    for enquiry_pk in Enquiry.all_objects.filter(potential_customer_id__in=customer_ids, deleted_at__isnull=False) \
+            .values_list('pk', flat=True):
+        purge_enquiry(enquiry_pk)
+
+    with transaction.atomic():
+        mark_customers_dirty(customer_ids)
+        customers = list(PotentialCustomer.objects.filter(pk__in=customer_ids).prefetch_related(
+            'contacts', 'logs', Prefetch('enquiries', queryset=_enquiry_prefetch())))
+        archived_customers = []
+        archived_enquiries = []
+        for customer in customers:
+            contacts = list(customer.contacts.all())
+            logs = list(customer.logs.all())
+            enquiries = list(customer.enquiries.all())
+            archived = ArchivedCustomer(
+                original_pk=customer.pk,
+                company_name=customer.company_name,
+                country=customer.country,
+                status=customer.status,
+                sales_incharge_id=customer.sales_incharge_id,
+                last_activity_at=_latest(customer.updated_at, *(log.created_at for log in logs),
+                                         *(enquiry.updated_at for enquiry in enquiries)),
+                payload={
+                    'customer': _serialize([customer])[0],
+                    'contacts': _serialize(contacts),
+                    'logs': _serialize(logs),
+                },
+            )
+            archived_customers.append(archived)
+            archived_enquiries.extend(_build_archived_enquiry(enquiry, archived) for enquiry in enquiries)
+
+        ArchivedCustomer.objects.bulk_create(archived_customers)
+        ArchivedEnquiry.objects.bulk_create(archived_enquiries)
+
+        _delete_enquiry_rows([archived.original_pk for archived in archived_enquiries])
+        raw_delete_in_chunks(ContactLogs.objects.filter(potential_customer_id__in=customer_ids))
+        ContactLogs.objects.filter(contact__potential_customer_id__in=customer_ids).update(contact=None,
+                                                                                           updated_at=timezone.now())
+        raw_delete_in_chunks(Contacts.objects.filter(potential_customer_id__in=customer_ids))
+        raw_delete_in_chunks(PotentialCustomer.all_objects.filter(pk__in=customer_ids))
+    return len(archived_customers), len(archived_enquiries)
+
+
+# 封存一批報價單 (含品項、追蹤、附件紀錄)
+def _archive_enquiry_batch(enquiry_ids):
+    with transaction.atomic():
+        mark_enquiries_dirty(enquiry_ids)
+        enquiries = list(_enquiry_prefetch().filter(pk__in=enquiry_ids))
+        ArchivedEnquiry.objects.bulk_create([_build_archived_enquiry(enquiry) for enquiry in enquiries])
+        _delete_enquiry_rows([enquiry.pk for enquiry in enquiries])
+        mark_for_rescore({enquiry.potential_customer_id for enquiry in enquiries})
+    return len(enquiries)
+
+
+# 封存超過 months 個月沒有動靜的客戶和報價單，每批 batch_size 筆一個交易
+# 回傳 (客戶數, 報價單數)，dry_run 時只計算不搬移
+def archive_inactive(months, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    cutoff = months_ago(months)
+    customers = archivable_customers(cutoff)
+    enquiries = archivable_enquiries(cutoff)
+    if dry_run:
+        customer_ids = customers.values('pk')
+        enquiry_count = Enquiry.objects.filter(Q(potential_customer__in=customer_ids) | Q(pk__in=enquiries.values('pk'))).count()
+        return customers.count(), enquiry_count
+
+    customer_count = enquiry_count = 0
+    while True:
+        ids = list(customers.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        archived_customers, archived_enquiries = _archive_customer_batch(ids)
+        customer_count += archived_customers
+        enquiry_count += archived_enquiries
+    while True:
+        ids = list(enquiries.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        enquiry_count += _archive_enquiry_batch(ids)
+
+    if customer_count or enquiry_count:
+        bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    return customer_count, enquiry_count
+
+
+# 用 raw save 寫回，不會重新計算 auto_now 等欄位
+# 只有 updated_at 改成還原的時間，異動資料流 (main/changes.py) 才會再送出這些資料；加欄位前封存的資料也沒有這個欄位
+def _restore_records(records):
+    now = timezone.now()
+    for deserialized in serializers.deserialize('python', records):
+        if any(field.name == 'updated_at' for field in deserialized.object._meta.fields):
+            deserialized.object.updated_at = now
+        deserialized.save()
+
+
+def _restore_enquiry_payload(archived):
+    payload = archived.payload
+    _restore_records([payload['enquiry']])
+    _restore_records(payload['items'])
+    _restore_records(payload['tracks'])
+    _restore_records(payload['attachments'])
+
+
+def _check_bwp_no_free(bwp_nos):
+    taken = list(Enquiry.all_objects.filter(bwp_no__in=bwp_nos).values_list('bwp_no', flat=True))
+    if taken:
+        raise ArchiveConflict(f"報價單號 {', '.join(taken)} 已被使用，無法還原")
+
+
+# 還原封存的客戶，連同一起封存的報價單
+def restore_customer(archived):
+    with transaction.atomic():
+        if PotentialCustomer.all_objects.filter(pk=archived.original_pk).exists():
+            raise ArchiveConflict(f'客戶編號 {archived.original_pk} 已存在，無法還原')
+        archived_enquiries = list(archived.enquiries.all())
+        _check_bwp_no_free([archived_enquiry.bwp_no for archived_enquiry in archived_enquiries])
+
+        payload = archived.payload
+        _restore_records([payload['customer']])
+        _restore_records(payload['contacts'])
+        _restore_records(payload['logs'])
+        for archived_enquiry in archived_enquiries:
+            _restore_enquiry_payload(archived_enquiry)
+        # 封存的報價單會跟著 CASCADE 刪除
+        archived.delete()
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    return PotentialCustomer.objects.get(pk=archived.original_pk)
+
+
+# 還原單獨封存的報價單，客戶需仍然存在
+def restore_enquiry(archived):
+    if archived.archived_customer_id:
+        raise ArchiveConflict(f'報價單 {archived.bwp_no} 是隨客戶一起封存的，請還原客戶「{archived.company_name}」')
+    with transaction.atomic():
+        if not PotentialCustomer.objects.filter(pk=archived.customer_pk).exists():
+            raise ArchiveConflict(f'客戶「{archived.company_name}」已不存在，無法還原')
+        if Enquiry.all_objects.filter(pk=archived.original_pk).exists():
+            raise ArchiveConflict(f'報價單編號 {archived.original_pk} 已存在，無法還原')
+        _check_bwp_no_free([archived.bwp_no])
+        _restore_enquiry_payload(archived)
+        archived.delete()
+    bump_data_version(ENQUIRIES_SCOPE)
+    return Enquiry.objects.get(pk=archived.original_pk)
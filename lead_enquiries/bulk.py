@@ -0,0 +1,73 @@
+# lead_enquiries/bulk.py
+# 報價單列表的批次操作 (修改狀態、重點追蹤、刪除)
+# 勾選的報價單或符合目前篩選條件的全部報價單，分批用 UPDATE ... WHERE id IN (...) 寫入 (見main/bulk.py)
+# 權限和單筆操作相同：重點追蹤所有人都能改，其他操作只處理自己建立的報價單，其餘略過
+# .update() 不會觸發signal，要自己讓快取失效、標記銷售分析要重算、記錄狀態變更、重算下次追蹤日
+
+from django.contrib.admin.models import CHANGE, DELETION
+from django.db import transaction
+from django.utils import timezone
+
+from main.analytics import mark_enquiries_dirty
+from main.bulk import BULK_CHUNK_SIZE, chunked_ids, log_bulk_action
+from main.caching import bump_data_version, ENQUIRIES_SCOPE
+from main.inline_edit import PatchError, clean_value
+from main.transitions import record_transitions, ENQUIRY
+from .followup import refresh_followup
+from .models import Enquiry, STATUS_CHOICES
+from .purge import tombstone_enquiries
+
+BULK_ACTIONS = {
+    'status': '修改狀態',
+    'pin': '重點追蹤',
+    'unpin': '取消重點追蹤',
+    'delete': '刪除',
+}
+OPEN_ACTIONS = {'pin', 'unpin'}
+
+
+# 對 queryset 裡的報價單執行批次操作，回傳 (處理筆數, 沒有權限略過的筆數)
+def apply_bulk_action(queryset, action, value, user, chunk_size=BULK_CHUNK_SIZE):
+    if action not in BULK_ACTIONS:
+        raise PatchError(f'不支援的批次操作 {action}')
+    if action == 'status':
+        value = clean_value(Enquiry, 'status', value)
+        change_message = f'批次修改狀態為「{dict(STATUS_CHOICES)[value]}」'
+        changes = {'status': value}
+    elif action in OPEN_ACTIONS:
+        change_message = f'批次{BULK_ACTIONS[action]}報價單'
+        changes = {'is_pinned': action == 'pin'}
+    else:
+        change_message = '批次刪除報價單'
+        changes = None
+
+    done = skipped = 0
+    for ids in chunked_ids(queryset, chunk_size):
+        chunk = Enquiry.objects.filter(pk__in=ids)
+        if action not in OPEN_ACTIONS:
+            chunk = chunk.filter(created_by=user)
+        rows = list(chunk.values_list('pk', 'bwp_no', 'status', 'created_at'))
+        skipped += len(ids) - len(rows)
+        if not rows:
+            continue
+        row_ids = [row[0] for row in rows]
+
+        if changes is None:
+            tombstone_enquiries(row_ids)
+            log_bulk_action(user, Enquiry, [(pk, bwp_no) for pk, bwp_no, _, _ in rows], DELETION, change_message)
+        else:
+            now = timezone.now()
+            with transaction.atomic():
+                Enquiry.objects.filter(pk__in=row_ids).update(**changes, updated_at=now)
+                if action == 'status':
+                    record_transitions(ENQUIRY, [(pk, status, created_at) for pk, _, status, created_at in rows],
+                                       value, user, now)
+                log_bulk_action(user, Enquiry, [(pk, bwp_no) for pk, bwp_no, _, _ in rows], CHANGE, change_message)
+            if action == 'status':
+                mark_enquiries_dirty(row_ids)
+                refresh_followup(row_ids)
+        done += len(rows)
+
+    if done:
+        bump_data_version(ENQUIRIES_SCOPE)
+    return done, skipped
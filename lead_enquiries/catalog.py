@@ -0,0 +1,56 @@
+# lead_enquiries/catalog.py
+# 產品目錄的回填和歷史報價查詢
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EnquiryItem, Product, product_lookup_key
+
+BACKFILL_BATCH_SIZE = 1000
+PRICE_HISTORY_LIMIT = 5
+
+
+# 把還沒連結產品的既有品項分批連結，每批一個交易；回傳處理的品項數
+# 每批先一次建立缺少的產品，再依產品分組用 UPDATE ... WHERE id IN (...) 寫回
+def backfill_products(batch_size=BACKFILL_BATCH_SIZE):
+    done = 0
+    last_pk = 0
+    pending = EnquiryItem.objects.filter(product__isnull=True).exclude(item_name='')
+    while True:
+        rows = list(pending.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', 'item_name', 'item_spec', 'material')[:batch_size])
+        if not rows:
+            return done
+        last_pk = rows[-1][0]
+        items_by_key = {}
+        names = {}
+        for pk, name, spec, material in rows:
+            if not name.strip():
+                continue
+            key = product_lookup_key(name, spec, material)
+            items_by_key.setdefault(key, []).append(pk)
+            names.setdefault(key, (name, spec, material))
+
+        with transaction.atomic():
+            Product.objects.bulk_create([
+                Product(lookup_key=key, name=' '.join(name.split()), spec=' '.join(spec.split()),
+                        material=' '.join(material.split()))
+                for key, (name, spec, material) in names.items()
+            ], ignore_conflicts=True)
+            product_ids = dict(Product.objects.filter(lookup_key__in=items_by_key).values_list('lookup_key', 'pk'))
+            now = timezone.now()
+            for key, item_ids in items_by_key.items():
+                EnquiryItem.objects.filter(pk__in=item_ids).update(product_id=product_ids[key], updated_at=now)
+        done += len(rows)
+
+
+# 某產品最近的 limit 筆報價 (可限定客戶)，依品項主鍵由新到舊走 (product, -id) 索引
+def last_quoted_prices(product, customer_id=None, limit=PRICE_HISTORY_LIMIT):
+    items = EnquiryItem.objects.filter(product=product, enquiry__deleted_at__isnull=True)
+    if customer_id:
+        items = items.filter(enquiry__potential_customer_id=customer_id)
+    return list(items.order_by('-pk').values(
+        'unit_price', 'exchange_rate', 'quantity', 'cost', 'cost_rate', 'supplier',
+        'enquiry_id', 'enquiry__bwp_no', 'enquiry__created_at',
+        'enquiry__potential_customer__company_name', 'enquiry__potential_customer__currency',
+    )[:limit])
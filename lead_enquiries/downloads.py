@@ -0,0 +1,119 @@
+# lead_enquiries/downloads.py
+# 檔案下載的共用回應
+# 支援 ETag/If-None-Match (瀏覽器快取)、Range (續傳、分段下載)，
+# 也可以設定交給前端的 nginx/Apache 直接傳檔，大檔案不會一直佔住 Python worker
+
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse)
+from django.utils.http import content_disposition_header
+
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+# If-None-Match 可能是多個 ETag 或 *，W/ 開頭的弱比對也視為相同
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in candidates
+
+
+# 解析單一區段的 Range，回傳 (start, end)；格式不支援(例如多段)時回傳 None 改傳整個檔案
+# 範圍超出檔案大小時丟出 ValueError，回應 416
+def _parse_range(header, size):
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # bytes=-500 代表最後 500 bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def _iter_range(file, start, length):
+    with file:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+# 交給前端代理伺服器傳檔，Range、快取都由代理處理
+def _sendfile_response(field_file):
+    backend = getattr(settings, 'ATTACHMENT_SENDFILE_BACKEND', None)
+    response = HttpResponse()
+    if backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'ATTACHMENT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix + quote(field_file.name)
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = field_file.path
+    else:
+        return None
+    # 讓代理自己依副檔名決定 Content-Type
+    del response['Content-Type']
+    return response
+
+
+# 回應一個儲存區裡的檔案
+# etag 需是不含引號的字串，內容不變 etag 就不變 (例如檔案的 SHA-256)
+def serve_file(request, field_file, filename, etag, as_attachment=False, cache_control='private, max-age=0, must-revalidate'):
+    quoted_etag = f'"{etag}"'
+    if _etag_matches(request.headers.get('If-None-Match'), quoted_etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = quoted_etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    disposition = content_disposition_header(as_attachment, filename)
+
+    response = _sendfile_response(field_file)
+    if response is None:
+        size = field_file.size
+        byte_range = None
+        range_header = request.headers.get('Range')
+        # If-Range 的 ETag 不符代表檔案已變更，要回傳整個檔案
+        if range_header and request.headers.get('If-Range', quoted_etag) == quoted_etag:
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_iter_range(field_file.open('rb'), start, length),
+                                             status=206, content_type=content_type)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            response = FileResponse(field_file.open('rb'), content_type=content_type)
+            response.block_size = CHUNK_SIZE
+        response['Accept-Ranges'] = 'bytes'
+
+    if disposition:
+        response['Content-Disposition'] = disposition
+    response['ETag'] = quoted_etag
+    response['Cache-Control'] = cache_control
+    return response
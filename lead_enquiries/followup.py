@@ -0,0 +1,69 @@
+# lead_enquiries/followup.py
+# 報價單追蹤期限
+# 每張報價單存下最後追蹤時間 (last_tracked_at) 和下次應追蹤日 (next_followup_due)，
+# 待追蹤清單、提醒指令只要一個 next_followup_due 的範圍查詢，不必逐張去翻追蹤紀錄
+# 下次追蹤日 = 最後追蹤 (沒有的話用建立時間) 的日期 + 該狀態的追蹤天數；已成交、已失去不需追蹤
+# 追蹤紀錄新增、修改、刪除和報價單存檔時由 signals 重算；用 .update() 改狀態的路徑要自己呼叫 refresh_followup
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from main.caching import bump_data_version, ENQUIRIES_SCOPE
+from .models import Enquiry
+
+# 各狀態幾天內要追蹤一次，可用 settings.ENQUIRY_FOLLOWUP_DAYS 覆寫
+DEFAULT_FOLLOWUP_DAYS = {
+    'untracked': 3,
+    'tracking': 7,
+}
+
+
+def followup_days():
+    return getattr(settings, 'ENQUIRY_FOLLOWUP_DAYS', DEFAULT_FOLLOWUP_DAYS)
+
+
+# 需要追蹤的狀態
+def followup_statuses():
+    return list(followup_days())
+
+
+def compute_followup_due(status, last_tracked_at, created_at):
+    days = followup_days().get(status)
+    base = last_tracked_at or created_at
+    if days is None or base is None:
+        return None
+    return timezone.localtime(base).date() + timedelta(days=days)
+
+
+# 依追蹤紀錄重算最後追蹤時間和下次追蹤日，只寫回有變動的報價單
+# 用 bulk_update 寫回，不會更動 updated_at
+def refresh_followup(enquiry_ids):
+    rows = (Enquiry.all_objects.filter(pk__in=enquiry_ids)
+            .annotate(latest_track_at=Max('tracks__created_at'))
+            .values_list('pk', 'status', 'created_at', 'latest_track_at', 'last_tracked_at', 'next_followup_due'))
+    changed = []
+    for pk, status, created_at, latest_track_at, last_tracked_at, next_followup_due in rows:
+        due = compute_followup_due(status, latest_track_at, created_at)
+        if (latest_track_at, due) != (last_tracked_at, next_followup_due):
+            changed.append(Enquiry(pk=pk, last_tracked_at=latest_track_at, next_followup_due=due))
+    if changed:
+        Enquiry.all_objects.bulk_update(changed, ['last_tracked_at', 'next_followup_due'], batch_size=500)
+        bump_data_version(ENQUIRIES_SCOPE)
+    return len(changed)
+
+
+# 報價單存檔後 (例如狀態改變) 依目前的最後追蹤時間重算下次追蹤日
+def sync_followup_due(enquiry):
+    due = compute_followup_due(enquiry.status, enquiry.last_tracked_at, enquiry.created_at)
+    if due != enquiry.next_followup_due:
+        Enquiry.all_objects.filter(pk=enquiry.pk).update(next_followup_due=due)
+        enquiry.next_followup_due = due
+
+
+# 到 day 為止 (含) 需要追蹤的報價單，依到期日排序
+def due_enquiries(day):
+    return Enquiry.objects.filter(status__in=followup_statuses(), next_followup_due__lte=day) \
+        .order_by('next_followup_due', 'pk')
@@ -1,6 +1,8 @@
 # lead_enquiries/forms.py
 from django import forms
+from django.core.exceptions import ValidationError
 from .models import Enquiry, EnquiryItem, EnquiryTrack, EnquiryAttachment
+from .rates import get_rate
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Row, Column, Fieldset
 
@@ -41,6 +43,10 @@ class EnquiryForm(forms.ModelForm):
             )
         )
         self.fields['potential_customer'].widget.attrs.update({'class': 'form-select'})
+        # 新增時單號可留白，存檔時自動編號
+        if not self.instance.pk:
+            self.fields['bwp_no'].required = False
+            self.fields['bwp_no'].help_text = '留白時自動編號'
         # 如果表單在初始化時有客戶資料，就把它設為唯讀
         if 'initial' in kwargs and 'potential_customer' in kwargs['initial']:
             self.fields['potential_customer'].disabled = True
@@ -56,12 +62,75 @@ class EnquiryItemForm(forms.ModelForm):
             'note': forms.Textarea(attrs={'rows': 3}),  # 格式化
         }
 
-    def __init__(self, *args, **kwargs):
+    # currency 為報價單客戶的幣別，新增品項時預先帶入匯率表的匯率，匯率留白也用它補上
+    def __init__(self, *args, currency=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.default_rate = get_rate(currency) if currency else None
+        for field_name in ('exchange_rate', 'cost_rate'):
+            self.fields[field_name].required = self.default_rate is None
+            if self.default_rate is not None and not self.instance.pk:
+                self.fields[field_name].initial = self.default_rate
         # 為所有欄位自動加上 bootstrap class，以便在 modal 中渲染
         for field_name, field in self.fields.items():
             field.widget.attrs.update({'class': 'form-control'})
 
+    # 只有留白時才補上匯率表的匯率，填 0 也照填入的值
+    def clean_exchange_rate(self):
+        rate = self.cleaned_data['exchange_rate']
+        return self.default_rate if rate is None else rate
+
+    def clean_cost_rate(self):
+        rate = self.cleaned_data['cost_rate']
+        return self.default_rate if rate is None else rate
+
+
+
+# 報價單品項 - 批次編輯表格，一列一個品項
+class EnquiryItemGridForm(EnquiryItemForm):
+    class Meta(EnquiryItemForm.Meta):
+        fields = ['item_name', 'item_spec', 'material', 'quantity', 'unit_price', 'exchange_rate',
+                  'cost', 'cost_rate', 'supplier', 'note']
+        exclude = None
+        widgets = {
+            'note': forms.TextInput(),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.update({'class': 'form-control form-control-sm'})
+
+
+# 對照已載入品項的 id 欄位，送出的 id 不屬於這張報價單時驗證失敗
+class _LoadedItemField(forms.ModelChoiceField):
+    def __init__(self, loaded, *args, **kwargs):
+        self.loaded = loaded
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.loaded[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+# 預設每一列的 id 欄位驗證時都會各查一次資料庫，改成直接對照 queryset 已載入的品項
+class BaseEnquiryItemFormSet(forms.BaseModelFormSet):
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if not hasattr(self, '_loaded_items'):
+            self._loaded_items = {item.pk: item for item in self.get_queryset()}
+        pk_name = self.model._meta.pk.name
+        field = form.fields[pk_name]
+        form.fields[pk_name] = _LoadedItemField(self._loaded_items, field.queryset, initial=field.initial,
+                                                required=False, widget=field.widget)
+
+
+EnquiryItemFormSet = forms.modelformset_factory(EnquiryItem, form=EnquiryItemGridForm, formset=BaseEnquiryItemFormSet,
+                                                extra=0, can_delete=True)
+
 
 
 # 追蹤紀錄表單 - AJAX Modal
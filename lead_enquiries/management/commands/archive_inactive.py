@@ -0,0 +1,24 @@
+# 封存長期沒有動靜的拒絕往來客戶、已失去報價單
+# python manage.py archive_inactive --months 12 --dry-run
+
+from django.core.management.base import BaseCommand
+
+from lead_enquiries.archive import ARCHIVE_BATCH_SIZE, archive_inactive, months_ago, retained_customers
+
+
+class Command(BaseCommand):
+    help = '封存超過指定月數沒有動靜的拒絕往來客戶、已失去報價單'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='超過幾個月沒有異動才封存')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='每個交易處理的筆數')
+        parser.add_argument('--dry-run', action='store_true', help='只計算筆數，不搬移')
+
+    def handle(self, *args, **options):
+        customers, enquiries = archive_inactive(options['months'], options['batch_size'], options['dry_run'])
+        action = '可封存' if options['dry_run'] else '已封存'
+        self.stdout.write(self.style.SUCCESS(f'{action} {customers} 個客戶、{enquiries} 張報價單'))
+        retained = retained_customers(months_ago(options['months'])).count()
+        if retained:
+            self.stdout.write(self.style.WARNING(
+                f'{retained} 個拒絕往來客戶還有成交或進行中的報價單，保留不封存 (成交金額仍計入銷售分析、排行榜與評分)'))
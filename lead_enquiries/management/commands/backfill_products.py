@@ -0,0 +1,17 @@
+# 把既有的報價品項分批連結到產品目錄 (新存檔的品項會自動連結)
+# python manage.py backfill_products --batch-size 1000
+
+from django.core.management.base import BaseCommand
+
+from lead_enquiries.catalog import BACKFILL_BATCH_SIZE, backfill_products
+
+
+class Command(BaseCommand):
+    help = '將既有報價品項連結到產品目錄'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help='每批處理的品項數')
+
+    def handle(self, *args, **options):
+        count = backfill_products(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已連結 {count} 筆品項'))
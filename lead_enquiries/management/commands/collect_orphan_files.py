@@ -0,0 +1,87 @@
+# 清除 MEDIA_ROOT 底下沒有紀錄引用的附件檔案
+# python manage.py collect_orphan_files --dry-run          只列出報告
+# python manage.py collect_orphan_files --quarantine       搬到 media/orphans/<時間>/ 而不是直接刪除
+
+import os
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from lead_enquiries.models import EnquiryAttachment
+from lead_enquiries.orphans import (MANAGED_DIRS, QUARANTINE_DIR, iter_media_files, load_referenced_paths,
+                                    still_referenced)
+
+
+class Command(BaseCommand):
+    help = '清除沒有被任何附件紀錄引用的檔案'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只列出孤兒檔，不刪除')
+        parser.add_argument('--quarantine', action='store_true', help='搬到隔離目錄而不是刪除')
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='只處理修改時間超過幾小時的檔案，避免刪到正在上傳、還沒寫入紀錄的檔案')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批處理的檔案數')
+        parser.add_argument('--list', action='store_true', help='列出每個孤兒檔的路徑')
+
+    def handle(self, *args, **options):
+        storage = EnquiryAttachment._meta.get_field('file').storage
+        root = getattr(storage, 'location', None)
+        if not root or not os.path.isdir(root):
+            raise CommandError('附件不是存放在本機目錄，無法掃描')
+
+        self.root = root
+        self.options = options
+        self.quarantine_root = os.path.join(root, QUARANTINE_DIR, timezone.localtime().strftime('%Y%m%d-%H%M%S'))
+        cutoff = timezone.now().timestamp() - options['min_age_hours'] * 3600
+
+        referenced = load_referenced_paths()
+        self.stdout.write(f'已載入 {len(referenced)} 個引用中的檔案路徑，開始掃描 {", ".join(MANAGED_DIRS)}')
+
+        scanned = skipped_recent = 0
+        self.orphans = self.orphan_bytes = 0
+        batch = []
+        for path, entry in iter_media_files(root):
+            scanned += 1
+            if path in referenced:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                skipped_recent += 1
+                continue
+            batch.append((path, stat.st_size))
+            if len(batch) >= options['batch_size']:
+                self.process_batch(batch)
+                batch = []
+        if batch:
+            self.process_batch(batch)
+
+        if options['dry_run']:
+            action = '可清除'
+        else:
+            action = '已隔離' if options['quarantine'] else '已刪除'
+        self.stdout.write(self.style.SUCCESS(
+            f'掃描 {scanned} 個檔案，{action} {self.orphans} 個孤兒檔 ({self.orphan_bytes / 1024 / 1024:.1f} MB)，'
+            f'{skipped_recent} 個近期檔案略過'))
+
+    def process_batch(self, batch):
+        recheck = still_referenced([path for path, size in batch])
+        for path, size in batch:
+            if path in recheck:
+                continue
+            self.orphans += 1
+            self.orphan_bytes += size
+            if self.options['list']:
+                self.stdout.write(f'  {path} ({size} bytes)')
+            if self.options['dry_run']:
+                continue
+            source = os.path.join(self.root, path)
+            try:
+                if self.options['quarantine']:
+                    target = os.path.join(self.quarantine_root, path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(source, target)
+                else:
+                    os.remove(source)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,38 @@
+# 把舊路徑 (enquiries/<pk>/<filename>) 的附件搬進依內容去重的儲存區
+# python manage.py dedupe_attachments --batch-size 100
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from lead_enquiries.models import EnquiryAttachment, StoredBlob
+
+
+class Command(BaseCommand):
+    help = '將舊附件改為依SHA-256去重存放'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='每批處理的附件數')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        moved = missing = 0
+        last_pk = 0
+        while True:
+            batch = list(EnquiryAttachment.objects.filter(blob__isnull=True, pk__gt=last_pk)
+                         .exclude(file='').order_by('pk')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for attachment in batch:
+                old_file = attachment.file
+                if not old_file.storage.exists(old_file.name):
+                    missing += 1
+                    continue
+                with old_file.open('rb'):
+                    blob = StoredBlob.objects.store(old_file)
+                with transaction.atomic():
+                    attachment.attach_blob(blob, old_file.name)
+                    attachment.save(update_fields=['blob', 'file', 'original_name'])
+                    transaction.on_commit(lambda f=old_file: f.storage.delete(f.name))
+                moved += 1
+        self.stdout.write(self.style.SUCCESS(f'已搬移 {moved} 個附件，{missing} 個找不到檔案'))
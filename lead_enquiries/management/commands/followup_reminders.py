@@ -0,0 +1,35 @@
+# 列出每位業務今天到期、已逾期的待追蹤報價單，可排程每天執行
+# python manage.py followup_reminders --days-ahead 1
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from lead_enquiries.followup import due_enquiries
+
+
+class Command(BaseCommand):
+    help = '列出每位業務需要追蹤的報價單'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days-ahead', type=int, default=0, help='一併列出幾天內即將到期的報價單')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        until = today + timedelta(days=options['days_ahead'])
+        # 一個範圍查詢取出全部，再依建立者分組
+        rows = due_enquiries(until).values_list('created_by__username', 'bwp_no',
+                                                'potential_customer__company_name', 'next_followup_due')
+        reminders = {}
+        for username, bwp_no, company_name, due in rows:
+            reminders.setdefault(username, []).append((bwp_no, company_name, due))
+
+        for username, enquiries in sorted(reminders.items()):
+            overdue = sum(1 for *_, due in enquiries if due < today)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{username}：{len(enquiries)} 張待追蹤 (逾期 {overdue} 張)'))
+            for bwp_no, company_name, due in enquiries:
+                late = (today - due).days
+                note = f'逾期 {late} 天' if late > 0 else ('今天到期' if late == 0 else f'{-late} 天後到期')
+                self.stdout.write(f'  {bwp_no}  {company_name}  {due:%Y-%m-%d}  {note}')
+        self.stdout.write(self.style.SUCCESS(f'共 {sum(map(len, reminders.values()))} 張報價單需要追蹤'))
@@ -0,0 +1,35 @@
+# 補產生附件的縮圖、預覽圖 (背景工作因程序重啟遺失、或舊附件搬進儲存區後)
+# python manage.py generate_previews --retry-failed
+
+from django.core.management.base import BaseCommand
+
+from lead_enquiries.models import StoredBlob
+from lead_enquiries.previews import generate_previews
+
+
+class Command(BaseCommand):
+    help = '產生附件的縮圖和預覽圖'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='重新產生之前失敗的檔案')
+        parser.add_argument('--batch-size', type=int, default=100, help='每批處理的檔案數')
+
+    def handle(self, *args, **options):
+        statuses = ['pending', 'failed'] if options['retry_failed'] else ['pending']
+        batch_size = options['batch_size']
+        counts = {}
+        last_pk = 0
+        while True:
+            ids = list(StoredBlob.objects.filter(preview_status__in=statuses, pk__gt=last_pk)
+                       .order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_pk = ids[-1]
+            for blob_id in ids:
+                # 失敗的要先改回待產生，generate_previews 才會重新處理
+                StoredBlob.objects.filter(pk=blob_id, preview_status='failed').update(preview_status='pending')
+                blob = generate_previews(blob_id)
+                if blob is not None:
+                    counts[blob.preview_status] = counts.get(blob.preview_status, 0) + 1
+        self.stdout.write(self.style.SUCCESS(
+            f"已產生 {counts.get('ready', 0)} 個，不支援 {counts.get('unsupported', 0)} 個，失敗 {counts.get('failed', 0)} 個"))
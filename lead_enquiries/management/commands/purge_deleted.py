@@ -0,0 +1,17 @@
+# 清除已標記刪除、但背景工作還沒清掉的客戶和報價單 (例如程序重啟導致背景工作遺失)
+# python manage.py purge_deleted --chunk-size 500
+
+from django.core.management.base import BaseCommand
+
+from lead_enquiries.purge import PURGE_CHUNK_SIZE, purge_tombstoned
+
+
+class Command(BaseCommand):
+    help = '清除已標記刪除的客戶和報價單'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=PURGE_CHUNK_SIZE, help='每批刪除的筆數')
+
+    def handle(self, *args, **options):
+        customers, enquiries = purge_tombstoned(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已清除 {customers} 個客戶、{enquiries} 張報價單'))
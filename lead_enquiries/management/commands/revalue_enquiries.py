@@ -0,0 +1,24 @@
+# 依匯率表目前的匯率，重估進行中報價單的品項匯率 (每個幣別一個 UPDATE)
+# python manage.py revalue_enquiries --currency USD --dry-run
+
+from django.core.management.base import BaseCommand
+
+from leads.models import PotentialCustomer
+from lead_enquiries.rates import revalue_open_enquiries
+
+
+class Command(BaseCommand):
+    help = '依目前匯率重估進行中報價單的台幣金額'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--currency', action='append', choices=PotentialCustomer.CurrencyChoices.values,
+                            help='只處理指定幣別，可重複指定')
+        parser.add_argument('--dry-run', action='store_true', help='只計算會更新的品項數')
+
+    def handle(self, *args, **options):
+        results = revalue_open_enquiries(options['currency'], dry_run=options['dry_run'])
+        verb = '將更新' if options['dry_run'] else '已更新'
+        for currency, count in sorted(results.items()):
+            self.stdout.write(f'{currency}: {verb} {count} 筆品項')
+        if not results:
+            self.stdout.write('匯率表沒有可用的匯率')
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:17
+
+import django.db.models.deletion
+import lead_enquiries.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0002_alter_enquiry_potential_customer_enquiryattachment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(upload_to=lead_enquiries.models.blob_storage_path, verbose_name='檔案')),
+                ('size', models.BigIntegerField(default=0, verbose_name='檔案大小')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='引用次數')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立日期')),
+            ],
+            options={
+                'verbose_name': '附件檔案',
+                'verbose_name_plural': '附件檔案',
+            },
+        ),
+        migrations.AddField(
+            model_name='enquiryattachment',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='原始檔名'),
+        ),
+        migrations.AddField(
+            model_name='enquiryattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='lead_enquiries.storedblob', verbose_name='實體檔案'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:21
+
+import lead_enquiries.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0003_storedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedblob',
+            name='preview',
+            field=models.FileField(blank=True, upload_to=lead_enquiries.models.blob_preview_path, verbose_name='預覽圖'),
+        ),
+        migrations.AddField(
+            model_name='storedblob',
+            name='preview_status',
+            field=models.CharField(choices=[('pending', '待產生'), ('ready', '已產生'), ('unsupported', '不支援'), ('failed', '產生失敗')], default='pending', max_length=20, verbose_name='預覽狀態'),
+        ),
+        migrations.AddField(
+            model_name='storedblob',
+            name='thumbnail',
+            field=models.FileField(blank=True, upload_to=lead_enquiries.models.blob_preview_path, verbose_name='縮圖'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0005_enquiry_deleted_at'),
+        ('leads', '0006_archivedcustomer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEnquiry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_pk', models.IntegerField(unique=True, verbose_name='原報價單編號')),
+                ('bwp_no', models.CharField(db_index=True, max_length=20, verbose_name='博威報價單號')),
+                ('customer_pk', models.IntegerField(db_index=True, verbose_name='客戶編號')),
+                ('company_name', models.CharField(max_length=100, verbose_name='客戶名稱')),
+                ('status', models.CharField(choices=[('untracked', '未追蹤'), ('tracking', '追蹤中'), ('success', '已成交'), ('lost', '已失去')], max_length=20, verbose_name='追蹤狀態')),
+                ('last_activity_at', models.DateTimeField(verbose_name='最後活動時間')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='封存時間')),
+                ('payload', models.JSONField(verbose_name='封存內容')),
+                ('attachment_files', models.JSONField(blank=True, default=list, verbose_name='附件檔案')),
+                ('archived_customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='enquiries', to='leads.archivedcustomer', verbose_name='封存客戶')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='建立者')),
+            ],
+            options={
+                'verbose_name': '封存報價單',
+                'verbose_name_plural': '封存報價單',
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:33
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+
+# 建立這個 migration 時的追蹤天數 (lead_enquiries/followup.py 的預設值)
+# 不引用 followup.py、不讀 settings，之後改程式或設定都不影響這裡的結果
+FOLLOWUP_DAYS = {
+    'untracked': 3,
+    'tracking': 7,
+}
+
+
+def compute_followup_due(status, last_tracked_at, created_at):
+    days = FOLLOWUP_DAYS.get(status)
+    base = last_tracked_at or created_at
+    if days is None or base is None:
+        return None
+    return timezone.localtime(base).date() + timedelta(days=days)
+
+
+# 既有報價單依追蹤紀錄算出最後追蹤時間和下次追蹤日
+def backfill_followup(apps, schema_editor):
+    Enquiry = apps.get_model('lead_enquiries', 'Enquiry')
+    EnquiryTrack = apps.get_model('lead_enquiries', 'EnquiryTrack')
+    latest = EnquiryTrack.objects.filter(enquiry=OuterRef('pk')).order_by().values('enquiry') \
+        .annotate(latest=Max('created_at')).values('latest')
+    Enquiry.objects.update(last_tracked_at=Subquery(latest))
+    changed = []
+    for enquiry in Enquiry.objects.only('pk', 'status', 'created_at', 'last_tracked_at').iterator(chunk_size=500):
+        enquiry.next_followup_due = compute_followup_due(enquiry.status, enquiry.last_tracked_at, enquiry.created_at)
+        if enquiry.next_followup_due:
+            changed.append(enquiry)
+    Enquiry.objects.bulk_update(changed, ['next_followup_due'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0006_archivedenquiry'),
+        ('leads', '0006_archivedcustomer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enquiry',
+            name='last_tracked_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='最後追蹤時間'),
+        ),
+        migrations.AddField(
+            model_name='enquiry',
+            name='next_followup_due',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='下次追蹤日'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiry',
+            index=models.Index(fields=['status', 'next_followup_due'], name='enquiry_followup_due_idx'),
+        ),
+        migrations.RunPython(backfill_followup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0007_enquiry_followup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, verbose_name='產品名稱')),
+                ('spec', models.CharField(blank=True, max_length=30, verbose_name='產品規格')),
+                ('material', models.CharField(blank=True, max_length=30, verbose_name='材質')),
+                ('lookup_key', models.CharField(max_length=100, unique=True, verbose_name='比對鍵')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立日期')),
+            ],
+            options={
+                'verbose_name': '產品',
+                'verbose_name_plural': '產品',
+                'indexes': [models.Index(fields=['name', 'spec'], name='product_name_spec_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='enquiryitem',
+            name='product',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items', to='lead_enquiries.product', verbose_name='產品'),
+        ),
+        migrations.AddIndex(
+            model_name='enquiryitem',
+            index=models.Index(fields=['product', '-id'], name='item_product_recent_idx'),
+        ),
+    ]
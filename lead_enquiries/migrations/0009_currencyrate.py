@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0008_product_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('NTD', '新台幣'), ('USD', '美金'), ('EUR', '歐元'), ('JPY', '日幣')], max_length=5, verbose_name='幣別')),
+                ('rate', models.FloatField(verbose_name='匯率 (兌新台幣)')),
+                ('effective_date', models.DateField(verbose_name='生效日期')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立日期')),
+            ],
+            options={
+                'verbose_name': '匯率',
+                'verbose_name_plural': '匯率',
+                'ordering': ['currency', '-effective_date'],
+                'constraints': [models.UniqueConstraint(fields=('currency', 'effective_date'), name='unique_currency_rate_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0009_currencyrate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BwpNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(unique=True, verbose_name='年度')),
+                ('next_value', models.PositiveIntegerField(default=1, verbose_name='下一個流水號')),
+            ],
+            options={
+                'verbose_name': '報價單號計數器',
+                'verbose_name_plural': '報價單號計數器',
+                'ordering': ['-year'],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# 既有的品項以報價單的更新日期、追蹤紀錄以建立時間作為更新日期
+def backfill_updated_at(apps, schema_editor):
+    Enquiry = apps.get_model('lead_enquiries', 'Enquiry')
+    EnquiryItem = apps.get_model('lead_enquiries', 'EnquiryItem')
+    EnquiryTrack = apps.get_model('lead_enquiries', 'EnquiryTrack')
+    enquiry_updated = Enquiry.objects.filter(pk=OuterRef('enquiry_id')).values('updated_at')
+    EnquiryItem.objects.update(updated_at=Subquery(enquiry_updated))
+    EnquiryTrack.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0010_bwpnumbercounter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='enquiry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新日期'),
+        ),
+        migrations.AddField(
+            model_name='enquiryitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='更新日期'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='enquirytrack',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='更新日期'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
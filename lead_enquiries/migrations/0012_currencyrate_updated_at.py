@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead_enquiries', '0011_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currencyrate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日期'),
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q
 from django.contrib.auth.models import User
 import os
-from leads.models import PotentialCustomer
+import hashlib
+from collections import Counter
+from leads.models import PotentialCustomer, ArchivedCustomer
+from main.managers import LiveManager
 
 STATUS_CHOICES = [
     ('untracked', '未追蹤'),
@@ -19,8 +24,23 @@ class Enquiry(models.Model):
     status = models.CharField(choices=STATUS_CHOICES,default='untracked',max_length=20,verbose_name='追蹤狀態')
     is_pinned = models.BooleanField(default=False,verbose_name='重點追蹤')
     created_at = models.DateTimeField(auto_now_add=True,verbose_name='建立日期')
-    updated_at = models.DateTimeField(auto_now=True,verbose_name='更新日期')
+    # 異動資料流 (main/changes.py) 依 (updated_at, 編號) 找出異動的資料，要建索引
+    updated_at = models.DateTimeField(auto_now=True,db_index=True,verbose_name='更新日期')
     created_by = models.ForeignKey(User,blank=False,on_delete=models.CASCADE,verbose_name='建立者')
+    # 刪除時先標記，再由背景工作分批清除 (見purge.py)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True, verbose_name='刪除時間')
+    # 最後一次追蹤時間和下次應追蹤日，追蹤紀錄或狀態異動時重算 (見followup.py)
+    last_tracked_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='最後追蹤時間')
+    next_followup_due = models.DateField(null=True, blank=True, editable=False, verbose_name='下次追蹤日')
+
+    objects = LiveManager()
+    all_objects = models.Manager() # 包含已刪除、等待清除的報價單
+
+    class Meta:
+        indexes = [
+            # 待追蹤清單：依狀態篩選後找到期日在某天之前的報價單
+            models.Index(fields=['status', 'next_followup_due'], name='enquiry_followup_due_idx'),
+        ]
 
     @property
     def currency(self): # 抓關聯客戶的幣別
@@ -44,12 +64,116 @@ class Enquiry(models.Model):
             return 0
         return sum(item.subtotal_ntd for item in self.items.all() if item.subtotal_ntd is not None)
 
+    # Model.validate_unique 用預設的 manager (objects) 查詢，看不到已標記刪除、還沒清除的報價單，
+    # 但它們的報價單號仍佔著資料庫的唯一限制，這裡用 all_objects 再檢查，避免存檔時才出現 IntegrityError
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude=exclude)
+        if exclude and 'bwp_no' in exclude:
+            return
+        if Enquiry.all_objects.filter(bwp_no=self.bwp_no, deleted_at__isnull=False).exclude(pk=self.pk).exists():
+            raise ValidationError({'bwp_no': self.unique_error_message(Enquiry, ('bwp_no',))})
+
     def __str__(self):
         return f'{self.bwp_no}'
 
+# 匯率表
+# 各幣別對新台幣的匯率，依生效日期記錄，查詢時取指定日期 (含) 之前最新的一筆 (見rates.py)
+class CurrencyRate(models.Model):
+    currency = models.CharField(max_length=5, choices=PotentialCustomer.CurrencyChoices.choices, verbose_name='幣別')
+    rate = models.FloatField(verbose_name='匯率 (兌新台幣)')
+    effective_date = models.DateField(verbose_name='生效日期')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立日期')
+    # 各程序用 (筆數, 最後更新時間) 判斷匯率表有沒有異動 (見rates.py)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日期')
+
+    class Meta:
+        verbose_name = '匯率'
+        verbose_name_plural = '匯率'
+        ordering = ['currency', '-effective_date']
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'effective_date'], name='unique_currency_rate_per_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.currency} {self.rate} ({self.effective_date})'
+
+# 報價單號計數器
+# 每年一筆，next_value 是下一個還沒發出的流水號；各程序一次預留一段號碼，用完再來拿 (見numbering.py)
+class BwpNumberCounter(models.Model):
+    year = models.PositiveIntegerField(unique=True, verbose_name='年度')
+    next_value = models.PositiveIntegerField(default=1, verbose_name='下一個流水號')
+
+    class Meta:
+        verbose_name = '報價單號計數器'
+        verbose_name_plural = '報價單號計數器'
+        ordering = ['-year']
+
+    def __str__(self):
+        return f'{self.year}: {self.next_value}'
+
+# 產品目錄
+# 品項的 產品名稱/規格/材質 原本是自由輸入的文字，查「上次報多少」只能全表 LIKE
+# 這裡把相同的組合 (忽略大小寫、多餘空白) 正規化成一筆產品，品項存檔時自動連結，依產品查歷史報價走索引
+def product_lookup_key(name, spec, material):
+    return '|'.join(' '.join((value or '').split()).casefold() for value in (name, spec, material))
+
+class ProductManager(models.Manager):
+    # 依品項的名稱、規格、材質找到 (或建立) 對應的產品，名稱空白時不建立
+    def for_item(self, name, spec, material):
+        if not (name or '').strip():
+            return None
+        key = product_lookup_key(name, spec, material)
+        product = self.filter(lookup_key=key).first()
+        if product is None:
+            try:
+                with transaction.atomic():
+                    product = self.create(lookup_key=key, name=' '.join(name.split()),
+                                          spec=' '.join((spec or '').split()), material=' '.join((material or '').split()))
+            except IntegrityError:
+                product = self.get(lookup_key=key)
+        return product
+
+    # 一批品項一次連結產品 (bulk_create 不會呼叫 save)：缺少的產品一次建立，再一次查回
+    def link_items(self, items):
+        keys = {}
+        for item in items:
+            if (item.item_name or '').strip():
+                keys.setdefault(product_lookup_key(item.item_name, item.item_spec, item.material), item)
+        self.bulk_create([
+            self.model(lookup_key=key, name=' '.join(item.item_name.split()),
+                       spec=' '.join((item.item_spec or '').split()), material=' '.join((item.material or '').split()))
+            for key, item in keys.items()
+        ], ignore_conflicts=True)
+        products = self.in_bulk(list(keys), field_name='lookup_key')
+        for item in items:
+            key = product_lookup_key(item.item_name, item.item_spec, item.material)
+            item.product = products.get(key) if (item.item_name or '').strip() else None
+
+
+class Product(models.Model):
+    name = models.CharField(max_length=30, verbose_name='產品名稱')
+    spec = models.CharField(max_length=30, blank=True, verbose_name='產品規格')
+    material = models.CharField(max_length=30, blank=True, verbose_name='材質')
+    lookup_key = models.CharField(max_length=100, unique=True, verbose_name='比對鍵')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立日期')
+
+    objects = ProductManager()
+
+    class Meta:
+        verbose_name = '產品'
+        verbose_name_plural = '產品'
+        indexes = [
+            models.Index(fields=['name', 'spec'], name='product_name_spec_idx'),
+        ]
+
+    def __str__(self):
+        return ' / '.join(value for value in (self.name, self.spec, self.material) if value)
+
 # 報價品項
 class EnquiryItem(models.Model):
     enquiry = models.ForeignKey(Enquiry,blank=False,on_delete=models.CASCADE,verbose_name='報價單',related_name='items')
+    # 存檔時依名稱、規格、材質自動連結 (見save)
+    product = models.ForeignKey(Product, null=True, blank=True, editable=False, on_delete=models.SET_NULL, related_name='items', verbose_name='產品')
     item_name = models.CharField(max_length=30,blank=True,verbose_name='產品名稱')
     item_spec = models.CharField(max_length=30,blank=True,verbose_name='產品規格')
     material = models.CharField(max_length=30,blank=True,verbose_name='材質')
@@ -60,6 +184,7 @@ class EnquiryItem(models.Model):
     cost_rate =models.FloatField(blank=True,verbose_name='進價匯率')
     supplier = models.CharField(max_length=30,blank=True,verbose_name='供應商')
     note = models.TextField(blank=True,verbose_name='備註')
+    updated_at = models.DateTimeField(auto_now=True,db_index=True,verbose_name='更新日期')
 
     # 計算原幣別小計
     @property
@@ -68,12 +193,31 @@ class EnquiryItem(models.Model):
             return self.quantity * self.unit_price
         return 0
 
-    # 計算台幣小計
+    # 計算台幣小計，沒有填匯率時用匯率表目前的匯率
     @property
     def subtotal_ntd(self):
-        rate = self.exchange_rate or 1.0
+        rate = self.exchange_rate
+        if rate is None:
+            from .rates import get_rate
+            rate = get_rate(self.enquiry.currency)
+            if rate is None:
+                rate = 1.0
         return self.subtotal * rate
 
+    class Meta:
+        indexes = [
+            # 依產品查最近的報價 (主鍵越大越新)
+            models.Index(fields=['product', '-id'], name='item_product_recent_idx'),
+        ]
+
+    # 存檔前先連結產品目錄
+    def save(self, *args, **kwargs):
+        self.product = Product.objects.for_item(self.item_name, self.item_spec, self.material)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'product'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.item_name}-{self.unit_price}-{self.quantity}'
 
@@ -83,18 +227,126 @@ class EnquiryTrack(models.Model):
     created_at = models.DateTimeField(auto_now_add=True,verbose_name='建立日期')
     content = models.TextField(blank=True,verbose_name='內容')
     created_by = models.ForeignKey(User,blank=False,on_delete=models.CASCADE,verbose_name='建立人')
+    updated_at = models.DateTimeField(auto_now=True,db_index=True,verbose_name='更新日期')
 
     def __str__(self):
         return f'{self.enquiry.bwp_no}-{self.created_by.username}'
 
+# 附件實體檔案區塊
+# 以檔案內容的SHA-256定址，相同內容只存一份，用引用次數記錄有幾個附件在使用
+# 存放路徑依hash前4碼分兩層目錄 (blobs/ab/cd/<sha256>.pdf)，避免單一目錄檔案過多
+def blob_storage_path(instance, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f'blobs/{instance.sha256[:2]}/{instance.sha256[2:4]}/{instance.sha256}{ext}'
+
+# 算出上傳檔案的SHA-256，上傳處理器(uploadhandlers.py)邊收邊算好的就直接用
+def file_sha256(uploaded_file):
+    digest = getattr(uploaded_file, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha256.update(chunk)
+    uploaded_file.seek(0)
+    return sha256.hexdigest()
+
+class StoredBlobManager(models.Manager):
+    # 已經有相同內容的檔案就增加一次引用並回傳，沒有則回傳None
+    # 用F()在資料庫端+1，同時上傳相同檔案也不會少算
+    def acquire(self, sha256):
+        with transaction.atomic():
+            if self.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+                return self.get(sha256=sha256)
+        return None
+
+    # 存入上傳的檔案並取得一次引用，內容重複時不會再寫一次檔案
+    def store(self, uploaded_file):
+        sha256 = file_sha256(uploaded_file)
+        blob = self.acquire(sha256)
+        if blob is not None:
+            return blob
+
+        # 一律寫入新檔案，不沿用磁碟上剩下的同名檔案：那可能是剛釋放、正等著commit後刪除的檔案
+        # 同名檔案還在時 storage 會自動換一個檔名，沒有紀錄的舊檔案由 collect_orphan_files 清掉
+        blob = self.model(sha256=sha256, size=uploaded_file.size, ref_count=1)
+        blob.file.save(uploaded_file.name, uploaded_file, save=False)
+        try:
+            with transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            # 另一個請求同時存入了相同內容，改用它的紀錄
+            blob.file.delete(save=False)
+            return self.acquire(sha256)
+        return blob
+
+    # 減少一次引用，沒有任何附件使用時才刪除紀錄，檔案等交易commit後再刪
+    def release(self, blob_id):
+        self.release_many([blob_id])
+
+    # 一次釋放多個引用 (批次刪除附件時用)，同一個blob出現幾次就減幾次
+    def release_many(self, blob_ids):
+        counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+        if not counts:
+            return
+        with transaction.atomic():
+            for blob_id, n in counts.items():
+                self.filter(pk=blob_id).update(ref_count=F('ref_count') - n)
+            for orphan in self.filter(pk__in=counts, ref_count__lte=0):
+                orphan.delete()
+                transaction.on_commit(orphan.delete_files)
+
+# 縮圖、預覽圖也依hash存放，相同內容的附件共用同一份
+def blob_preview_path(instance, filename):
+    return f'previews/{instance.sha256[:2]}/{instance.sha256[2:4]}/{filename}'
+
+class StoredBlob(models.Model):
+    PREVIEW_STATUS_CHOICES = [
+        ('pending', '待產生'),
+        ('ready', '已產生'),
+        ('unsupported', '不支援'),
+        ('failed', '產生失敗'),
+    ]
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='SHA-256')
+    file = models.FileField(upload_to=blob_storage_path, verbose_name='檔案')
+    size = models.BigIntegerField(default=0, verbose_name='檔案大小')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='引用次數')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立日期')
+    # 圖片、PDF第一頁的縮圖和預覽圖，上傳後由背景工作產生 (previews.py)
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUS_CHOICES, default='pending', verbose_name='預覽狀態')
+    thumbnail = models.FileField(upload_to=blob_preview_path, blank=True, verbose_name='縮圖')
+    preview = models.FileField(upload_to=blob_preview_path, blank=True, verbose_name='預覽圖')
+
+    objects = StoredBlobManager()
+
+    class Meta:
+        verbose_name = '附件檔案'
+        verbose_name_plural = '附件檔案'
+
+    # 刪除實體檔案和縮圖、預覽圖 (紀錄刪除、交易commit後呼叫)
+    # 已經有其他紀錄指向同一個檔案時保留不刪
+    def delete_files(self):
+        for field_file in (self.file, self.thumbnail, self.preview):
+            if not field_file:
+                continue
+            name = field_file.name
+            if StoredBlob.objects.filter(Q(file=name) | Q(thumbnail=name) | Q(preview=name)).exists():
+                continue
+            field_file.delete(save=False)
+
+    def __str__(self):
+        return self.sha256
+
 # 報價附件區塊
-# 儲存路徑
+# 舊的儲存路徑，去重存放之前上傳的附件仍放在這裡
 def enquiry_attachment_path(instance, filename):
     return f'enquiries/{instance.enquiry.pk}/{filename}'
 
 class EnquiryAttachment(models.Model):
     enquiry = models.ForeignKey(Enquiry, on_delete=models.CASCADE, verbose_name='報價單', related_name='attachments')
     file = models.FileField(upload_to=enquiry_attachment_path, verbose_name='檔案')
+    # 去重存放的實體檔案，file 會指向 blob 的路徑；舊附件為空
+    blob = models.ForeignKey(StoredBlob, on_delete=models.PROTECT, null=True, blank=True, verbose_name='實體檔案', related_name='attachments')
+    original_name = models.CharField(max_length=255, blank=True, verbose_name='原始檔名')
     description = models.CharField(max_length=255, blank=True, verbose_name='檔案描述')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='上傳時間')
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name='上傳者')
@@ -103,5 +355,36 @@ class EnquiryAttachment(models.Model):
         verbose_name = '報價單附件'
         verbose_name_plural = '報價單附件'
 
+    # 指向去重存放的檔案，blob 需已經取得過引用
+    def attach_blob(self, blob, filename):
+        self.blob = blob
+        self.file = blob.file.name  # 指定字串，存檔時不會再寫一次檔案
+        self.original_name = os.path.basename(filename)[:255]
+
+    def __str__(self):
+        return self.original_name or os.path.basename(self.file.name)
+
+# 封存報價單區塊
+# 已失去、長期沒有動靜的報價單連同品項、追蹤、附件紀錄搬到這裡 (見archive.py)
+# 附件的實體檔案不動，引用次數也保留，還原後直接可用
+class ArchivedEnquiry(models.Model):
+    original_pk = models.IntegerField(unique=True, verbose_name='原報價單編號')
+    bwp_no = models.CharField(max_length=20, db_index=True, verbose_name='博威報價單號')
+    customer_pk = models.IntegerField(db_index=True, verbose_name='客戶編號')
+    company_name = models.CharField(max_length=100, verbose_name='客戶名稱')
+    status = models.CharField(choices=STATUS_CHOICES, max_length=20, verbose_name='追蹤狀態')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name='建立者')
+    # 隨客戶一起封存時，要從客戶還原
+    archived_customer = models.ForeignKey(ArchivedCustomer, on_delete=models.CASCADE, null=True, blank=True, related_name='enquiries', verbose_name='封存客戶')
+    last_activity_at = models.DateTimeField(verbose_name='最後活動時間')
+    archived_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='封存時間')
+    payload = models.JSONField(verbose_name='封存內容')
+    # 附件檔案路徑，清除孤兒檔時視為引用中
+    attachment_files = models.JSONField(default=list, blank=True, verbose_name='附件檔案')
+
+    class Meta:
+        verbose_name = '封存報價單'
+        verbose_name_plural = '封存報價單'
+
     def __str__(self):
-        return os.path.basename(self.file.name)
+        return self.bwp_no
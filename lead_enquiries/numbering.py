@@ -0,0 +1,87 @@
+# lead_enquiries/numbering.py
+# 報價單號自動編號
+# 原本單號要手動輸入，使用者看列表挑號碼，同時建立時常撞到唯一限制，只好整張表單重填
+# 改成 <前綴><年度>-<流水號>，流水號由每年一筆的計數器 (BwpNumberCounter) 發出：
+#   - 每個程序一次預留 block_size 個號碼放在記憶體，用完才再寫一次計數器，不用掃描報價單表，也不會每張報價單都搶 SQLite 的寫入鎖
+#   - 程序結束時沒用完的號碼直接跳過 (號碼可能不連續)，但不會重複
+#   - 發號前確認沒有被手動輸入或封存的報價單用掉
+# 單號留白存檔時自動編號 (見signals.py)
+
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BwpNumberCounter, Enquiry, ArchivedEnquiry
+
+DEFAULT_BWP_NO_PREFIX = 'BWP'
+DEFAULT_BLOCK_SIZE = 20
+
+_lock = threading.Lock()
+_blocks = {}  # 年度 -> [下一個號碼, 預留區段的結尾 (不含)]
+
+
+# 單號前綴與每次預留的號碼數，可用 settings.BWP_NO_PREFIX、settings.BWP_NO_BLOCK_SIZE 覆寫
+def bwp_no_prefix(year):
+    return f"{getattr(settings, 'BWP_NO_PREFIX', DEFAULT_BWP_NO_PREFIX)}{year}-"
+
+
+def block_size():
+    return getattr(settings, 'BWP_NO_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+
+def format_bwp_no(year, sequence):
+    return f'{bwp_no_prefix(year)}{sequence:04d}'
+
+
+# 計數器第一次建立時，從該年度已經用掉的最大流水號接著編 (只看符合格式的單號，走 bwp_no 的唯一索引)
+def _first_free_sequence(year):
+    prefix = bwp_no_prefix(year)
+    used = list(Enquiry.all_objects.filter(bwp_no__startswith=prefix).values_list('bwp_no', flat=True))
+    used += ArchivedEnquiry.objects.filter(bwp_no__startswith=prefix).values_list('bwp_no', flat=True)
+    sequences = [int(number[len(prefix):]) for number in used if number[len(prefix):].isdigit()]
+    return max(sequences, default=0) + 1
+
+
+# 計數器加上 size，回傳預留到的區段 (start, end)
+# 先 UPDATE 再讀：SQLite 的交易先讀後寫，升級成寫入鎖時遇到別的程序正在寫會直接失敗，不會等待
+def _reserve_block(year, size):
+    while True:
+        try:
+            with transaction.atomic():
+                counter = BwpNumberCounter.objects.filter(year=year)
+                if not counter.update(next_value=F('next_value') + size):
+                    BwpNumberCounter.objects.create(year=year, next_value=_first_free_sequence(year) + size)
+                end = counter.values_list('next_value', flat=True).get()
+            return end - size, end
+        except IntegrityError:
+            # 別的程序同時建立了今年的計數器，重新預留
+            continue
+
+
+def _next_sequence(year):
+    with _lock:
+        # 在外層交易裡預留的話，外層回滾時計數器也會回滾，別的程序會拿到同一段號碼，所以只拿一個、不放進記憶體
+        if transaction.get_connection().in_atomic_block:
+            return _reserve_block(year, 1)[0]
+        block = _blocks.get(year)
+        if block is None or block[0] >= block[1]:
+            block = _blocks[year] = list(_reserve_block(year, block_size()))
+        sequence = block[0]
+        block[0] += 1
+        return sequence
+
+
+def _taken(number):
+    return Enquiry.all_objects.filter(bwp_no=number).exists() or ArchivedEnquiry.objects.filter(bwp_no=number).exists()
+
+
+# 發出下一個可用的報價單號，year 預設今年
+def allocate_bwp_no(year=None):
+    year = year or timezone.localdate().year
+    while True:
+        number = format_bwp_no(year, _next_sequence(year))
+        if not _taken(number):
+            return number
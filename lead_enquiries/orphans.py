@@ -0,0 +1,55 @@
+# lead_enquiries/orphans.py
+# 找出 MEDIA_ROOT 底下沒有任何紀錄引用的檔案 (孤兒檔)
+# 例如舊版刪除報價單/客戶時，連帶刪除的附件紀錄不會刪檔
+# 檔案量可能很大，目錄用 os.scandir 逐層走訪，邊走邊產生，不會把整棵目錄樹讀進記憶體
+
+import os
+
+from django.db.models import Q
+
+from .models import EnquiryAttachment, StoredBlob, ArchivedEnquiry
+
+# 由系統管理的目錄，只掃描這些，避免誤刪手動放進 MEDIA_ROOT 的檔案
+MANAGED_DIRS = ('enquiries', 'blobs', 'previews')
+# 隔離區，不在 MANAGED_DIRS 裡所以不會被掃描到
+QUARANTINE_DIR = 'orphans'
+
+
+# 依序產生 (相對路徑, os.DirEntry)，相對路徑用 / 分隔，和 FileField 存的格式相同
+def iter_media_files(root, subdirs=MANAGED_DIRS):
+    pending = [os.path.join(root, subdir) for subdir in subdirs]
+    while pending:
+        directory = pending.pop()
+        try:
+            iterator = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, root).replace(os.sep, '/'), entry
+
+
+# 所有紀錄引用到的檔案路徑
+# 每個 model 一次 values_list().iterator() 串流讀取，只保留路徑字串
+def load_referenced_paths():
+    referenced = set()
+    for (name,) in EnquiryAttachment.objects.exclude(file='').values_list('file').iterator(chunk_size=5000):
+        referenced.add(name)
+    for names in StoredBlob.objects.values_list('file', 'thumbnail', 'preview').iterator(chunk_size=5000):
+        referenced.update(name for name in names if name)
+    # 封存的報價單附件檔案保留，還原時要用
+    for (names,) in ArchivedEnquiry.objects.exclude(attachment_files=[]).values_list('attachment_files').iterator(chunk_size=1000):
+        referenced.update(names)
+    return referenced
+
+
+# 處理前再確認一次這批檔案沒有在掃描期間被新的紀錄引用
+def still_referenced(paths):
+    referenced = set(EnquiryAttachment.objects.filter(file__in=paths).values_list('file', flat=True))
+    for names in StoredBlob.objects.filter(Q(file__in=paths) | Q(thumbnail__in=paths) | Q(preview__in=paths)) \
+            .values_list('file', 'thumbnail', 'preview'):
+        referenced.update(names)
+    return referenced
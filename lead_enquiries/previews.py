@@ -0,0 +1,124 @@
+# lead_enquiries/previews.py
+# 附件的縮圖和預覽圖
+# 上傳後在背景產生，不佔用上傳請求的時間；依檔案的 SHA-256 存放，相同內容只產生一次
+# 圖片用 Pillow 縮圖，PDF 取第一頁 (有安裝 PyMuPDF 就用它，否則用 poppler 的 pdftoppm 指令)
+
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.core.files.base import ContentFile
+
+from main.background import run_in_background
+from .models import StoredBlob
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (240, 240)
+PREVIEW_SIZE = (1200, 1200)
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+PDF_EXTENSIONS = {'.pdf'}
+PDF_RENDER_DPI = 100
+
+
+# 上傳完成後呼叫，還沒產生過才送出背景工作
+def schedule_previews(blob):
+    if blob.preview_status == 'pending':
+        run_in_background(generate_previews, blob.pk)
+
+
+def _open_pdf_first_page(path):
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        fitz = None
+    from PIL import Image
+
+    if fitz is not None:
+        with fitz.open(path) as document:
+            pixmap = document[0].get_pixmap(dpi=PDF_RENDER_DPI)
+            return Image.open(io.BytesIO(pixmap.tobytes('png')))
+
+    if shutil.which('pdftoppm') is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prefix = os.path.join(tmpdir, 'page')
+        subprocess.run(['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png', '-r', str(PDF_RENDER_DPI), path, prefix],
+                       check=True, timeout=60, capture_output=True)
+        with Image.open(prefix + '.png') as image:
+            image.load()
+            return image.copy()
+
+
+# 儲存區不一定是本機檔案 (沒有.path)，這時先複製到暫存檔
+def _render_pdf(blob):
+    try:
+        return _open_pdf_first_page(blob.file.path)
+    except NotImplementedError:
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as tmp:
+            with blob.file.open('rb'):
+                for chunk in blob.file.chunks():
+                    tmp.write(chunk)
+            tmp.flush()
+            return _open_pdf_first_page(tmp.name)
+
+
+def _load_image(blob):
+    from PIL import Image
+
+    extension = os.path.splitext(blob.file.name)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        with blob.file.open('rb'):
+            image = Image.open(blob.file)
+            image.load()
+            return image
+    if extension in PDF_EXTENSIONS:
+        return _render_pdf(blob)
+    return None
+
+
+def _to_jpeg(image, size):
+    resized = image.copy()
+    resized.thumbnail(size)
+    if resized.mode not in ('RGB', 'L'):
+        resized = resized.convert('RGB')
+    buffer = io.BytesIO()
+    resized.save(buffer, 'JPEG', quality=80, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+# 產生縮圖和預覽圖，結果寫回 StoredBlob.preview_status
+def generate_previews(blob_id):
+    blob = StoredBlob.objects.filter(pk=blob_id).first()
+    if blob is None or blob.preview_status == 'ready':
+        return blob
+    try:
+        from PIL import Image  # noqa: F401
+    except ImportError:
+        logger.warning('沒有安裝 Pillow，無法產生附件預覽')
+        return blob
+
+    try:
+        image = _load_image(blob)
+    except Exception:
+        logger.exception('附件 %s 預覽產生失敗', blob.sha256)
+        image = None
+        status = 'failed'
+    else:
+        status = 'ready' if image is not None else 'unsupported'
+
+    if image is not None:
+        # 重新產生時先刪掉舊檔，否則儲存區會另取檔名，舊檔留在硬碟上
+        for field_file in (blob.thumbnail, blob.preview):
+            if field_file:
+                field_file.delete(save=False)
+        blob.thumbnail.save(f'{blob.sha256}_thumb.jpg', _to_jpeg(image, THUMBNAIL_SIZE), save=False)
+        blob.preview.save(f'{blob.sha256}_preview.jpg', _to_jpeg(image, PREVIEW_SIZE), save=False)
+    blob.preview_status = status
+    # 只更新預覽相關欄位，背景執行期間引用次數可能已經變動
+    StoredBlob.objects.filter(pk=blob.pk).update(
+        thumbnail=blob.thumbnail.name, preview=blob.preview.name, preview_status=status)
+    return blob
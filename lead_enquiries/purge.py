@@ -0,0 +1,162 @@
+# lead_enquiries/purge.py
+# 刪除客戶、報價單
+# 直接呼叫 .delete() 時，Django 會先把所有關聯的聯絡人、紀錄、報價單、品項、追蹤、附件讀進記憶體再逐層刪除，
+# 大客戶要刪好幾秒，期間一直佔住 SQLite 的寫入鎖
+# 改成兩階段：
+#   1. 標記刪除 (tombstone)：只寫入 deleted_at，列表、查詢馬上看不到
+#   2. 背景清除 (purge)：每次取一小批 id，用 set-based 的 DELETE 直接刪除，每批一個交易，不會長時間鎖住資料庫
+# 背景工作遺失時可用 python manage.py purge_deleted 補跑
+
+from django.db import transaction
+from django.utils import timezone
+
+from leads.models import PotentialCustomer, Contacts, ContactLogs
+from main.analytics import mark_customers_dirty, mark_enquiries_dirty
+from main.background import run_in_background
+from main.caching import bump_data_version, LEADS_SCOPE, ENQUIRIES_SCOPE
+from main.changes import record_deletions
+from .models import Enquiry, EnquiryItem, EnquiryTrack, EnquiryAttachment, StoredBlob
+
+PURGE_CHUNK_SIZE = 500
+
+
+# 標記刪除客戶，客戶底下的報價單一起標記
+def tombstone_customer(customer):
+    now = timezone.now()
+    with transaction.atomic():
+        PotentialCustomer.all_objects.filter(pk=customer.pk).update(deleted_at=now, updated_at=now)
+        Enquiry.all_objects.filter(potential_customer=customer, deleted_at__isnull=True).update(deleted_at=now,
+                                                                                               updated_at=now)
+        run_in_background(purge_customer, customer.pk)
+    customer.deleted_at = now
+    # .update() 不會觸發signal，要自己讓快取失效、標記銷售分析要重算
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    mark_customers_dirty([customer.pk])
+
+
+# 標記刪除報價單
+def tombstone_enquiry(enquiry):
+    now = timezone.now()
+    with transaction.atomic():
+        Enquiry.all_objects.filter(pk=enquiry.pk).update(deleted_at=now, updated_at=now)
+        run_in_background(purge_enquiry, enquiry.pk)
+    enquiry.deleted_at = now
+    bump_data_version(ENQUIRIES_SCOPE)
+    mark_enquiries_dirty([enquiry.pk])
+
+
+# 批次標記刪除客戶 (列表批次刪除用)，客戶底下的報價單一起標記，整批交給一個背景工作清除
+def tombstone_customers(customer_ids):
+    # 先標記銷售分析要重算，背景工作開始清除後就查不到這些客戶的報價單了
+    mark_customers_dirty(customer_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        count = PotentialCustomer.all_objects.filter(pk__in=customer_ids, deleted_at__isnull=True).update(
+            deleted_at=now, updated_at=now)
+        Enquiry.all_objects.filter(potential_customer_id__in=customer_ids, deleted_at__isnull=True).update(
+            deleted_at=now, updated_at=now)
+        run_in_background(_purge_customers, list(customer_ids))
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    return count
+
+
+# 批次標記刪除報價單
+def tombstone_enquiries(enquiry_ids):
+    mark_enquiries_dirty(enquiry_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        count = Enquiry.all_objects.filter(pk__in=enquiry_ids, deleted_at__isnull=True).update(deleted_at=now,
+                                                                                                updated_at=now)
+        run_in_background(_purge_enquiries, list(enquiry_ids))
+    bump_data_version(ENQUIRIES_SCOPE)
+    return count
+
+
+# 每次取 chunk_size 筆 id，用一個 DELETE ... WHERE id IN (...) 刪除
+# _raw_delete 不會讀出物件、不會觸發 signal、也不處理關聯，呼叫前要先刪掉子資料
+# 不會觸發 post_delete，刪除紀錄 (異動資料流用) 在這裡寫入
+def raw_delete_in_chunks(queryset, chunk_size=PURGE_CHUNK_SIZE):
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            chunk = model._base_manager.filter(pk__in=ids)
+            deleted += chunk._raw_delete(chunk.db)
+            record_deletions(model, ids)
+
+
+# 附件要另外釋放實體檔案 (一般刪除時由 signals.release_attachment_file 處理)
+def _delete_attachments_in_chunks(queryset, chunk_size=PURGE_CHUNK_SIZE):
+    deleted = 0
+    while True:
+        rows = list(queryset.order_by().values_list('pk', 'blob_id', 'file')[:chunk_size])
+        if not rows:
+            return deleted
+        with transaction.atomic():
+            chunk = EnquiryAttachment.objects.filter(pk__in=[pk for pk, blob_id, name in rows])
+            deleted += chunk._raw_delete(chunk.db)
+            StoredBlob.objects.release_many([blob_id for pk, blob_id, name in rows])
+            legacy_files = [name for pk, blob_id, name in rows if not blob_id and name]
+            if legacy_files:
+                storage = EnquiryAttachment._meta.get_field('file').storage
+                transaction.on_commit(lambda names=legacy_files: [storage.delete(name) for name in names])
+
+
+def _purge_enquiry_ids(enquiry_ids, chunk_size):
+    raw_delete_in_chunks(EnquiryItem.objects.filter(enquiry_id__in=enquiry_ids), chunk_size)
+    raw_delete_in_chunks(EnquiryTrack.objects.filter(enquiry_id__in=enquiry_ids), chunk_size)
+    _delete_attachments_in_chunks(EnquiryAttachment.objects.filter(enquiry_id__in=enquiry_ids), chunk_size)
+    return raw_delete_in_chunks(Enquiry.all_objects.filter(pk__in=enquiry_ids), chunk_size)
+
+
+# 清除已標記刪除的報價單和它的品項、追蹤、附件
+def purge_enquiry(enquiry_pk, chunk_size=PURGE_CHUNK_SIZE):
+    if not Enquiry.all_objects.filter(pk=enquiry_pk, deleted_at__isnull=False).exists():
+        return 0
+    deleted = _purge_enquiry_ids([enquiry_pk], chunk_size)
+    bump_data_version(ENQUIRIES_SCOPE)
+    return deleted
+
+
+# 清除已標記刪除的客戶，報價單每次處理 chunk_size 張
+def purge_customer(customer_pk, chunk_size=PURGE_CHUNK_SIZE):
+    if not PotentialCustomer.all_objects.filter(pk=customer_pk, deleted_at__isnull=False).exists():
+        return 0
+    enquiries = Enquiry.all_objects.filter(potential_customer_id=customer_pk)
+    while True:
+        enquiry_ids = list(enquiries.order_by().values_list('pk', flat=True)[:chunk_size])
+        if not enquiry_ids:
+            break
+        _purge_enquiry_ids(enquiry_ids, chunk_size)
+
+    raw_delete_in_chunks(ContactLogs.objects.filter(potential_customer_id=customer_pk), chunk_size)
+    # 聯絡人刪除時其他紀錄的聯絡人欄位設為空 (同 on_delete=SET_NULL)
+    ContactLogs.objects.filter(contact__potential_customer_id=customer_pk).update(contact=None,
+                                                                                 updated_at=timezone.now())
+    raw_delete_in_chunks(Contacts.objects.filter(potential_customer_id=customer_pk), chunk_size)
+    deleted = raw_delete_in_chunks(PotentialCustomer.all_objects.filter(pk=customer_pk), chunk_size)
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    return deleted
+
+
+def _purge_customers(customer_ids):
+    for customer_pk in customer_ids:
+        purge_customer(customer_pk)
+
+
+def _purge_enquiries(enquiry_ids):
+    for enquiry_pk in enquiry_ids:
+        purge_enquiry(enquiry_pk)
+
+
+# 清除所有已標記刪除、還沒清掉的資料，回傳 (客戶數, 報價單數)
+def purge_tombstoned(chunk_size=PURGE_CHUNK_SIZE):
+    customers = enquiries = 0
+    for customer_pk in list(PotentialCustomer.all_objects.filter(deleted_at__isnull=False).values_list('pk', flat=True)):
+        customers += purge_customer(customer_pk, chunk_size)
+    for enquiry_pk in list(Enquiry.all_objects.filter(deleted_at__isnull=False).values_list('pk', flat=True)):
+        enquiries += purge_enquiry(enquiry_pk, chunk_size)
+    return customers, enquiries
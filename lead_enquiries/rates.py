@@ -0,0 +1,68 @@
+# lead_enquiries/rates.py
+# 匯率查詢
+# 匯率表很小，整張讀進記憶體後依幣別、日期查詢
+# 每次查詢先從資料庫取 (筆數, 最後更新時間) 當版本，和記憶體裡的不同才重新讀取，哪個程序改的匯率都會立即生效
+# 新台幣固定為 1
+
+import bisect
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from main.analytics import mark_enquiries_dirty
+from main.caching import bump_data_version, ENQUIRIES_SCOPE
+from .models import CurrencyRate, Enquiry, EnquiryItem
+
+BASE_CURRENCY = 'NTD'
+# 重估匯率時只處理還在進行中的報價單，已成交、已失去的維持當時的匯率
+OPEN_STATUSES = ['untracked', 'tracking']
+
+_lock = threading.Lock()
+_loaded = {'version': None, 'rates': {}}
+
+
+def _load_rates():
+    rates = {}
+    for currency, effective_date, rate in CurrencyRate.objects.order_by('currency', 'effective_date') \
+            .values_list('currency', 'effective_date', 'rate'):
+        dates, values = rates.setdefault(currency, ([], []))
+        dates.append(effective_date)
+        values.append(rate)
+    return rates
+
+
+# 幣別在 on 這天 (預設今天) 的匯率，沒有資料時回傳 None
+def get_rate(currency, on=None):
+    if currency == BASE_CURRENCY:
+        return 1.0
+    version = tuple(CurrencyRate.objects.aggregate(Count('pk'), Max('updated_at')).values())
+    with _lock:
+        if _loaded['version'] != version:
+            _loaded['rates'] = _load_rates()
+            _loaded['version'] = version
+        rates = _loaded['rates']
+    dates, values = rates.get(currency, ([], []))
+    index = bisect.bisect_right(dates, on or timezone.localdate())
+    return values[index - 1] if index else None
+
+
+# 把進行中報價單的品項匯率改成目前的匯率，每個幣別一個 UPDATE；回傳 {幣別: 品項數}
+def revalue_open_enquiries(currencies=None, dry_run=False):
+    results = {}
+    for currency in currencies or CurrencyRate.objects.values_list('currency', flat=True).distinct():
+        rate = get_rate(currency)
+        if rate is None:
+            continue
+        enquiries = Enquiry.objects.filter(status__in=OPEN_STATUSES, potential_customer__currency=currency)
+        items = EnquiryItem.objects.filter(enquiry__in=enquiries).exclude(exchange_rate=rate)
+        if dry_run:
+            results[currency] = items.count()
+            continue
+        with transaction.atomic():
+            mark_enquiries_dirty(items.values('enquiry_id'))
+            results[currency] = items.update(exchange_rate=rate, updated_at=timezone.now())
+    if not dry_run and any(results.values()):
+        bump_data_version(ENQUIRIES_SCOPE)
+    return results
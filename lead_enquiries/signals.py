@@ -0,0 +1,69 @@
+# lead_enquiries/signals.py
+# 報價單號留白時自動編號
+# 報價相關資料有異動時，讓列表/統計的快取失效，並標記銷售分析cube要重算的月份
+# 追蹤紀錄、狀態異動時重算下次追蹤日
+# 附件被刪除時(包含刪除報價單連帶刪除)釋放實體檔案
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from main.analytics import mark_months_dirty, month_of
+from leads.scoring import mark_for_rescore
+from main.caching import bump_data_version, ENQUIRIES_SCOPE
+from .followup import refresh_followup, sync_followup_due
+from .models import Enquiry, EnquiryItem, EnquiryTrack, EnquiryAttachment, StoredBlob
+from .numbering import allocate_bwp_no
+
+
+@receiver(pre_save, sender=Enquiry)
+def assign_bwp_no(sender, instance, raw=False, **kwargs):
+    if not raw and not (instance.bwp_no or '').strip():
+        instance.bwp_no = allocate_bwp_no()
+
+
+@receiver([post_save, post_delete], sender=Enquiry)
+@receiver([post_save, post_delete], sender=EnquiryItem)
+def invalidate_enquiry_cache(sender, **kwargs):
+    bump_data_version(ENQUIRIES_SCOPE)
+
+
+# 報價單、品項異動時，標記報價單建立月份的銷售分析要重算
+@receiver([post_save, post_delete], sender=Enquiry)
+def mark_enquiry_cube_dirty(sender, instance, **kwargs):
+    mark_months_dirty([month_of(instance.created_at)])
+
+
+@receiver([post_save, post_delete], sender=EnquiryItem)
+def mark_item_cube_dirty(sender, instance, **kwargs):
+    created_at = Enquiry.all_objects.filter(pk=instance.enquiry_id).values_list('created_at', flat=True).first()
+    if created_at:
+        mark_months_dirty([month_of(created_at)])
+
+
+# 刪除品項會改變報價、成交金額，讓下次增量評分重算這個客戶
+@receiver(post_delete, sender=EnquiryItem)
+def rescore_after_item_delete(sender, instance, **kwargs):
+    mark_for_rescore(Enquiry.all_objects.filter(pk=instance.enquiry_id).values('potential_customer_id'))
+
+
+# 報價單存檔時 (狀態可能改變) 重算下次追蹤日
+@receiver(post_save, sender=Enquiry)
+def update_enquiry_followup_due(sender, instance, **kwargs):
+    sync_followup_due(instance)
+
+
+# 追蹤紀錄新增、修改、刪除時重算最後追蹤時間
+@receiver([post_save, post_delete], sender=EnquiryTrack)
+def update_enquiry_last_tracked(sender, instance, **kwargs):
+    refresh_followup([instance.enquiry_id])
+
+
+# 去重存放的附件只減少引用次數，舊路徑的附件直接刪檔
+@receiver(post_delete, sender=EnquiryAttachment)
+def release_attachment_file(sender, instance, **kwargs):
+    if instance.blob_id:
+        StoredBlob.objects.release(instance.blob_id)
+    elif instance.file:
+        file = instance.file
+        transaction.on_commit(lambda: file.delete(save=False))
@@ -0,0 +1,34 @@
+# lead_enquiries/uploadhandlers.py
+# 上傳檔案時一邊接收 chunk 一邊計算 SHA-256，存檔去重時就不用再把整個檔案讀一遍
+# 在 settings.FILE_UPLOAD_HANDLERS 取代 Django 預設的兩個處理器
+
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingUploadMixin:
+    def new_file(self, *args, **kwargs):
+        # 要在 super() 之前建立，記憶體處理器啟用時 super() 會丟出 StopFutureHandlers
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+# 小檔案 (預設 2.5MB 以下) 放在記憶體
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+# 大檔案邊收邊寫入暫存檔，不會整個讀進記憶體
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
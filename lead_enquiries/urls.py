@@ -9,22 +9,35 @@ urlpatterns = [
     # 報價單 CRUD
     path('', views.enquiry_list, name='enquiry_list'),
     path('create/', views.enquiry_create, name='enquiry_create'),
+    path('bulk/', views.enquiry_bulk, name='enquiry_bulk'),
     path('detail/<int:pk>/', views.enquiry_detail, name='enquiry_detail'),
     path('detail/<int:pk>/update/', views.enquiry_update, name='enquiry_update'),
     path('delete/<int:pk>/', views.enquiry_delete, name='enquiry_delete'),
+    path('followup/', views.followup_queue, name='followup_queue'),
     # 報價單品項 - AJAX
     path('detail/<int:enquiry_pk>/items/add/', views.enquiry_item_create, name='enquiry_item_create'),
     path('items/update/<int:pk>/', views.enquiry_item_update, name='enquiry_item_update'),
     path('items/delete/<int:pk>/', views.enquiry_item_delete, name='enquiry_item_delete'),
+    path('detail/<int:pk>/items/grid/', views.enquiry_items_grid, name='enquiry_items_grid'),
+    path('products/prices/', views.product_price_history, name='product_price_history'),
     # 報價單追蹤 - AJAX
     path('detail/<int:enquiry_pk>/tracks/add/', views.enquiry_track_create, name='enquiry_track_create'),
     path('tracks/update/<int:pk>/', views.enquiry_track_update, name='enquiry_track_update'),
     path('tracks/delete/<int:pk>/', views.enquiry_track_delete, name='enquiry_track_delete'),
     # 重點追蹤功能
     path('detail/<int:pk>/toggle_pin/', views.toggle_enquiry_pin, name='toggle_enquiry_pin'),
+    path('detail/<int:pk>/patch/', views.enquiry_patch, name='enquiry_patch'),
+    path('archived/<int:pk>/restore/', views.archived_enquiry_restore, name='archived_enquiry_restore'),
     # 匯出 CSV
     path('export_csv/', views.export_enquiries_csv, name='export_enquiries_csv'),
     path('detail/<int:enquiry_pk>/attachments/upload/', views.enquiry_attachment_upload,
          name='enquiry_attachment_upload'),
+    path('attachments/<int:pk>/download/', views.enquiry_attachment_download, name='enquiry_attachment_download'),
+    path('attachments/<int:pk>/thumbnail/', views.enquiry_attachment_preview, {'kind': 'thumbnail'},
+         name='enquiry_attachment_thumbnail'),
+    path('attachments/<int:pk>/preview/', views.enquiry_attachment_preview, {'kind': 'preview'},
+         name='enquiry_attachment_preview'),
+    path('detail/<int:pk>/attachments/zip/', views.enquiry_attachments_zip, name='enquiry_attachments_zip'),
+    path('customers/<int:customer_pk>/attachments/zip/', views.customer_attachments_zip, name='customer_attachments_zip'),
     path('attachments/delete/<int:pk>/', views.enquiry_attachment_delete, name='enquiry_attachment_delete'),
 ]
\ No newline at end of file
@@ -1,28 +1,63 @@
 # lead_enquiries/views.py
 
 import csv
+import hashlib
+import re
 
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.db.models import Q, Sum, F, ExpressionWrapper, FloatField
+from django.db import transaction
+from django.db.models import Q, Sum, F, ExpressionWrapper, FloatField, Count
 # Q,F,ExpressionWrapper使用場合還要再多練習
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponse, Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import escape_uri_path
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_http_methods, require_POST
 
 from leads.models import PotentialCustomer
-from .forms import EnquiryForm,EnquiryItemForm,EnquiryTrackForm,EnquiryAttachmentForm
-from .models import Enquiry, EnquiryItem, EnquiryTrack, STATUS_CHOICES, EnquiryAttachment
-from django.contrib.auth.models import User
+from leads.scoring import mark_for_rescore
+from main.analytics import mark_enquiries_dirty
+from main.caching import bump_data_version, get_or_compute, ENQUIRIES_SCOPE
+from main.facets import compute_facets, facet_options
+from main.inline_edit import PatchError, TOGGLE, parse_patch, clean_value, set_field, toggle_field
+from main.transitions import record_transition, ENQUIRY
+from .bulk import apply_bulk_action, BULK_ACTIONS
+from .catalog import last_quoted_prices
+from .downloads import serve_file
+from .followup import due_enquiries, refresh_followup
+from .previews import schedule_previews
+from .archive import ArchiveConflict, restore_enquiry
+from .purge import tombstone_enquiry, raw_delete_in_chunks
+from .forms import EnquiryForm,EnquiryItemForm,EnquiryTrackForm,EnquiryAttachmentForm,EnquiryItemFormSet
+from .zipstream import iter_zip, unique_arcname
+from .models import Enquiry, EnquiryItem, EnquiryTrack, STATUS_CHOICES, EnquiryAttachment, StoredBlob, ArchivedEnquiry, \
+    Product, product_lookup_key
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
 
 
 # 輔助函式
 
+# 關鍵字搜尋條件，列表和篩選器筆數共用
+# 因為會join品項，呼叫端要自己處理重複(distinct)
+def _apply_enquiry_keyword(queryset, query):
+    # Q 用來做多條件判斷
+    if query:
+        queryset = queryset.filter(
+            Q(bwp_no__icontains=query) |
+            Q(potential_customer__company_name__icontains=query) |
+            Q(enquiry_no__icontains=query) |
+            Q(items__item_name__icontains=query)
+        )
+    return queryset
+
 # 處理報價單 (Enquiry) 的查詢、過濾和排序邏輯。
 def _get_filtered_enquiries_queryset(request):
 
@@ -32,14 +67,9 @@ def _get_filtered_enquiries_queryset(request):
     sort_field = request.GET.get('sort', 'created_at')
     sort_order = request.GET.get('order', 'desc')
     enquiries = Enquiry.objects.select_related('potential_customer', 'created_by').all()
-    # 篩選區, Q 用來做多條件判斷
+    # 篩選區
     if query:
-        enquiries = enquiries.filter(
-            Q(bwp_no__icontains=query) |
-            Q(potential_customer__company_name__icontains=query) |
-            Q(enquiry_no__icontains=query) |
-            Q(items__item_name__icontains=query)
-        ).distinct()
+        enquiries = _apply_enquiry_keyword(enquiries, query).distinct()
     if status_filter:
         enquiries = enquiries.filter(status=status_filter)
     if owner_filter:
@@ -58,11 +88,49 @@ def _get_filtered_enquiries_queryset(request):
             )
         )
 
+    # 客戶名稱改用預先算好、有索引的排序鍵
+    if sort_by == 'potential_customer__company_name':
+        sort_by = 'potential_customer__company_sort_key'
+
     if sort_order == 'desc':
         sort_by = '-' + sort_by
 
-    return enquiries.order_by(sort_by)
+    return enquiries.order_by(sort_by, 'pk')
+
+# 篩選器的維度和對應欄位，key同時也是GET參數名稱
+ENQUIRY_FACET_FIELDS = {
+    'status': 'status',
+    'owner': 'created_by__username',
+}
+
+# 計算各篩選器選項的筆數，一次GROUP BY算完，結果依資料版本快取
+# 關鍵字會join品項，所以要用distinct計數避免同一張報價單被算多次
+def _get_enquiry_facets(request):
+    query = request.GET.get('q', '')
+    active_filters = {name: request.GET.get(name, '') for name in ENQUIRY_FACET_FIELDS}
 
+    def compute():
+        base = _apply_enquiry_keyword(Enquiry.objects.all(), query)
+        facets, total = compute_facets(base, ENQUIRY_FACET_FIELDS, active_filters,
+                                       count=Count('pk', distinct=True))
+        return {'facets': facets, 'total': total}
+
+    return get_or_compute('enquiry_facets', [ENQUIRIES_SCOPE], dict(active_filters, q=query), compute)
+
+# 勾選「包含已封存」時才查詢封存表，套用相同的關鍵字和篩選條件，用 archived_page 參數另外分頁
+ARCHIVED_PAGE_SIZE = 20
+
+def _get_archived_enquiries(request):
+    archived = ArchivedEnquiry.objects.select_related('created_by')
+    query = request.GET.get('q', '')
+    if query:
+        archived = archived.filter(Q(bwp_no__icontains=query) | Q(company_name__icontains=query))
+    if request.GET.get('status', ''):
+        archived = archived.filter(status=request.GET['status'])
+    if request.GET.get('owner', ''):
+        archived = archived.filter(created_by__username=request.GET['owner'])
+    paginator = Paginator(archived.order_by('-archived_at', 'pk'), ARCHIVED_PAGE_SIZE)
+    return paginator.get_page(request.GET.get('archived_page'))
 
 
 # 報價單
@@ -79,8 +147,11 @@ def enquiry_list(request):
         )
     )
 
-    owners = User.objects.filter(enquiry__in=Enquiry.objects.all()).distinct()
+    facet_data = _get_enquiry_facets(request)
+    facets = facet_data['facets']
+    # 總筆數已經在facet查詢算好了，省下Paginator的COUNT查詢
     paginator = Paginator(enquiries_with_total, 20)
+    paginator.count = facet_data['total']
     page = request.GET.get('page')
 
     try:
@@ -90,25 +161,53 @@ def enquiry_list(request):
     except EmptyPage:
         enquiries_page = paginator.page(paginator.num_pages)
 
-    status_choices = STATUS_CHOICES
+    # 篩選器選項 (value, label, count)，建立者選項直接從facet結果取得
+    owner_filter = request.GET.get('owner', '')
+    owner_names = sorted({name for name in facets['owner'] if name} | ({owner_filter} if owner_filter else set()))
+    owner_options = [(name, name, facets['owner'].get(name, 0)) for name in owner_names]
+
+    include_archived = request.GET.get('archived') == '1'
 
     context = {
         'enquiries': enquiries_page,
+        'include_archived': include_archived,
+        'include_archived_flag': '1' if include_archived else '',  # 分頁、排序連結要保留勾選狀態
+        'archived_enquiries': _get_archived_enquiries(request) if include_archived else None,
         'query': request.GET.get('q', ''),
         'status_filter': request.GET.get('status', ''),
-        'owner_filter': request.GET.get('owner', ''),
-        'owners': owners,
+        'owner_filter': owner_filter,
+        'owner_options': owner_options,
         'sort_field': request.GET.get('sort', 'created_at'),
         'sort_order': request.GET.get('order', 'desc'),
-        'status_choices': status_choices,
+        'status_options': facet_options(STATUS_CHOICES, facets['status']),
+        'status_choices': STATUS_CHOICES,
+        'bulk_actions': BULK_ACTIONS,
     }
     return render(request, 'lead_enquiries/enquiry_list.html', context)
 
+# 待追蹤清單：今天到期和已逾期的報價單，預設只列自己建立的
+@login_required
+def followup_queue(request):
+    today = timezone.localdate()
+    show_all = request.GET.get('all') == '1'
+    enquiries = due_enquiries(today).select_related('potential_customer', 'created_by')
+    if not show_all:
+        enquiries = enquiries.filter(created_by=request.user)
+
+    overdue, due_today = [], []
+    for enquiry in enquiries:
+        enquiry.days_overdue = (today - enquiry.next_followup_due).days
+        (overdue if enquiry.days_overdue > 0 else due_today).append(enquiry)
+
+    context = {'overdue': overdue, 'due_today': due_today, 'show_all': show_all, 'today': today}
+    return render(request, 'lead_enquiries/followup_queue.html', context)
+
 # 報價詳細頁
 @login_required
 def enquiry_detail(request, pk):
     enquiry = get_object_or_404(Enquiry, pk=pk)
-    context = {'enquiry': enquiry}
+    attachments = enquiry.attachments.select_related('blob', 'uploaded_by')
+    context = {'enquiry': enquiry, 'attachments': attachments}
     return render(request, 'lead_enquiries/enquiry_detail.html', context)
 
 # 建立報價
@@ -133,6 +232,7 @@ def enquiry_create(request):
                 enquiry.potential_customer = initial_data['potential_customer']
 
             enquiry.save()
+            record_transition(ENQUIRY, enquiry, '', enquiry.status, request.user)
 
             LogEntry.objects.log_action(
                 user_id=request.user.id,
@@ -157,9 +257,11 @@ def enquiry_update(request, pk):
         return HttpResponseForbidden("您沒有權限編輯此報價單。")
 
     if request.method == 'POST':
+        old_status = enquiry.status  # 表單驗證時會改寫instance，先記下原狀態
         form = EnquiryForm(request.POST, instance=enquiry)
         if form.is_valid():
             updated_enquiry = form.save()
+            record_transition(ENQUIRY, updated_enquiry, old_status, updated_enquiry.status, request.user)
             LogEntry.objects.log_action(user_id=request.user.id,
                                         content_type_id=ContentType.objects.get_for_model(updated_enquiry).id,
                                         object_id=updated_enquiry.pk, object_repr=str(updated_enquiry),
@@ -179,7 +281,8 @@ def enquiry_delete(request, pk):
 
     if request.method == 'POST':
         enquiry_repr = str(enquiry)
-        enquiry.delete()
+        # 先標記刪除，品項、追蹤、附件由背景工作分批清除
+        tombstone_enquiry(enquiry)
         LogEntry.objects.log_action(user_id=request.user.id,
                                     content_type_id=ContentType.objects.get_for_model(Enquiry).id, object_id=pk,
                                     object_repr=enquiry_repr, action_flag=DELETION, change_message="刪除報價單")
@@ -189,18 +292,98 @@ def enquiry_delete(request, pk):
     html_form = render_to_string('lead_enquiries/enquiry_delete_modal.html', context, request=request)
     return JsonResponse({'html_form': html_form})
 
+# 還原封存的報價單，連同品項、追蹤和附件
+@login_required
+def archived_enquiry_restore(request, pk):
+    archived = get_object_or_404(ArchivedEnquiry, pk=pk)
+    if archived.created_by_id != request.user.id:
+        return HttpResponseForbidden("您沒有權限還原此報價單。")
+    if request.method != 'POST':
+        return redirect(reverse('lead_enquiries:enquiry_list') + '?archived=1')
+    try:
+        enquiry = restore_enquiry(archived)
+    except ArchiveConflict as e:
+        return HttpResponse(str(e), status=409)
+
+    LogEntry.objects.log_action(user_id=request.user.id,
+                                content_type_id=ContentType.objects.get_for_model(enquiry).id, object_id=enquiry.pk,
+                                object_repr=str(enquiry), action_flag=CHANGE, change_message="還原封存報價單")
+    return redirect('lead_enquiries:enquiry_detail', pk=enquiry.pk)
+
+# 列表批次操作：勾選的報價單，或勾選「全部符合條件」時套用目前的篩選條件 (篩選條件放在 query string 一起送出)
+@login_required
+@require_POST
+def enquiry_bulk(request):
+    if request.POST.get('scope') == 'all':
+        queryset = _get_filtered_enquiries_queryset(request)
+    else:
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        queryset = Enquiry.objects.filter(pk__in=ids)
+    action = request.POST.get('action', '')
+    try:
+        done, skipped = apply_bulk_action(queryset, action, request.POST.get('value', ''), request.user)
+    except PatchError as e:
+        messages.error(request, str(e))
+    else:
+        message = f"已{BULK_ACTIONS[action]} {done} 張報價單"
+        if skipped:
+            message += f"，{skipped} 張不是您建立的報價單已略過"
+        messages.success(request, message)
+    return redirect(reverse('lead_enquiries:enquiry_list') + '?' + request.GET.urlencode())
+
 # 加入關注
+# 用一個 UPDATE 在資料庫裡取反，不讀出整筆再 save()，同時點兩次也不會互相蓋掉
 @login_required
 def toggle_enquiry_pin(request, pk):
     enquiry = get_object_or_404(Enquiry, pk=pk)
-    enquiry.is_pinned = not enquiry.is_pinned
-    enquiry.save()
-    change_message = "重點追蹤報價單" if enquiry.is_pinned else "取消重點追蹤報價單"
+    is_pinned = toggle_field(Enquiry.objects, pk, 'is_pinned')
+    bump_data_version(ENQUIRIES_SCOPE)
+    change_message = "重點追蹤報價單" if is_pinned else "取消重點追蹤報價單"
     LogEntry.objects.log_action(user_id=request.user.id, content_type_id=ContentType.objects.get_for_model(enquiry).id,
                                 object_id=enquiry.pk, object_repr=str(enquiry), action_flag=CHANGE,
                                 change_message=change_message)
     return redirect('lead_enquiries:enquiry_detail', pk=pk)
 
+# 列表上可直接修改的欄位；重點追蹤和 toggle_enquiry_pin 一樣所有人都能切換，狀態只有建立者能改
+ENQUIRY_PATCH_FIELDS = {'status', 'is_pinned'}
+ENQUIRY_TOGGLE_FIELDS = {'is_pinned'}
+ENQUIRY_OPEN_FIELDS = {'is_pinned'}
+
+# 列表上修改報價單的單一欄位 (PATCH)，只寫入這個欄位，回傳更新後的儲存格
+@login_required
+@require_http_methods(['PATCH'])
+def enquiry_patch(request, pk):
+    enquiry = get_object_or_404(Enquiry, pk=pk)
+    try:
+        field, value = parse_patch(request, ENQUIRY_PATCH_FIELDS)
+        if field not in ENQUIRY_OPEN_FIELDS and enquiry.created_by_id != request.user.id:
+            return HttpResponseForbidden("您沒有權限編輯此報價單。")
+        if field in ENQUIRY_TOGGLE_FIELDS and value == TOGGLE:
+            toggle_field(Enquiry.objects, pk, field)
+            old_value = None
+        else:
+            old_value = set_field(Enquiry.objects, pk, field, clean_value(Enquiry, field, value))
+    except PatchError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Enquiry.DoesNotExist:
+        raise Http404
+
+    # .update() 不會觸發signal，要自己讓快取失效；狀態會影響銷售分析 (成交金額) 和下次追蹤日
+    bump_data_version(ENQUIRIES_SCOPE)
+    if field == 'status':
+        mark_enquiries_dirty([pk])
+        refresh_followup([pk])
+    enquiry.refresh_from_db()
+    if field == 'status':
+        record_transition(ENQUIRY, enquiry, old_value, enquiry.status, request.user)
+
+    LogEntry.objects.log_action(user_id=request.user.id, content_type_id=ContentType.objects.get_for_model(enquiry).id,
+                                object_id=enquiry.pk, object_repr=str(enquiry), action_flag=CHANGE,
+                                change_message=f"修改報價單的{Enquiry._meta.get_field(field).verbose_name}")
+    html = render_to_string('lead_enquiries/enquiry_cell.html', {'enquiry': enquiry, 'field': field,
+                                                             'status_choices': STATUS_CHOICES}, request=request)
+    return JsonResponse({'success': True, 'html': html})
+
 
 
 # 報價單品項 - AJAX Modals
@@ -208,7 +391,7 @@ def toggle_enquiry_pin(request, pk):
 def enquiry_item_create(request, enquiry_pk):
     enquiry = get_object_or_404(Enquiry, pk=enquiry_pk)
     if request.method == 'POST':
-        form = EnquiryItemForm(request.POST)
+        form = EnquiryItemForm(request.POST, currency=enquiry.currency)
         if form.is_valid():
             item = form.save(commit=False)
             item.enquiry = enquiry
@@ -219,7 +402,7 @@ def enquiry_item_create(request, enquiry_pk):
                                         change_message=f"為報價單 {enquiry.bwp_no} 新增品項")
             return JsonResponse({'success': True})
     else:
-        form = EnquiryItemForm()
+        form = EnquiryItemForm(currency=enquiry.currency)
 
     context = {'form': form, 'enquiry': enquiry,
                'form_action': reverse('lead_enquiries:enquiry_item_create', args=[enquiry_pk])}
@@ -235,7 +418,7 @@ def enquiry_item_update(request, pk):
         return HttpResponseForbidden("您沒有權限編輯此報價單的品項。")
 
     if request.method == 'POST':
-        form = EnquiryItemForm(request.POST, instance=item)
+        form = EnquiryItemForm(request.POST, instance=item, currency=item.enquiry.currency)
         if form.is_valid():
             form.save()
             LogEntry.objects.log_action(user_id=request.user.id,
@@ -244,7 +427,7 @@ def enquiry_item_update(request, pk):
                                         change_message=f"編輯報價單 {item.enquiry.bwp_no} 的品項")
             return JsonResponse({'success': True})
     else:
-        form = EnquiryItemForm(instance=item)
+        form = EnquiryItemForm(instance=item, currency=item.enquiry.currency)
 
     context = {'form': form, 'enquiry': item.enquiry,
                'form_action': reverse('lead_enquiries:enquiry_item_update', args=[pk])}
@@ -271,6 +454,90 @@ def enquiry_item_delete(request, pk):
 
 
 
+# 批次編輯的品項寫入：新增、修改、刪除各一次批次操作，回傳 (新增, 修改, 刪除) 筆數
+# bulk 操作不會觸發 signal，要自己連結產品、讓快取失效、標記銷售分析要重算
+def _save_item_grid(enquiry, formset):
+    formset.save(commit=False)
+    new_items = formset.new_objects
+    changed_items = [item for item, _ in formset.changed_objects]
+    deleted_ids = [item.pk for item in formset.deleted_objects]
+    for item in new_items:
+        item.enquiry = enquiry
+    # bulk_update 不會更新 auto_now 欄位
+    now = timezone.now()
+    for item in changed_items:
+        item.updated_at = now
+
+    with transaction.atomic():
+        Product.objects.link_items(new_items + changed_items)
+        EnquiryItem.objects.bulk_create(new_items, batch_size=500)
+        fields = list(formset.form._meta.fields) + ['product', 'updated_at']
+        EnquiryItem.objects.bulk_update(changed_items, fields, batch_size=500)
+        raw_delete_in_chunks(EnquiryItem.objects.filter(enquiry=enquiry, pk__in=deleted_ids))
+        if deleted_ids:
+            mark_for_rescore([enquiry.potential_customer_id])
+    if new_items or changed_items or deleted_ids:
+        bump_data_version(ENQUIRIES_SCOPE)
+        mark_enquiries_dirty([enquiry.pk])
+    return len(new_items), len(changed_items), len(deleted_ids)
+
+# 批次編輯報價品項 - 整張表格 (可從 Excel 貼上) 一次送出，只寫一筆操作紀錄
+@login_required
+def enquiry_items_grid(request, pk):
+    enquiry = get_object_or_404(Enquiry, pk=pk)
+    if enquiry.created_by != request.user:
+        return HttpResponseForbidden("您沒有權限編輯此報價單的品項。")
+
+    items = EnquiryItem.objects.filter(enquiry=enquiry).order_by('pk')
+    form_kwargs = {'currency': enquiry.currency}
+    if request.method == 'POST':
+        formset = EnquiryItemFormSet(request.POST, queryset=items, form_kwargs=form_kwargs)
+        if formset.is_valid():
+            added, changed, deleted = _save_item_grid(enquiry, formset)
+            if added or changed or deleted:
+                LogEntry.objects.log_action(user_id=request.user.id,
+                                            content_type_id=ContentType.objects.get_for_model(enquiry).id,
+                                            object_id=enquiry.pk, object_repr=str(enquiry), action_flag=CHANGE,
+                                            change_message=f"批次編輯報價單 {enquiry.bwp_no} 的品項："
+                                                           f"新增 {added} 筆、修改 {changed} 筆、刪除 {deleted} 筆")
+            return redirect('lead_enquiries:enquiry_detail', pk=enquiry.pk)
+    else:
+        formset = EnquiryItemFormSet(queryset=items, form_kwargs=form_kwargs)
+
+    context = {'enquiry': enquiry, 'formset': formset}
+    return render(request, 'lead_enquiries/item_grid.html', context)
+
+# 產品歷史報價查詢 - 品項表單輸入名稱、規格、材質後呼叫，回傳最近幾次的報價和進價
+# customer 有帶時只查該客戶的報價
+@login_required
+def product_price_history(request):
+    key = product_lookup_key(request.GET.get('name'), request.GET.get('spec'), request.GET.get('material'))
+    product = Product.objects.filter(lookup_key=key).first()
+    if product is None:
+        return JsonResponse({'product': None, 'prices': []})
+
+    customer_id = request.GET.get('customer', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 5)), 1), 20)
+    except ValueError:
+        limit = 5
+    prices = [{
+        'bwp_no': row['enquiry__bwp_no'],
+        'enquiry_url': reverse('lead_enquiries:enquiry_detail', args=[row['enquiry_id']]),
+        'date': timezone.localtime(row['enquiry__created_at']).strftime('%Y-%m-%d'),
+        'company_name': row['enquiry__potential_customer__company_name'],
+        'currency': row['enquiry__potential_customer__currency'],
+        'unit_price': row['unit_price'],
+        'exchange_rate': row['exchange_rate'],
+        'quantity': row['quantity'],
+        'cost': row['cost'],
+        'cost_rate': row['cost_rate'],
+        'supplier': row['supplier'],
+    } for row in last_quoted_prices(product, customer_id if customer_id.isdigit() else None, limit)]
+    return JsonResponse({'product': {'id': product.pk, 'name': str(product)}, 'prices': prices})
+
+
+
 # 報價單追蹤 - AJAX Modals
 @login_required
 def enquiry_track_create(request, enquiry_pk):
@@ -357,18 +624,40 @@ def export_enquiries_csv(request):
     return response
 
 # 上傳附件
+# 前端會先送出檔案的SHA-256，伺服器已經有相同內容的檔案就直接建立附件，不必再上傳一次
+# 沒有的話回傳upload_required，前端再送出完整檔案；檔案內容依hash去重存放
 @login_required
 def enquiry_attachment_upload(request, enquiry_pk):
     enquiry = get_object_or_404(Enquiry, pk=enquiry_pk)
 
     if request.method == 'POST':
+        sha256 = request.POST.get('sha256', '').lower()
+        if 'file' not in request.FILES and SHA256_PATTERN.match(sha256):
+            blob = StoredBlob.objects.acquire(sha256)
+            if blob is None:
+                return JsonResponse({'success': False, 'upload_required': True})
+            attachment = EnquiryAttachment(
+                enquiry=enquiry,
+                description=request.POST.get('description', '')[:255],
+                uploaded_by=request.user,
+            )
+            attachment.attach_blob(blob, request.POST.get('file_name', ''))
+            attachment.save()
+            schedule_previews(blob)
+            return JsonResponse({'success': True, 'deduplicated': True})
+
         # 記得要傳入 request.FILES 來處理檔案
         form = EnquiryAttachmentForm(request.POST, request.FILES)
         if form.is_valid():
             attachment = form.save(commit=False)
             attachment.enquiry = enquiry
             attachment.uploaded_by = request.user
+            uploaded_file = form.cleaned_data['file']
+            blob = StoredBlob.objects.store(uploaded_file)
+            attachment.attach_blob(blob, uploaded_file.name)
             attachment.save()
+            # 縮圖、預覽圖在背景產生，不讓使用者等
+            schedule_previews(blob)
             return JsonResponse({'success': True})
     else:
         form = EnquiryAttachmentForm()
@@ -377,21 +666,88 @@ def enquiry_attachment_upload(request, enquiry_pk):
     html_form = render_to_string('lead_enquiries/attachment_form_modal.html', context, request=request)
     return JsonResponse({'html_form': html_form})
 
+# 附件的ETag，去重存放的附件直接用內容的SHA-256，舊附件用路徑、大小和修改時間組成
+def _attachment_etag(attachment):
+    if attachment.blob_id:
+        return attachment.blob.sha256
+    storage = attachment.file.storage
+    raw = f'{attachment.file.name}:{storage.size(attachment.file.name)}:{storage.get_modified_time(attachment.file.name).timestamp()}'
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+# 未刪除報價單的附件，標記刪除後、背景清除前的附件不能再下載
+def _live_attachments():
+    return EnquiryAttachment.objects.filter(enquiry__deleted_at__isnull=True)
+
+# 下載附件
+# 取代原本只有DEBUG才有的MEDIA路徑，需登入才能下載
+# 支援Range續傳和If-None-Match，設定ATTACHMENT_SENDFILE_BACKEND後改由前端代理伺服器傳檔
+@login_required
+def enquiry_attachment_download(request, pk):
+    attachment = get_object_or_404(_live_attachments().select_related('blob'), pk=pk)
+    if not attachment.file or not attachment.file.storage.exists(attachment.file.name):
+        raise Http404("找不到附件檔案")
+    return serve_file(request, attachment.file, str(attachment), _attachment_etag(attachment),
+                      as_attachment=request.GET.get('download') == '1')
+
+# 附件的縮圖 (thumbnail) 或預覽圖 (preview)
+# 依內容hash存放，內容不會改變，可以讓瀏覽器長期快取
+@login_required
+def enquiry_attachment_preview(request, pk, kind):
+    attachment = get_object_or_404(_live_attachments().select_related('blob'), pk=pk)
+    blob = attachment.blob
+    if blob is None or blob.preview_status != 'ready':
+        raise Http404("此附件沒有預覽圖")
+    field_file = blob.thumbnail if kind == 'thumbnail' else blob.preview
+    if not field_file or not field_file.storage.exists(field_file.name):
+        raise Http404("找不到預覽圖")
+    return serve_file(request, field_file, f'{kind}.jpg', f'{blob.sha256}-{kind}',
+                      cache_control='private, max-age=31536000, immutable')
+
+# 把附件包成ZIP串流下載，檔案找不到的附件直接略過
+# with_folder: 依報價單號分資料夾 (客戶的所有報價單一起打包時使用)
+def _attachments_zip_response(attachments, filename, with_folder=False):
+    def entries():
+        used_names = set()
+        for attachment in attachments:
+            if not attachment.file or not attachment.file.storage.exists(attachment.file.name):
+                continue
+            name = str(attachment).replace('/', '_').replace('\\', '_')
+            if with_folder:
+                name = f'{attachment.enquiry.bwp_no}/{name}'
+            yield unique_arcname(name, used_names), attachment.file, attachment.uploaded_at
+
+    response = StreamingHttpResponse(iter_zip(entries()), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+# 打包下載報價單的所有附件
+@login_required
+def enquiry_attachments_zip(request, pk):
+    enquiry = get_object_or_404(Enquiry, pk=pk)
+    attachments = list(enquiry.attachments.order_by('pk'))
+    return _attachments_zip_response(attachments, f'{enquiry.bwp_no}_附件.zip')
+
+# 打包下載客戶所有報價單的附件
+@login_required
+def customer_attachments_zip(request, customer_pk):
+    customer = get_object_or_404(PotentialCustomer, pk=customer_pk)
+    attachments = list(EnquiryAttachment.objects.filter(enquiry__potential_customer=customer, enquiry__deleted_at__isnull=True)
+                       .select_related('enquiry').order_by('enquiry__bwp_no', 'pk'))
+    return _attachments_zip_response(attachments, f'{customer.company_name}_附件.zip', with_folder=True)
+
 # 刪除附件
 @login_required
 def enquiry_attachment_delete(request, pk):
-    attachment = get_object_or_404(EnquiryAttachment, pk=pk)
+    attachment = get_object_or_404(_live_attachments(), pk=pk)
 
     if attachment.uploaded_by != request.user:
         return HttpResponseForbidden("您沒有權限刪除此附件。")
 
     if request.method == 'POST':
-        # 刪除檔案本身
-        attachment.file.delete(save=False)
-        # 刪除資料庫紀錄
+        # 刪除資料庫紀錄，實體檔案由signals釋放(去重存放的檔案沒有其他附件引用時才會刪除)
         attachment.delete()
         return JsonResponse({'success': True})
 
     context = {'attachment': attachment}
     html_form = render_to_string('lead_enquiries/attachment_delete_modal.html', context, request=request)
-    return JsonResponse({'html_form': html_form})
\ No newline at end of file
+    return JsonResponse({'html_form': html_form})
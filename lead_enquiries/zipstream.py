@@ -0,0 +1,85 @@
+# lead_enquiries/zipstream.py
+# 邊讀檔邊產生 ZIP 串流，不寫暫存檔，不論打包多少檔案，記憶體只需要一個 chunk 的大小
+# zipfile 寫到不能 seek 的物件時，會在每個檔案後面加上 data descriptor，所以可以一路往後寫
+
+import os
+import zipfile
+
+from django.utils import timezone
+
+CHUNK_SIZE = 64 * 1024
+
+# 本身已經壓縮過的格式，再壓一次只是浪費CPU，直接存入 (ZIP_STORED)
+STORED_EXTENSIONS = {
+    '.zip', '.7z', '.rar', '.gz', '.bz2', '.xz',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.pdf', '.docx', '.xlsx', '.pptx', '.dwg', '.mp4', '.mov',
+}
+
+
+# 給 zipfile 寫入用的檔案物件，只暫存寫進來的資料，由 generator 取走後清空
+# 有 tell() 沒有 seek()，zipfile 會改用串流模式
+class _ZipOutput:
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# ZIP 的時間格式最早只到 1980 年，用當地時間
+def _zip_date_time(value):
+    value = timezone.localtime(value) if value else timezone.localtime()
+    return max(value.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+
+
+# entries: (壓縮檔內的路徑, FieldFile, 修改時間) 的 iterable
+# 回傳 bytes 的 generator，直接給 StreamingHttpResponse 用
+def iter_zip(entries):
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, 'w') as archive:
+        for arcname, field_file, modified in entries:
+            info = zipfile.ZipInfo(arcname, date_time=_zip_date_time(modified))
+            extension = os.path.splitext(arcname)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            # 先告訴 zipfile 檔案大小，超過 4GB 時才會自動用 ZIP64
+            info.file_size = field_file.size
+            with field_file.open('rb'), archive.open(info, 'w') as dest:
+                for chunk in field_file.chunks(CHUNK_SIZE):
+                    dest.write(chunk)
+                    yield from _drain(output)
+            yield from _drain(output)
+    # 最後的中央目錄
+    yield from _drain(output)
+
+
+def _drain(output):
+    data = output.drain()
+    if data:
+        yield data
+
+
+# 避免同名檔案在壓縮檔中互相覆蓋，重複的檔名加上 (2)、(3)...
+def unique_arcname(name, used):
+    base, extension = os.path.splitext(name)
+    candidate = name
+    counter = 2
+    while candidate.lower() in used:
+        candidate = f'{base} ({counter}){extension}'
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LeadsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'leads'
+
+    # 註冊快取失效用的 signals
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,83 @@
+# leads/bulk.py
+# 客戶列表的批次操作 (修改狀態、評級、負責業務、置頂、刪除)
+# 勾選的客戶或符合目前篩選條件的全部客戶，分批用 UPDATE ... WHERE id IN (...) 寫入 (見main/bulk.py)
+# 權限和單筆操作相同：置頂所有人都能改，其他操作只處理自己負責的客戶，其餘略過
+# .update() 不會觸發signal，要自己讓快取失效、標記銷售分析要重算、記錄狀態變更
+
+from django.contrib.admin.models import CHANGE, DELETION
+from django.db import transaction
+from django.utils import timezone
+
+from lead_enquiries.purge import tombstone_customers
+from main.analytics import mark_customers_dirty
+from main.bulk import BULK_CHUNK_SIZE, chunked_ids, log_bulk_action
+from main.caching import bump_data_version, LEADS_SCOPE, ENQUIRIES_SCOPE
+from main.inline_edit import PatchError, clean_value
+from main.transitions import record_transitions, CUSTOMER
+from .models import PotentialCustomer
+
+BULK_ACTIONS = {
+    'status': '修改狀態',
+    'rank': '修改評級',
+    'sales_incharge': '轉移負責業務',
+    'pin': '置頂',
+    'unpin': '取消置頂',
+    'delete': '刪除',
+}
+# 需要指定新值的操作 (即欄位名稱)
+VALUE_ACTIONS = {'status', 'rank', 'sales_incharge'}
+OPEN_ACTIONS = {'pin', 'unpin'}
+
+
+def _value_label(action, value):
+    if action == 'sales_incharge':
+        return value.username if value else '-'
+    choices = dict(PotentialCustomer._meta.get_field(action).choices)
+    return choices.get(value, value) or '-'
+
+
+# 對 queryset 裡的客戶執行批次操作，回傳 (處理筆數, 沒有權限略過的筆數)
+def apply_bulk_action(queryset, action, value, user, chunk_size=BULK_CHUNK_SIZE):
+    if action not in BULK_ACTIONS:
+        raise PatchError(f'不支援的批次操作 {action}')
+    if action in VALUE_ACTIONS:
+        value = clean_value(PotentialCustomer, action, value)
+        change_message = f'批次{BULK_ACTIONS[action]}為「{_value_label(action, value)}」'
+        changes = {action: value}
+    elif action in OPEN_ACTIONS:
+        change_message = f'批次{BULK_ACTIONS[action]}客戶'
+        changes = {'is_pinned': action == 'pin'}
+    else:
+        change_message = '批次刪除潛在客戶'
+        changes = None
+
+    done = skipped = 0
+    for ids in chunked_ids(queryset, chunk_size):
+        chunk = PotentialCustomer.objects.filter(pk__in=ids)
+        if action not in OPEN_ACTIONS:
+            chunk = chunk.filter(sales_incharge=user)
+        rows = list(chunk.values_list('pk', 'company_name', 'status', 'created_at'))
+        skipped += len(ids) - len(rows)
+        if not rows:
+            continue
+        row_ids = [row[0] for row in rows]
+
+        if changes is None:
+            tombstone_customers(row_ids)
+            log_bulk_action(user, PotentialCustomer, [(pk, name) for pk, name, _, _ in rows], DELETION, change_message)
+        else:
+            now = timezone.now()
+            with transaction.atomic():
+                PotentialCustomer.objects.filter(pk__in=row_ids).update(**changes, updated_at=now)
+                if action == 'status':
+                    record_transitions(CUSTOMER, [(pk, status, created_at) for pk, _, status, created_at in rows],
+                                       value, user, now)
+                log_bulk_action(user, PotentialCustomer, [(pk, name) for pk, name, _, _ in rows], CHANGE,
+                                change_message)
+            if action == 'sales_incharge':
+                mark_customers_dirty(row_ids)
+        done += len(rows)
+
+    if done:
+        bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    return done, skipped
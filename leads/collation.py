@@ -0,0 +1,71 @@
+# leads/collation.py
+# 公司名稱的排序鍵
+# SQLite 預設用 binary (code point) 排序，中英文混合的公司名稱排出來順序很亂，也沒辦法用索引排序
+# 這邊在存檔時先算好一個「排序鍵」字串存進資料庫並建立索引，列表排序改用這個欄位
+#
+# 排序規則：
+#   英文、數字：全形轉半形後轉小寫 (casefold)，重音字母去掉重音，標點符號忽略
+#   繁體中文：依 Big5 (cp950) 編碼排序，Big5 的常用字區、次常用字區內都是依「筆畫數 → 部首」排列
+#             所以可以直接得到筆畫排序，不需要額外的字典檔 (次常用字會排在所有常用字之後)
+#   其他字元 (簡體字、日文等)：排在中文之後，依 code point 排序
+# 英文名稱會排在中文名稱前面
+
+import unicodedata
+
+SORT_KEY_MAX_LENGTH = 255
+
+# 中文字的前綴，要比所有英數字元大，'~' (0x7E) 比 'z' 大
+CJK_PREFIX = '~'
+OTHER_PREFIX = '~~'
+
+
+def _char_key(ch):
+    if ch.isascii():
+        if ch.isalnum():
+            return ch
+        if ch.isspace():
+            return ' '
+        return ''  # 標點符號不參與排序
+    # 去掉重音符號，例如 é -> e
+    stripped = ''.join(c for c in unicodedata.normalize('NFKD', ch) if not unicodedata.combining(c))
+    if stripped and stripped.isascii():
+        return ''.join(_char_key(c) for c in stripped)
+    try:
+        # 每個 Big5 字固定 2 bytes，轉成 4 碼 hex 後可以直接用字串比較
+        return CJK_PREFIX + ch.encode('cp950').hex().upper()
+    except UnicodeEncodeError:
+        return OTHER_PREFIX + f'{ord(ch):06X}'
+
+
+# 由公司名稱算出排序鍵
+def company_sort_key(name):
+    if not name:
+        return ''
+    normalized = unicodedata.normalize('NFKC', name).casefold().strip()
+    key = ''.join(_char_key(ch) for ch in normalized)
+    # 連續空白只留一個
+    key = ' '.join(key.split())
+    return key[:SORT_KEY_MAX_LENGTH]
+
+
+# 分批回填排序鍵，migration 和管理指令共用
+# model 可以是 migration 裡的 historical model，所以不依賴 model 上的方法
+def backfill_company_sort_keys(model, batch_size=500, only_missing=False):
+    queryset = model._base_manager.order_by('pk')
+    if only_missing:
+        queryset = queryset.filter(company_sort_key='')
+    updated = 0
+    batch = []
+    for obj in queryset.only('pk', 'company_name', 'company_sort_key').iterator(chunk_size=batch_size):
+        key = company_sort_key(obj.company_name)
+        if key != obj.company_sort_key:
+            obj.company_sort_key = key
+            batch.append(obj)
+        if len(batch) >= batch_size:
+            model._base_manager.bulk_update(batch, ['company_sort_key'])
+            updated += len(batch)
+            batch = []
+    if batch:
+        model._base_manager.bulk_update(batch, ['company_sort_key'])
+        updated += len(batch)
+    return updated
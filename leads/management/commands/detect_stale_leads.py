@@ -0,0 +1,25 @@
+# 找出超過 N 天沒有開發紀錄的已聯絡客戶，每位業務產生一封摘要通知到寄件匣，可排程每天執行
+# 實際寄信由 python manage.py send_notifications 處理
+# python manage.py detect_stale_leads --days 30
+
+from django.core.management.base import BaseCommand
+
+from leads.stale import STALE_DAYS, queue_stale_lead_digests, stale_leads
+
+
+class Command(BaseCommand):
+    help = '找出久未聯絡的客戶並產生通知'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=STALE_DAYS, help='超過幾天沒有開發紀錄算久未聯絡')
+        parser.add_argument('--dry-run', action='store_true', help='只列出筆數，不產生通知')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = stale_leads(options['days']).count()
+            self.stdout.write(f'共 {count} 個客戶超過 {options["days"]} 天未聯絡')
+            return
+        queued, skipped = queue_stale_lead_digests(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'已產生 {queued} 封通知'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'{skipped} 位業務沒有設定 email，已略過'))
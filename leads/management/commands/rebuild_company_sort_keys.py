@@ -0,0 +1,23 @@
+# 重新計算所有客戶的公司名稱排序鍵
+# 排序規則 (leads/collation.py) 有調整時執行：python manage.py rebuild_company_sort_keys
+
+from django.core.management.base import BaseCommand
+
+from leads.collation import backfill_company_sort_keys
+from leads.models import PotentialCustomer
+
+
+class Command(BaseCommand):
+    help = '分批重新計算客戶的公司名稱排序鍵'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批更新的筆數')
+        parser.add_argument('--only-missing', action='store_true', help='只處理還沒有排序鍵的客戶')
+
+    def handle(self, *args, **options):
+        updated = backfill_company_sort_keys(
+            PotentialCustomer,
+            batch_size=options['batch_size'],
+            only_missing=options['only_missing'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'已更新 {updated} 筆客戶的排序鍵'))
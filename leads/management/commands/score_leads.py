@@ -0,0 +1,22 @@
+# 計算客戶分數和建議評級
+# python manage.py score_leads          只重算上次評分後有異動的客戶 (含聯絡紀錄、報價單、品項的新增、修改、刪除)
+# python manage.py score_leads --full   全部重算 (新近度會隨時間遞減，建議每天跑一次)
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from leads.scoring import SCORE_CHUNK_SIZE, score_customers
+
+
+class Command(BaseCommand):
+    help = '計算客戶分數和建議評級 (預設只重算客戶資料、聯絡紀錄、報價單、品項有異動的客戶)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='全部重算，不只有異動的客戶')
+        parser.add_argument('--chunk-size', type=int, default=SCORE_CHUNK_SIZE, help='每段處理的客戶數')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = score_customers(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已評分 {count} 個客戶，耗時 {time.monotonic() - started:.1f} 秒'))
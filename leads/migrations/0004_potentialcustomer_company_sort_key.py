@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+from leads.collation import backfill_company_sort_keys
+
+
+# 既有客戶分批回填排序鍵
+def fill_company_sort_keys(apps, schema_editor):
+    PotentialCustomer = apps.get_model('leads', 'PotentialCustomer')
+    backfill_company_sort_keys(PotentialCustomer)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0003_rename_log_contactlogs_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='potentialcustomer',
+            name='company_sort_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='公司名稱排序鍵'),
+        ),
+        migrations.RunPython(fill_company_sort_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0004_potentialcustomer_company_sort_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='potentialcustomer',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='刪除時間'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0005_potentialcustomer_deleted_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCustomer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_pk', models.IntegerField(unique=True, verbose_name='原客戶編號')),
+                ('company_name', models.CharField(max_length=100, verbose_name='公司名稱')),
+                ('country', models.CharField(choices=[('USA', '美國'), ('TAIWAN', '台灣'), ('JAPAN', '日本'), ('DENMARK', '丹麥'), ('GERMANY', '德國'), ('SWEDEN', '瑞典'), ('CANADA', '加拿大'), ('SWITZERLAND', '瑞士'), ('ITALY', '義大利'), ('FRANCE', '法國')], max_length=30, verbose_name='國家')),
+                ('status', models.CharField(choices=[('uncontacted', '未聯絡'), ('contacted', '開發中'), ('deal', '已成交'), ('refused', '拒絕往來')], max_length=50, verbose_name='狀態')),
+                ('last_activity_at', models.DateTimeField(verbose_name='最後活動時間')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='封存時間')),
+                ('payload', models.JSONField(verbose_name='封存內容')),
+                ('sales_incharge', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='業務人員')),
+            ],
+            options={
+                'verbose_name': '封存客戶',
+                'verbose_name_plural': '封存客戶',
+            },
+        ),
+    ]
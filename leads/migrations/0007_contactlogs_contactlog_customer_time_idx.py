@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0006_archivedcustomer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactlogs',
+            index=models.Index(fields=['potential_customer', 'created_at'], name='contactlog_customer_time_idx'),
+        ),
+    ]
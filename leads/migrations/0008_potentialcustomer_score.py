@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0007_contactlogs_contactlog_customer_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='potentialcustomer',
+            name='score',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='客戶分數'),
+        ),
+        migrations.AddField(
+            model_name='potentialcustomer',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='評分時間'),
+        ),
+        migrations.AddField(
+            model_name='potentialcustomer',
+            name='suggested_rank',
+            field=models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], editable=False, max_length=5, verbose_name='建議評級'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# 既有的聯絡人以客戶的最後更新時間、聯絡紀錄以建立時間作為最後更新時間
+def backfill_updated_at(apps, schema_editor):
+    PotentialCustomer = apps.get_model('leads', 'PotentialCustomer')
+    Contacts = apps.get_model('leads', 'Contacts')
+    ContactLogs = apps.get_model('leads', 'ContactLogs')
+    customer_updated = PotentialCustomer.objects.filter(pk=OuterRef('potential_customer_id')).values('updated_at')
+    Contacts.objects.update(updated_at=Subquery(customer_updated))
+    ContactLogs.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0008_potentialcustomer_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='potentialcustomer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='最後更新'),
+        ),
+        migrations.AddField(
+            model_name='contacts',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='最後更新'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='contactlogs',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='最後更新'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from multiselectfield import MultiSelectField # 多選第三方套件
 from django.conf import settings # 帶入user
+from main.managers import LiveManager
+from .collation import company_sort_key
 
 # 潛在客戶區塊
 class PotentialCustomer(models.Model):
@@ -74,9 +76,21 @@ class PotentialCustomer(models.Model):
 	sales_incharge = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True,verbose_name='業務人員')
 	is_visitable = models.BooleanField(default=False, verbose_name="安排可拜訪")
 	created_at = models.DateTimeField(auto_now_add=True,verbose_name='建立日期')
-	updated_at = models.DateTimeField(auto_now=True,verbose_name='最後更新')
+	# 異動資料流 (main/changes.py) 依 (updated_at, 編號) 找出異動的資料，要建索引
+	updated_at = models.DateTimeField(auto_now=True,db_index=True,verbose_name='最後更新')
 	notes = models.TextField(blank=True,verbose_name='備註')
 	is_pinned = models.BooleanField(default=False, verbose_name='重點關注')
+	# 由company_name算出的排序鍵，存檔時自動更新，列表用它排序 (見collation.py)
+	company_sort_key = models.CharField(max_length=255, blank=True, editable=False, db_index=True, verbose_name='公司名稱排序鍵')
+	# 刪除時先標記，列表、查詢都看不到，再由背景工作分批清除相關資料 (見lead_enquiries/purge.py)
+	deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True, verbose_name='刪除時間')
+	# 依聯絡紀錄、報價、成交金額、產業算出的分數和建議評級，由排程批次計算 (見scoring.py)
+	score = models.FloatField(null=True, blank=True, editable=False, verbose_name='客戶分數')
+	suggested_rank = models.CharField(max_length=5, choices=RANK_CHOICES, blank=True, editable=False, verbose_name='建議評級')
+	scored_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='評分時間')
+
+	objects = LiveManager()
+	all_objects = models.Manager() # 包含已刪除、等待清除的客戶
 
 	# 這個方法會返回一個包含所選產業"標籤"的乾淨列表。
 	@property
@@ -90,6 +104,14 @@ class PotentialCustomer(models.Model):
 		selected_labels = [choices_dict.get(key) for key in self.industries]
 		return selected_labels
 
+	# 存檔前先算好排序鍵
+	def save(self, *args, **kwargs):
+		self.company_sort_key = company_sort_key(self.company_name)
+		update_fields = kwargs.get('update_fields')
+		if update_fields is not None and 'company_name' in update_fields:
+			kwargs['update_fields'] = set(update_fields) | {'company_sort_key'}
+		super().save(*args, **kwargs)
+
 	def __str__(self):
 		return self.company_name
 
@@ -101,6 +123,7 @@ class Contacts(models.Model):
 	phone = models.CharField(max_length=20,blank=True,verbose_name='電話')
 	email = models.EmailField(blank=True,verbose_name='電子郵件')
 	notes = models.TextField(blank=True,verbose_name='備註')
+	updated_at = models.DateTimeField(auto_now=True,db_index=True,verbose_name='最後更新')
 	def __str__(self):
 		return f'{self.name}({self.potential_customer.company_name})'
 
@@ -112,5 +135,33 @@ class ContactLogs(models.Model):
 	content = models.TextField(blank=True,verbose_name='聯絡內容')
 	created_at = models.DateTimeField(auto_now_add=True,verbose_name='聯絡日期')
 	created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name='業務人員')
+	updated_at = models.DateTimeField(auto_now=True,db_index=True,verbose_name='最後更新')
+
+	class Meta:
+		indexes = [
+			# 最後聯絡時間、久未聯絡的客戶都是依客戶找最新的一筆紀錄
+			models.Index(fields=['potential_customer', 'created_at'], name='contactlog_customer_time_idx'),
+		]
+
 	def __str__(self):
-		return f'{self.potential_customer.company_name}-{self.topic}'
\ No newline at end of file
+		return f'{self.potential_customer.company_name}-{self.topic}'
+
+# 封存客戶區塊
+# 拒絕往來、長期沒有動靜的客戶連同聯絡人、聯絡紀錄搬到這裡，不再拖慢列表和統計 (見lead_enquiries/archive.py)
+# 只保留列表篩選用的欄位，完整內容存成JSON，還原時寫回原本的資料表
+class ArchivedCustomer(models.Model):
+	original_pk = models.IntegerField(unique=True, verbose_name='原客戶編號')
+	company_name = models.CharField(max_length=100, verbose_name='公司名稱')
+	country = models.CharField(max_length=30, choices=PotentialCustomer.CountryChoices.choices, verbose_name='國家')
+	status = models.CharField(max_length=50, choices=PotentialCustomer.STATUS_CHOICES, verbose_name='狀態')
+	sales_incharge = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name='業務人員')
+	last_activity_at = models.DateTimeField(verbose_name='最後活動時間')
+	archived_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='封存時間')
+	payload = models.JSONField(verbose_name='封存內容')
+
+	class Meta:
+		verbose_name = '封存客戶'
+		verbose_name_plural = '封存客戶'
+
+	def __str__(self):
+		return self.company_name
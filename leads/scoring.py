@@ -0,0 +1,178 @@
+# leads/scoring.py
+# 客戶評分
+# 依 聯絡紀錄的新近度、頻率，報價數、報價金額、成交金額，以及產業 算出 0~100 分和建議評級 (A/B/C)
+# 特徵用幾個 GROUP BY 查詢一次讀出，放進 numpy 陣列整欄計算，不逐筆處理
+# 寫回時只寫分數有變的客戶，並依 (分數, 評級) 分組，同一組用一個 UPDATE ... WHERE pk IN (...) 寫回；
+# 分數取到小數一位，組數有限，比 bulk_update 逐筆組 CASE WHEN 快得多
+# 增量模式只重算上次評分後有異動的客戶 (客戶資料、聯絡紀錄、報價單、品項，依 updated_at 判斷)；
+# 刪除不會留下較新的 updated_at，刪除品項、聯絡紀錄、封存報價單的地方要呼叫 mark_for_rescore
+# 新近度會隨時間遞減，建議每天 (例如半夜) 做一次完整重算
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Exists, F, FloatField, Max, OuterRef, Q, Sum
+from django.utils import timezone
+
+from lead_enquiries.models import Enquiry, EnquiryItem
+from main.caching import bump_data_version, LEADS_SCOPE
+from .models import PotentialCustomer, ContactLogs
+
+SCORE_CHUNK_SIZE = 20000
+SCORE_BATCH_SIZE = 500  # 每個 UPDATE 最多帶幾個主鍵
+FREQUENCY_WINDOW_DAYS = 90
+
+# 各項目的滿分，合計 100
+WEIGHTS = {
+    'recency': 25,    # 最後聯絡距今天數，每 30 天衰減為 1/e
+    'frequency': 15,  # 近 90 天聯絡次數，10 次以上滿分
+    'quotes': 15,     # 報價數，20 張以上滿分 (對數)
+    'quoted': 15,     # 報價金額 (NTD)，500 萬以上滿分 (對數)
+    'won': 20,        # 成交金額 (NTD)，200 萬以上滿分 (對數)
+    'industry': 10,   # 產業，多個產業取最高
+}
+RECENCY_DECAY_DAYS = 30
+FREQUENCY_CAP = 10
+QUOTES_CAP = 20
+QUOTED_NTD_CAP = 5_000_000
+WON_NTD_CAP = 2_000_000
+INDUSTRY_WEIGHTS = {
+    'semi-conductor': 1.0,
+    'aerospace': 0.9,
+    'medical': 0.9,
+    'automotive': 0.8,
+    'electronic': 0.7,
+    'automation': 0.7,
+    'architectural': 0.5,
+    'food': 0.5,
+    'others': 0.4,
+}
+# 分數達到門檻的建議評級
+RANK_THRESHOLDS = [(60, 'A'), (30, 'B'), (0, 'C')]
+
+
+# 上次評分後有異動的客戶 (含從未評分過的)
+def touched_customers():
+    since = OuterRef('scored_at')
+    return PotentialCustomer.objects.filter(
+        Q(scored_at__isnull=True)
+        | Q(updated_at__gt=F('scored_at'))
+        | Exists(ContactLogs.objects.filter(potential_customer=OuterRef('pk'), updated_at__gt=since))
+        | Exists(Enquiry.objects.filter(potential_customer=OuterRef('pk'), updated_at__gt=since))
+        # 品項的新增、修改、匯率重估會改變報價和成交金額，但不會更新報價單的 updated_at
+        | Exists(EnquiryItem.objects.filter(enquiry__potential_customer=OuterRef('pk'), updated_at__gt=since))
+    )
+
+
+# 清掉評分時間，下次增量評分會重算這些客戶 (customer_ids 可以是 values() 子查詢)
+def mark_for_rescore(customer_ids):
+    PotentialCustomer.all_objects.filter(pk__in=customer_ids).update(scored_at=None)
+
+
+def _log_scale(values, cap):
+    return np.minimum(np.log1p(values) / np.log1p(cap), 1.0)
+
+
+# 依 pk 陣列把 GROUP BY 的結果放到對應位置，沒有資料的客戶為 0
+def _scatter(pks, rows, columns):
+    arrays = [np.zeros(len(pks)) for _ in columns]
+    if rows:
+        keys = np.array([row[0] for row in rows], dtype=np.int64)
+        index = np.searchsorted(pks, keys)
+        for array, column in zip(arrays, columns):
+            array[index] = np.array([row[column] or 0 for row in rows], dtype=np.float64)
+    return arrays
+
+
+# 讀出 customers 的特徵，回傳 (pk 陣列, 特徵 dict)
+def load_features(customers, now):
+    rows = list(customers.order_by('pk').values_list('pk', 'industries'))
+    pks = np.array([pk for pk, _ in rows], dtype=np.int64)
+    # 產業組合種類不多，先算每種組合的權重，再用 np.unique 的索引展開
+    combinations, inverse = np.unique(np.array([','.join(industries or []) for _, industries in rows], dtype=str),
+                                      return_inverse=True)
+    combination_weights = np.array([max((INDUSTRY_WEIGHTS.get(code, 0) for code in combination.split(',') if code),
+                                        default=0) for combination in combinations])
+
+    customer_ids = customers.values('pk')
+    window_start = now - timedelta(days=FREQUENCY_WINDOW_DAYS)
+    log_rows = list(ContactLogs.objects.filter(potential_customer__in=customer_ids)
+                    .values('potential_customer_id')
+                    .annotate(last=Max('created_at'), recent=Count('pk', filter=Q(created_at__gte=window_start)))
+                    .order_by().values_list('potential_customer_id', 'last', 'recent'))
+    amount = F('items__quantity') * F('items__unit_price') * F('items__exchange_rate')
+    enquiry_rows = list(Enquiry.objects.filter(potential_customer__in=customer_ids)
+                        .values('potential_customer_id')
+                        .annotate(quotes=Count('pk', distinct=True),
+                                  quoted=Sum(amount, output_field=FloatField()),
+                                  won=Sum(amount, filter=Q(status='success'), output_field=FloatField()))
+                        .order_by().values_list('potential_customer_id', 'quotes', 'quoted', 'won'))
+
+    days_since = np.full(len(pks), np.inf)
+    if log_rows:
+        index = np.searchsorted(pks, np.array([row[0] for row in log_rows], dtype=np.int64))
+        days_since[index] = [(now - last).total_seconds() / 86400 for _, last, _ in log_rows]
+    recent_logs, = _scatter(pks, log_rows, [2])
+    quotes, quoted, won = _scatter(pks, enquiry_rows, [1, 2, 3])
+    return pks, {
+        'days_since_log': days_since,
+        'recent_logs': recent_logs,
+        'quotes': quotes,
+        'quoted_ntd': quoted,
+        'won_ntd': won,
+        'industry_weight': combination_weights[inverse] if len(pks) else np.zeros(0),
+    }
+
+
+# 整欄計算分數，回傳 (分數陣列, 建議評級陣列)
+def score_features(features):
+    score = (
+        WEIGHTS['recency'] * np.exp(-features['days_since_log'] / RECENCY_DECAY_DAYS)
+        + WEIGHTS['frequency'] * np.minimum(features['recent_logs'] / FREQUENCY_CAP, 1.0)
+        + WEIGHTS['quotes'] * _log_scale(features['quotes'], QUOTES_CAP)
+        + WEIGHTS['quoted'] * _log_scale(features['quoted_ntd'], QUOTED_NTD_CAP)
+        + WEIGHTS['won'] * _log_scale(features['won_ntd'], WON_NTD_CAP)
+        + WEIGHTS['industry'] * features['industry_weight']
+    )
+    score = np.round(score, 1)
+    thresholds = np.array([threshold for threshold, _ in RANK_THRESHOLDS])
+    ranks = np.array([rank for _, rank in RANK_THRESHOLDS])
+    # 門檻由高到低排，第一個達到的門檻就是評級
+    ranks = ranks[np.argmax(score[:, None] >= thresholds[None, :], axis=1)] if len(score) else np.array([], dtype=str)
+    return score, ranks
+
+
+# 評分並寫回，full=False 時只算有異動的客戶；回傳評分的客戶數
+# 依主鍵範圍分段處理，每段 chunk_size 個客戶，避免一次讀進太多資料
+def score_customers(full=False, chunk_size=SCORE_CHUNK_SIZE, batch_size=SCORE_BATCH_SIZE):
+    now = timezone.now()
+    customers = PotentialCustomer.objects.all() if full else touched_customers()
+    pks = list(customers.order_by('pk').values_list('pk', flat=True))
+
+    changed = 0
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start:start + chunk_size]
+        chunk_customers = customers.filter(pk__gte=chunk[0], pk__lte=chunk[-1])
+        chunk_pks, features = load_features(chunk_customers, now)
+        scores, ranks = score_features(features)
+        current = {pk: (score, rank) for pk, score, rank in
+                   PotentialCustomer.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1])
+                   .values_list('pk', 'score', 'suggested_rank')}
+        # 分數、評級沒變的不寫回
+        updates = {}
+        for pk, score, rank in zip(chunk_pks.tolist(), scores.tolist(), ranks.tolist()):
+            if current.get(pk) != (score, rank):
+                updates.setdefault((score, rank), []).append(pk)
+        with transaction.atomic():
+            for (score, rank), group in updates.items():
+                for offset in range(0, len(group), batch_size):
+                    PotentialCustomer.all_objects.filter(pk__in=group[offset:offset + batch_size]) \
+                        .update(score=score, suggested_rank=rank)
+            # 寫回 scored_at 後，下次增量評分就不會再選到
+            PotentialCustomer.all_objects.filter(pk__in=chunk_customers.values('pk')).update(scored_at=now)
+        changed += sum(map(len, updates.values()))
+
+    if changed:
+        bump_data_version(LEADS_SCOPE)
+    return len(pks)
@@ -0,0 +1,41 @@
+# leads/signals.py
+# 客戶相關資料有異動時，讓列表/統計的快取失效，並標記銷售分析cube要重算的月份
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from main.analytics import mark_customers_dirty, mark_months_dirty, month_of
+from main.caching import bump_data_version, LEADS_SCOPE, ENQUIRIES_SCOPE
+from .models import PotentialCustomer, Contacts, ContactLogs
+from .scoring import mark_for_rescore
+
+
+# 報價單列表會用客戶名稱搜尋，客戶異動時兩邊的快取都要失效
+@receiver([post_save, post_delete], sender=PotentialCustomer)
+def invalidate_customer_cache(sender, **kwargs):
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+
+
+# 客戶的國家、類型、產業會影響底下所有報價單所在月份的統計
+@receiver(post_save, sender=PotentialCustomer)
+def mark_customer_cube_dirty(sender, instance, **kwargs):
+    mark_customers_dirty([instance.pk])
+
+
+@receiver(post_delete, sender=PotentialCustomer)
+def mark_deleted_customer_cube_dirty(sender, instance, **kwargs):
+    mark_months_dirty([month_of(instance.created_at)])
+
+
+# 最後聯絡時間是由開發紀錄算出來的；聯絡人會出現在 API 的回應裡 (ETag 依資料版本號)
+@receiver([post_save, post_delete], sender=ContactLogs)
+@receiver([post_save, post_delete], sender=Contacts)
+def invalidate_contact_log_cache(sender, **kwargs):
+    bump_data_version(LEADS_SCOPE)
+
+
+# 刪除聯絡紀錄會降低聯絡頻率、新近度，讓下次增量評分重算這個客戶
+@receiver(post_delete, sender=ContactLogs)
+def rescore_after_log_delete(sender, instance, **kwargs):
+    if instance.potential_customer_id:
+        mark_for_rescore([instance.potential_customer_id])
@@ -0,0 +1,62 @@
+# leads/stale.py
+# 久未聯絡的客戶
+# 狀態為「已聯絡」、但超過 N 天沒有任何開發紀錄的客戶，依負責業務整理成一封摘要通知寫進寄件匣
+# 查詢用 NOT EXISTS 和 (客戶, 建立時間) 索引判斷期間內有沒有紀錄，所有業務一次查完
+
+from datetime import timedelta
+
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from main.models import NotificationOutbox
+from main.notifications import enqueue_notifications
+from .models import PotentialCustomer, ContactLogs
+
+STALE_STATUS = 'contacted'
+STALE_DAYS = 30
+
+
+# 超過 days 天沒有開發紀錄的已聯絡客戶，附上最後聯絡時間
+def stale_leads(days=STALE_DAYS, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    logs = ContactLogs.objects.filter(potential_customer=OuterRef('pk'))
+    return (PotentialCustomer.objects
+            .filter(status=STALE_STATUS, sales_incharge__isnull=False, created_at__lt=cutoff)
+            .filter(~Exists(logs.filter(created_at__gte=cutoff)))
+            .annotate(last_contacted_at=Subquery(logs.order_by('-created_at').values('created_at')[:1])))
+
+
+def _digest_body(username, days, leads):
+    lines = [f'{username} 您好，', '', f'以下 {len(leads)} 個已聯絡客戶超過 {days} 天沒有開發紀錄：', '']
+    for company_name, last_contacted_at in leads:
+        last = timezone.localtime(last_contacted_at).strftime('%Y-%m-%d') if last_contacted_at else '無紀錄'
+        lines.append(f'- {company_name} (最後聯絡：{last})')
+    return '\n'.join(lines)
+
+
+# 每位業務一封摘要，同一天重跑不會重複產生；回傳 (新寫入通知數, 沒有 email 而略過的業務數)
+def queue_stale_lead_digests(days=STALE_DAYS):
+    today = timezone.localdate()
+    rows = stale_leads(days).order_by('sales_incharge_id', 'last_contacted_at').values_list(
+        'sales_incharge_id', 'sales_incharge__username', 'sales_incharge__email', 'company_name', 'last_contacted_at')
+
+    digests = {}
+    for user_id, username, email, company_name, last_contacted_at in rows:
+        digest = digests.setdefault(user_id, {'username': username, 'email': email, 'leads': []})
+        digest['leads'].append((company_name, last_contacted_at))
+
+    notifications = []
+    skipped = 0
+    for user_id, digest in digests.items():
+        if not digest['email']:
+            skipped += 1
+            continue
+        notifications.append(NotificationOutbox(
+            kind='stale_leads',
+            dedupe_key=f'stale_leads:{user_id}:{today.isoformat()}',
+            recipient_id=user_id,
+            email=digest['email'],
+            subject=f'[BWP] {len(digest["leads"])} 個客戶超過 {days} 天未聯絡',
+            body=_digest_body(digest['username'], days, digest['leads']),
+        ))
+    return enqueue_notifications(notifications), skipped
@@ -5,8 +5,11 @@ app_name = 'leads'
 
 urlpatterns = [
     path('detail/<int:pk>/toggle_pin/', views.toggle_pin, name='toggle_pin'),
+    path('detail/<int:pk>/patch/', views.potential_customer_patch, name='potential_customer_patch'),
+    path('archived/<int:pk>/restore/', views.archived_customer_restore, name='archived_customer_restore'),
     path('', views.potential_customer_list, name='potential_customer_list'),
     path('create/', views.potential_customer_create, name='potential_customer_create'),
+    path('bulk/', views.potential_customer_bulk, name='potential_customer_bulk'),
     path('delete/<int:pk>/', views.potential_customer_delete, name='potential_customer_delete'),
     path('detail/<int:pk>/',views.potential_customer_detail,name='potential_customer_detail'),
     path('detail/<int:pk>/update/', views.potential_customer_update, name='potential_customer_update'),
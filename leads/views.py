@@ -6,25 +6,47 @@
 
 import csv
 
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.db.models import Q, Max
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponse, Http404
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import escape_uri_path
-
+from django.views.decorators.http import require_http_methods, require_POST
+
+from main.analytics import mark_customers_dirty
+from main.caching import bump_data_version, get_or_compute, LEADS_SCOPE, ENQUIRIES_SCOPE
+from main.facets import compute_facets, facet_options
+from main.inline_edit import PatchError, TOGGLE, parse_patch, clean_value, set_field, toggle_field
+from main.transitions import record_transition, CUSTOMER
+from lead_enquiries.archive import ArchiveConflict, restore_customer
+from lead_enquiries.purge import tombstone_customer
+from .bulk import apply_bulk_action, BULK_ACTIONS
 from .forms import ContactsForm, PotentialCustomerForm, ContactLogsForm
-from .models import PotentialCustomer, Contacts, ContactLogs
+from .models import PotentialCustomer, Contacts, ContactLogs, ArchivedCustomer
 
 # 所有使用的套件於上方匯入
 
 # 輔助函式
 
+# 關鍵字搜尋條件，列表和篩選器筆數共用
+def _apply_customer_keyword(queryset, query):
+    # Q是用來判斷多重條件
+    if query:
+        queryset = queryset.filter(
+            Q(company_name__icontains=query) |
+            Q(industries__icontains=query) |
+            Q(required_products__icontains=query)
+        )
+    return queryset
+
 # 後續list和輸出的部分都會套運查詢、篩選邏輯，在這個輔助函式管理
 # 根據前端回傳的filter做QuerySet的篩選和排序
 def _get_filtered_customers_queryset(request):
@@ -32,6 +54,7 @@ def _get_filtered_customers_queryset(request):
     rank_filter = request.GET.get('rank', '') # 評級
     status_filter = request.GET.get('status', '') # 狀態
     owner_filter = request.GET.get('owner', '') # 負責人
+    country_filter = request.GET.get('country', '') # 國家
     sort_field = request.GET.get('sort', 'last_contacted_at') # 預設排序為最後聯絡時間
     sort_order = request.GET.get('order', 'desc')
 
@@ -42,28 +65,66 @@ def _get_filtered_customers_queryset(request):
         last_contacted_at=Max('logs__created_at') # logs是ContactLogs的related_name,用Max找出最大值也就是最後聯絡時間
     )
     # 用上面get取得的值，對QuerySet增加過濾條件
-    # Q是用來判斷多重條件
-    if query:
-        potential_customers = potential_customers.filter(
-            Q(company_name__icontains=query) |
-            Q(industries__icontains=query) |
-            Q(required_products__icontains=query)
-        )
+    potential_customers = _apply_customer_keyword(potential_customers, query)
     if rank_filter:
         potential_customers = potential_customers.filter(rank=rank_filter)
     if status_filter:
         potential_customers = potential_customers.filter(status=status_filter)
     if owner_filter:
         potential_customers = potential_customers.filter(sales_incharge__username=owner_filter)
+    if country_filter:
+        potential_customers = potential_customers.filter(country=country_filter)
 
     # 可排序的欄位列表,防止使用者找出隱藏資訊做排序
     valid_sort_fields = {'company_name', 'country', 'rank', 'status', 'created_at', 'last_contacted_at'}
     sort_by = sort_field if sort_field in valid_sort_fields else 'last_contacted_at'
+    # 公司名稱改用預先算好、有索引的排序鍵，中英文混合才會排得正確
+    if sort_by == 'company_name':
+        sort_by = 'company_sort_key'
     # order_by根據有無'-'來判斷做decs或asc
     if sort_order == 'desc':
         sort_by = '-' + sort_by
 
-    return potential_customers.order_by(sort_by)
+    # 加上pk當第二排序，分頁時同值的資料順序才會固定
+    return potential_customers.order_by(sort_by, 'pk')
+
+# 篩選器的維度和對應欄位，key同時也是GET參數名稱
+CUSTOMER_FACET_FIELDS = {
+    'rank': 'rank',
+    'status': 'status',
+    'owner': 'sales_incharge__username',
+    'country': 'country',
+}
+
+# 計算各篩選器選項的筆數，一次GROUP BY就算完全部維度，結果依資料版本快取
+# 使用者不必一個一個點篩選器去看剩幾筆，也順便算出列表總筆數，省下Paginator的COUNT查詢
+def _get_customer_facets(request):
+    query = request.GET.get('q', '')
+    active_filters = {name: request.GET.get(name, '') for name in CUSTOMER_FACET_FIELDS}
+
+    def compute():
+        base = _apply_customer_keyword(PotentialCustomer.objects.all(), query)
+        facets, total = compute_facets(base, CUSTOMER_FACET_FIELDS, active_filters)
+        return {'facets': facets, 'total': total}
+
+    return get_or_compute('customer_facets', [LEADS_SCOPE], dict(active_filters, q=query), compute)
+
+# 勾選「包含已封存」時才查詢封存表，套用相同的關鍵字和篩選條件，用 archived_page 參數另外分頁
+ARCHIVED_PAGE_SIZE = 20
+
+def _get_archived_customers(request):
+    archived = ArchivedCustomer.objects.select_related('sales_incharge')
+    query = request.GET.get('q', '')
+    if query:
+        archived = archived.filter(company_name__icontains=query)
+    if request.GET.get('status', ''):
+        archived = archived.filter(status=request.GET['status'])
+    if request.GET.get('owner', ''):
+        archived = archived.filter(sales_incharge__username=request.GET['owner'])
+    if request.GET.get('country', ''):
+        archived = archived.filter(country=request.GET['country'])
+    paginator = Paginator(archived.order_by('-archived_at', 'pk'), ARCHIVED_PAGE_SIZE)
+    return paginator.get_page(request.GET.get('archived_page'))
 
 # PotentialCustomer的CRUD
 
@@ -72,8 +133,11 @@ def _get_filtered_customers_queryset(request):
 def potential_customer_list(request):
     # 取得套用查詢過濾器的QuerySet
     potential_customers_qs = _get_filtered_customers_queryset(request)
-    # 將QuerySet用Paginator做分頁包裝
-    paginator = Paginator(potential_customers_qs, 20)
+    facet_data = _get_customer_facets(request)
+    facets = facet_data['facets']
+    # 將QuerySet用Paginator做分頁包裝，總筆數已經在facet查詢算好了
+    paginator = Paginator(potential_customers_qs.select_related('sales_incharge'), 20)
+    paginator.count = facet_data['total']
     page = request.GET.get('page')
 
     # 這邊是確保page是有效的,若非數字就跳到第1頁，若超過最大頁數則顯示最後一頁
@@ -84,22 +148,32 @@ def potential_customer_list(request):
     except EmptyPage:
         potential_customers = paginator.page(paginator.num_pages)
 
-    # 設定篩選器的選項
-    # 從PotentialCustomer中取得所有的sales_incharge__username做為篩選器的選項,用.distinct確保不重複
-    owners = PotentialCustomer.objects.values_list('sales_incharge__username', flat=True).distinct()
-    rank_choices = PotentialCustomer.RANK_CHOICES
-    status_choices = PotentialCustomer.STATUS_CHOICES
+    # 設定篩選器的選項，每個選項都附上筆數 (value, label, count)
+    # 業務負責人的選項直接從facet結果取得，不用再另外查一次distinct
+    owner_filter = request.GET.get('owner', '')
+    owner_names = sorted({name for name in facets['owner'] if name} | ({owner_filter} if owner_filter else set()))
+    owner_options = [(name, name, facets['owner'].get(name, 0)) for name in owner_names]
+    include_archived = request.GET.get('archived') == '1'
 
     return render(request, 'leads/potential_customer_list.html', {
         'potential_customers': potential_customers,
-        'owners': owners,
-        'rank_choices': rank_choices,
-        'status_choices': status_choices,
+        'include_archived': include_archived,
+        'include_archived_flag': '1' if include_archived else '',  # 分頁、排序連結要保留勾選狀態
+        'archived_customers': _get_archived_customers(request) if include_archived else None,
+        'owner_options': owner_options,
+        'owner_choices': _owner_choices(),
+        'bulk_actions': BULK_ACTIONS,
+        'status_choices': PotentialCustomer.STATUS_CHOICES,
+        'rank_choices': PotentialCustomer.RANK_CHOICES,
+        'rank_options': facet_options(PotentialCustomer.RANK_CHOICES, facets['rank']),
+        'status_options': facet_options(PotentialCustomer.STATUS_CHOICES, facets['status']),
+        'country_options': facet_options(PotentialCustomer.CountryChoices.choices, facets['country']),
         # 下面這些篩選器會隨著GET和前端作互動
         'query': request.GET.get('q', ''),
         'rank_filter': request.GET.get('rank', ''),
         'status_filter': request.GET.get('status', ''),
-        'owner_filter': request.GET.get('owner', ''),
+        'owner_filter': owner_filter,
+        'country_filter': request.GET.get('country', ''),
         'sort_field': request.GET.get('sort', 'created_at'),
         'sort_order': request.GET.get('order', 'desc'),
     })
@@ -124,6 +198,7 @@ def potential_customer_create(request):
             potential_customer = form.save(commit=False)
             potential_customer.sales_incharge = request.user
             potential_customer.save()
+            record_transition(CUSTOMER, potential_customer, '', potential_customer.status, request.user)
 
             # 寫入操作紀錄
             LogEntry.objects.log_action(
@@ -151,9 +226,11 @@ def potential_customer_update(request, pk):
         return HttpResponseForbidden("您沒有權限編輯此客戶。")
 
     if request.method == 'POST':
+        old_status = potential_customer.status  # 表單驗證時會改寫instance，先記下原狀態
         form = PotentialCustomerForm(request.POST, instance=potential_customer)
         if form.is_valid():
             updated_customer = form.save()
+            record_transition(CUSTOMER, updated_customer, old_status, updated_customer.status, request.user)
             # 寫入操作紀錄
             LogEntry.objects.log_action(
                 user_id=request.user.id,
@@ -180,8 +257,8 @@ def potential_customer_delete(request, pk):
     # 前端點擊確認
     if request.method == 'POST':
         customer_repr = str(potential_customer)  # 在刪除前先取得物件的文字表示
-        # django的內建刪除語法
-        potential_customer.delete()
+        # 先標記刪除，聯絡人、紀錄、報價單由背景工作分批清除
+        tombstone_customer(potential_customer)
 
         # 寫入操作紀錄
         LogEntry.objects.log_action(
@@ -202,15 +279,15 @@ def potential_customer_delete(request, pk):
         return JsonResponse({'html_form': html_form})
 
 # 設定關注客戶
-# 簡單的用pk取得並調整物件屬性後用save()儲存修改
+# 用一個 UPDATE 在資料庫裡取反，不讀出整筆再 save()，同時點兩次也不會互相蓋掉
 @login_required
 def toggle_pin(request, pk):
     potential_customer = get_object_or_404(PotentialCustomer, pk=pk)
-    potential_customer.is_pinned = not potential_customer.is_pinned
-    potential_customer.save()
+    is_pinned = toggle_field(PotentialCustomer.objects, pk, 'is_pinned')
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
 
     # 寫入操作紀錄
-    change_message = "置頂客戶" if potential_customer.is_pinned else "取消置頂客戶"
+    change_message = "置頂客戶" if is_pinned else "取消置頂客戶"
     LogEntry.objects.log_action(
         user_id=request.user.id,
         content_type_id=ContentType.objects.get_for_model(potential_customer).id,
@@ -221,6 +298,100 @@ def toggle_pin(request, pk):
     )
     return redirect('leads:potential_customer_detail', pk=pk)
 
+# 列表上可直接修改的欄位；置頂和 toggle_pin 一樣所有人都能切換，其他欄位只有負責業務能改
+CUSTOMER_PATCH_FIELDS = {'status', 'rank', 'sales_incharge', 'is_pinned', 'is_visitable'}
+CUSTOMER_TOGGLE_FIELDS = {'is_pinned', 'is_visitable'}
+CUSTOMER_OPEN_FIELDS = {'is_pinned'}
+
+def _owner_choices():
+    return list(User.objects.filter(is_active=True).order_by('username').values_list('pk', 'username'))
+
+# 列表上修改客戶的單一欄位 (PATCH)，只寫入這個欄位，回傳更新後的儲存格
+@login_required
+@require_http_methods(['PATCH'])
+def potential_customer_patch(request, pk):
+    potential_customer = get_object_or_404(PotentialCustomer, pk=pk)
+    try:
+        field, value = parse_patch(request, CUSTOMER_PATCH_FIELDS)
+        if field not in CUSTOMER_OPEN_FIELDS and potential_customer.sales_incharge_id != request.user.id:
+            return HttpResponseForbidden("您沒有權限編輯此客戶。")
+        if field in CUSTOMER_TOGGLE_FIELDS and value == TOGGLE:
+            toggle_field(PotentialCustomer.objects, pk, field)
+            old_value = None
+        else:
+            old_value = set_field(PotentialCustomer.objects, pk, field, clean_value(PotentialCustomer, field, value))
+    except PatchError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except PotentialCustomer.DoesNotExist:
+        raise Http404
+
+    # .update() 不會觸發signal，要自己讓快取失效；換業務會影響銷售分析
+    bump_data_version(LEADS_SCOPE, ENQUIRIES_SCOPE)
+    if field == 'sales_incharge':
+        mark_customers_dirty([pk])
+    potential_customer.refresh_from_db()
+    if field == 'status':
+        record_transition(CUSTOMER, potential_customer, old_value, potential_customer.status, request.user)
+
+    LogEntry.objects.log_action(
+        user_id=request.user.id,
+        content_type_id=ContentType.objects.get_for_model(potential_customer).id,
+        object_id=potential_customer.pk,
+        object_repr=str(potential_customer),
+        action_flag=CHANGE,
+        change_message=f"修改客戶的{PotentialCustomer._meta.get_field(field).verbose_name}"
+    )
+    html = render_to_string('leads/potential_customer_cell.html', {
+        'potential_customer': potential_customer,
+        'field': field,
+        'owner_choices': _owner_choices() if field == 'sales_incharge' else None,
+    }, request=request)
+    return JsonResponse({'success': True, 'html': html})
+
+
+# 列表批次操作：勾選的客戶，或勾選「全部符合條件」時套用目前的篩選條件 (篩選條件放在 query string 一起送出)
+@login_required
+@require_POST
+def potential_customer_bulk(request):
+    if request.POST.get('scope') == 'all':
+        queryset = _get_filtered_customers_queryset(request)
+    else:
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        queryset = PotentialCustomer.objects.filter(pk__in=ids)
+    action = request.POST.get('action', '')
+    try:
+        done, skipped = apply_bulk_action(queryset, action, request.POST.get('value', ''), request.user)
+    except PatchError as e:
+        messages.error(request, str(e))
+    else:
+        message = f"已{BULK_ACTIONS[action]} {done} 筆客戶"
+        if skipped:
+            message += f"，{skipped} 筆不是您負責的客戶已略過"
+        messages.success(request, message)
+    return redirect(reverse('leads:potential_customer_list') + '?' + request.GET.urlencode())
+
+# 還原封存的客戶，連同聯絡人、聯絡紀錄和一起封存的報價單
+@login_required
+def archived_customer_restore(request, pk):
+    archived = get_object_or_404(ArchivedCustomer, pk=pk)
+    if archived.sales_incharge_id != request.user.id:
+        return HttpResponseForbidden("您沒有權限還原此客戶。")
+    if request.method != 'POST':
+        return redirect(reverse('leads:potential_customer_list') + '?archived=1')
+    try:
+        potential_customer = restore_customer(archived)
+    except ArchiveConflict as e:
+        return HttpResponse(str(e), status=409)
+
+    LogEntry.objects.log_action(
+        user_id=request.user.id,
+        content_type_id=ContentType.objects.get_for_model(potential_customer).id,
+        object_id=potential_customer.pk,
+        object_repr=str(potential_customer),
+        action_flag=CHANGE,
+        change_message="還原封存客戶"
+    )
+    return redirect('leads:potential_customer_detail', pk=potential_customer.pk)
 
 # Contacts的CRUD
 
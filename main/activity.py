@@ -0,0 +1,127 @@
+# main/activity.py
+# 操作紀錄即時推送 (Server-Sent Events，見views.activity_stream)
+# 每個程序一個 ActivityHub，所有連線中的分頁都向它訂閱，新的操作紀錄由它分送到各分頁的 asyncio.Queue：
+#   - 同一個程序寫入的操作紀錄：post_save 在交易 commit 後直接送出，不用查資料庫
+#   - 其他程序 (多個 worker) 寫入的、bulk_create 寫入的 (不會觸發 post_save)：由一個背景 thread 每隔幾秒查一次補送
+# 不管開了多少分頁，每個程序每次只查一次資料庫；沒有人連線時背景 thread 會停止
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.db import connection
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+# 和導覽列操作紀錄視窗顯示的筆數相同 (見context_processors.py)
+RECENT_LIMIT = 15
+QUEUE_SIZE = 100
+
+
+def _poll_interval():
+    return getattr(settings, 'ACTIVITY_POLL_INTERVAL', 2)
+
+
+# 送給瀏覽器的事件內容，html 是操作紀錄視窗裡的一列
+def build_event(entry):
+    return {
+        'id': entry.pk,
+        'user': entry.user.username if entry.user_id else '',
+        'message': entry.get_change_message(),
+        'object_repr': entry.object_repr,
+        'action_time': entry.action_time.isoformat(),
+        'html': render_to_string('main/activity_log_item.html', {'log': entry}),
+    }
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: activity\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+# 編號大於 after 的操作紀錄 (最多 RECENT_LIMIT 筆，舊到新)
+def entries_after(after):
+    entries = LogEntry.objects.select_related('user', 'content_type').filter(pk__gt=after).order_by('-pk')
+    return [build_event(entry) for entry in reversed(entries[:RECENT_LIMIT])]
+
+
+# 瀏覽器跟不上時丟掉最舊的事件，不會讓 queue 無限變大
+class EventQueue(asyncio.Queue):
+    def put_latest(self, item):
+        if self.full():
+            self.get_nowait()
+        self.put_nowait(item)
+
+
+class ActivityHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {} # queue: event loop
+        self._sent = deque(maxlen=1000) # 最近送出的操作紀錄編號，post_save 和輪詢不會重複送
+        self._last_id = None
+        self._poller = None
+
+    # 訂閱，回傳的 queue 會收到之後的事件；要在 event loop 裡呼叫
+    def subscribe(self, loop):
+        queue = EventQueue(QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = loop
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name='bwp-activity-poller', daemon=True)
+                self._poller.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    # 送出事件給所有訂閱者，可以在任何 thread 呼叫
+    def publish(self, events):
+        with self._lock:
+            events = [event for event in events if event['id'] not in self._sent]
+            self._sent.extend(event['id'] for event in events)
+            subscribers = list(self._subscribers.items())
+        for event in events:
+            for queue, loop in subscribers:
+                try:
+                    loop.call_soon_threadsafe(queue.put_latest, event)
+                except RuntimeError: # event loop 已經關閉
+                    self.unsubscribe(queue)
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    # 背景輪詢：其他程序寫入的、bulk_create 寫入的操作紀錄
+    def _poll(self):
+        try:
+            # 之前的操作紀錄在頁面載入時已經顯示，從目前最新的一筆之後開始
+            self._last_id = LogEntry.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            while True:
+                time.sleep(_poll_interval())
+                with self._lock:
+                    if not self._subscribers:
+                        self._poller = None
+                        return
+                try:
+                    events = entries_after(self._last_id)
+                except Exception:
+                    logger.exception('讀取操作紀錄失敗')
+                    continue
+                if events:
+                    self._last_id = events[-1]['id']
+                    self.publish(events)
+        finally:
+            with self._lock:
+                # 發生例外結束時，下一個訂閱者會再啟動新的 thread
+                if self._poller is threading.current_thread():
+                    self._poller = None
+            connection.close()
+
+
+activity_hub = ActivityHub()
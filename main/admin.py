@@ -1,10 +1,48 @@
 # main/admin.py
 
 from django.contrib import admin
-from .models import DashboardGoal # 導入我們的新模型
+from .models import DashboardGoal, DeletedRecord, NotificationOutbox, SalesGoal, StatusTransition # 導入我們的新模型
 
 @admin.register(DashboardGoal)
 class DashboardGoalAdmin(admin.ModelAdmin):
     list_display = ('get_period_display', 'new_customer_target', 'new_enquiry_target', 'enquiry_amount_target', 'success_amount_target')
     # 讓欄位可以直接在列表頁編輯
-    list_editable = ('new_customer_target', 'new_enquiry_target', 'enquiry_amount_target', 'success_amount_target')
\ No newline at end of file
+    list_editable = ('new_customer_target', 'new_enquiry_target', 'enquiry_amount_target', 'success_amount_target')
+
+# 業務個人目標，同樣可以在列表頁直接編輯
+@admin.register(SalesGoal)
+class SalesGoalAdmin(admin.ModelAdmin):
+    list_display = ('user', 'period', 'new_customer_target', 'new_enquiry_target', 'enquiry_amount_target', 'success_amount_target')
+    list_editable = ('new_customer_target', 'new_enquiry_target', 'enquiry_amount_target', 'success_amount_target')
+    list_filter = ('period',)
+
+# 狀態變更紀錄只能新增，後台只提供查詢
+@admin.register(StatusTransition)
+class StatusTransitionAdmin(admin.ModelAdmin):
+    list_display = ('entity_type', 'object_id', 'from_status', 'to_status', 'changed_at', 'changed_by')
+    list_filter = ('entity_type', 'to_status')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# 通知寄件匣，可查看寄送狀態、錯誤訊息
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('dedupe_key', 'attempts', 'last_error', 'sent_at')
+
+# 刪除紀錄只能新增，後台只提供查詢
+@admin.register(DeletedRecord)
+class DeletedRecordAdmin(admin.ModelAdmin):
+    list_display = ('model', 'object_id', 'deleted_at')
+    list_filter = ('model',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
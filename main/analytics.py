@@ -0,0 +1,279 @@
+# main/analytics.py
+# 銷售分析 cube
+# 客戶、報價單、品項先依 業務 × 國家 × 公司類型 × 產業組合 × 月份 彙總成 SalesCubeCell，
+# 樞紐分析不再掃原始資料表，而是把整個 cube 讀成 numpy 陣列，用 bincount 做任意維度的切片、加總
+#
+# 增量更新：資料異動時只標記受影響的月份 (SalesCubeDirtyMonth)，重算時只重建這些月份的 cell
+# signal 會自動標記；用 .update()、raw delete 的路徑 (標記刪除、封存) 要自己呼叫 mark_*_dirty
+# 重算不在查詢時做：標記後等 SALES_CUBE_REFRESH_DELAY 秒由背景工作重算，這段時間內的異動一起算；
+# 程序重啟時還沒執行的重算會遺失，請排程 refresh_sales_cube 指令補跑
+# 各程序記憶體裡的 cube 依資料庫裡的版本號 (SalesCubeState) 重新讀取，哪個程序重算的都一樣
+
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, F, FloatField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from lead_enquiries.models import Enquiry
+from leads.models import PotentialCustomer
+from .background import run_in_background
+from .models import SalesCubeCell, SalesCubeDirtyMonth, SalesCubeState
+
+DIMENSIONS = {
+    'salesperson': '業務',
+    'country': '國家',
+    'company_type': '公司類型',
+    'industry': '產業',
+    'month': '月份',
+}
+MEASURES = {
+    'leads': '新增客戶數',
+    'quotes': '報價數',
+    'won_quotes': '成交報價數',
+    'quoted_ntd': '報價金額 (NTD)',
+    'won_ntd': '成交金額 (NTD)',
+}
+
+
+# 換算成當地時間所在月份的1日
+def month_of(value):
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def _local_start(month):
+    return timezone.make_aware(timezone.datetime(month.year, month.month, 1))
+
+
+def mark_months_dirty(months):
+    months = {month for month in months if month}
+    if months:
+        SalesCubeDirtyMonth.objects.bulk_create([SalesCubeDirtyMonth(month=month) for month in months],
+                                                ignore_conflicts=True)
+        transaction.on_commit(_schedule_refresh)
+
+
+def _months(queryset):
+    return queryset.annotate(cube_month=TruncMonth('created_at', output_field=DateField())) \
+        .order_by().values_list('cube_month', flat=True).distinct()
+
+
+# 客戶的國家、類型等改變時，底下所有報價單所在的月份都要重算
+def mark_customers_dirty(customer_ids):
+    mark_months_dirty(list(_months(PotentialCustomer.all_objects.filter(pk__in=customer_ids)))
+                      + list(_months(Enquiry.all_objects.filter(potential_customer_id__in=customer_ids))))
+
+
+def mark_enquiries_dirty(enquiry_ids):
+    mark_months_dirty(_months(Enquiry.all_objects.filter(pk__in=enquiry_ids)))
+
+
+def _month_filter(months, field='created_at'):
+    condition = Q()
+    for month in months:
+        condition |= Q(**{f'{field}__gte': _local_start(month), f'{field}__lt': _local_start(_next_month(month))})
+    return condition
+
+
+def _industries_key(industries):
+    return ','.join(sorted(industries or []))
+
+
+# 依月份重算 cell，months 為 None 時重算全部
+def _compute_cells(months):
+    customers = PotentialCustomer.objects.all()
+    enquiries = Enquiry.objects.filter(potential_customer__deleted_at__isnull=True)
+    if months is not None:
+        customers = customers.filter(_month_filter(months))
+        enquiries = enquiries.filter(_month_filter(months))
+
+    cells = {}
+
+    def cell(month, salesperson_id, country, company_type, industries):
+        key = (month, salesperson_id, country or '', company_type or '', _industries_key(industries))
+        if key not in cells:
+            cells[key] = SalesCubeCell(month=key[0], salesperson_id=key[1], country=key[2],
+                                       company_type=key[3], industries=key[4])
+        return cells[key]
+
+    lead_rows = (customers.annotate(cube_month=TruncMonth('created_at', output_field=DateField()))
+                 .values('cube_month', 'sales_incharge_id', 'country', 'company_type', 'industries')
+                 .annotate(n=Count('pk')).order_by())
+    for row in lead_rows:
+        cell(row['cube_month'], row['sales_incharge_id'], row['country'], row['company_type'],
+             row['industries']).leads += row['n']
+
+    amount = F('items__quantity') * F('items__unit_price') * F('items__exchange_rate')
+    won = Q(status='success')
+    quote_rows = (enquiries.annotate(cube_month=TruncMonth('created_at', output_field=DateField()))
+                  .values('cube_month', 'created_by_id', 'potential_customer__country',
+                          'potential_customer__company_type', 'potential_customer__industries')
+                  .annotate(quotes=Count('pk', distinct=True),
+                            won_quotes=Count('pk', distinct=True, filter=won),
+                            quoted_ntd=Sum(amount, output_field=FloatField()),
+                            won_ntd=Sum(amount, filter=won, output_field=FloatField()))
+                  .order_by())
+    for row in quote_rows:
+        target = cell(row['cube_month'], row['created_by_id'], row['potential_customer__country'],
+                      row['potential_customer__company_type'], row['potential_customer__industries'])
+        target.quotes += row['quotes']
+        target.won_quotes += row['won_quotes']
+        target.quoted_ntd += row['quoted_ntd'] or 0
+        target.won_ntd += row['won_ntd'] or 0
+    return list(cells.values())
+
+
+# 重算標記過的月份，full=True 時整個重建；回傳重算的月份數
+def refresh_cube(full=False):
+    with transaction.atomic():
+        # 鎖住狀態列，多個程序同時重算時依序執行 (SQLite 不支援 select_for_update，本來就一次只有一個寫入)
+        state, _ = SalesCubeState.objects.select_for_update().get_or_create(pk=1)
+        if full:
+            months = None
+            SalesCubeDirtyMonth.objects.all().delete()
+            SalesCubeCell.objects.all().delete()
+        else:
+            months = list(SalesCubeDirtyMonth.objects.values_list('month', flat=True))
+            if not months:
+                return 0
+            SalesCubeDirtyMonth.objects.filter(month__in=months).delete()
+            SalesCubeCell.objects.filter(month__in=months).delete()
+        cells = _compute_cells(months)
+        SalesCubeCell.objects.bulk_create(cells, batch_size=1000)
+        state.version += 1
+        state.refreshed_at = timezone.now()
+        state.save()
+    return len({cell.month for cell in cells}) if months is None else len(months)
+
+
+_refresh_lock = threading.Lock()
+_refresh_timer = None
+
+
+# 標記異動月份的交易 commit 後呼叫，已經在等待中就不再排一次
+def _schedule_refresh():
+    global _refresh_timer
+    with _refresh_lock:
+        if _refresh_timer is not None:
+            return
+        _refresh_timer = threading.Timer(getattr(settings, 'SALES_CUBE_REFRESH_DELAY', 30), _refresh_due)
+        _refresh_timer.daemon = True
+        _refresh_timer.start()
+
+
+def _refresh_due():
+    global _refresh_timer
+    with _refresh_lock:
+        _refresh_timer = None
+    run_in_background(refresh_cube)
+
+
+# 最後重算時間和待重算的月份數 (樞紐分析頁面顯示用)
+def cube_status():
+    refreshed_at = SalesCubeState.objects.filter(pk=1).values_list('refreshed_at', flat=True).first()
+    return refreshed_at, SalesCubeDirtyMonth.objects.count()
+
+
+# 讀進記憶體的 cube，每個維度、指標各是一個 numpy 陣列
+class SalesCube:
+    def __init__(self, rows):
+        self.size = len(rows)
+        months, salespeople, countries, company_types, industries, *measures = zip(*rows) if rows else [()] * 10
+        self.dims = {
+            'month': np.array([month.strftime('%Y-%m') for month in months], dtype='U7'),
+            'salesperson': np.array([pk or 0 for pk in salespeople], dtype=np.int64),
+            'country': np.array(countries, dtype=str),
+            'company_type': np.array(company_types, dtype=str),
+        }
+        self.measures = {name: np.array(values, dtype=np.float64) for name, values in zip(MEASURES, measures)}
+        # 產業組合展開成 (cell 索引, 單一產業) 兩個陣列，依產業分組或篩選時使用
+        exploded_cells, exploded_industries = [], []
+        for index, combination in enumerate(industries):
+            for industry in (combination.split(',') if combination else ['']):
+                exploded_cells.append(index)
+                exploded_industries.append(industry)
+        self.industry_cells = np.array(exploded_cells, dtype=np.int64)
+        self.industry_values = np.array(exploded_industries, dtype=str)
+
+    def _mask(self, filters, month_from, month_to):
+        mask = np.ones(self.size, dtype=bool)
+        if month_from:
+            mask &= self.dims['month'] >= month_from
+        if month_to:
+            mask &= self.dims['month'] <= month_to
+        for dim, value in filters.items():
+            if value in (None, ''):
+                continue
+            if dim == 'industry':
+                matched = np.zeros(self.size, dtype=bool)
+                matched[self.industry_cells[self.industry_values == value]] = True
+                mask &= matched
+            elif dim == 'salesperson':
+                mask &= self.dims[dim] == int(value)
+            else:
+                mask &= self.dims[dim] == value
+        return mask
+
+    def _group(self, dim, measure, mask):
+        if dim == 'industry':
+            keep = mask[self.industry_cells]
+            values = self.industry_values[keep]
+            weights = self.measures[measure][self.industry_cells[keep]]
+        else:
+            values = self.dims[dim][mask]
+            weights = self.measures[measure][mask]
+        labels, inverse = np.unique(values, return_inverse=True)
+        return labels, np.bincount(inverse, weights=weights, minlength=len(labels))
+
+    # 樞紐表：row_dim × col_dim 的 measure 加總，col_dim 可以不指定
+    # 依產業分組時，多產業的客戶會出現在每個產業底下，所以各列相加會大於總計
+    def pivot(self, row_dim, col_dim, measure, filters=None, month_from=None, month_to=None):
+        mask = self._mask(filters or {}, month_from, month_to)
+        row_labels, row_totals = self._group(row_dim, measure, mask)
+        grand_total = float(self.measures[measure][mask].sum())
+        if not col_dim:
+            return {'rows': row_labels.tolist(), 'cols': [], 'matrix': [[] for _ in row_labels],
+                    'row_totals': row_totals.tolist(), 'col_totals': [], 'total': grand_total}
+
+        col_labels, col_totals = self._group(col_dim, measure, mask)
+        if 'industry' in (row_dim, col_dim):
+            keep = mask[self.industry_cells]
+            cell_index = self.industry_cells[keep]
+            industry = self.industry_values[keep]
+        else:
+            cell_index = np.flatnonzero(mask)
+            industry = None
+
+        def values(dim):
+            return industry if dim == 'industry' else self.dims[dim][cell_index]
+
+        row_inverse = np.searchsorted(row_labels, values(row_dim))
+        col_inverse = np.searchsorted(col_labels, values(col_dim))
+        matrix = np.bincount(row_inverse * len(col_labels) + col_inverse,
+                             weights=self.measures[measure][cell_index],
+                             minlength=len(row_labels) * len(col_labels)).reshape(len(row_labels), len(col_labels))
+        return {'rows': row_labels.tolist(), 'cols': col_labels.tolist(), 'matrix': matrix.tolist(),
+                'row_totals': row_totals.tolist(), 'col_totals': col_totals.tolist(), 'total': grand_total}
+
+
+_cube_lock = threading.Lock()
+_loaded = {'version': None, 'cube': None}
+
+
+# 取得目前的 cube，資料庫裡的版本號沒變就沿用記憶體裡的陣列
+def get_cube():
+    version = SalesCubeState.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+    with _cube_lock:
+        if _loaded['version'] != version:
+            rows = list(SalesCubeCell.objects.values_list(
+                'month', 'salesperson_id', 'country', 'company_type', 'industries', *MEASURES))
+            _loaded['cube'] = SalesCube(rows)
+            _loaded['version'] = version
+        return _loaded['cube']
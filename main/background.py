@@ -0,0 +1,35 @@
+# main/background.py
+# 簡單的背景工作
+# 在同一個程序裡用 thread pool 執行，不需要另外架設 Celery 之類的任務佇列
+# 工作等交易 commit 後才送出，確保背景 thread 讀得到剛寫入的資料；執行完關閉這個 thread 的資料庫連線
+# 程序重啟時還沒執行的工作會遺失，所以每種背景工作都要有對應的管理指令可以補跑
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+    thread_name_prefix='bwp-background',
+)
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('背景工作 %s 執行失敗', func.__name__)
+    finally:
+        connection.close()
+
+
+# 送出背景工作，BACKGROUND_TASKS_EAGER = True 時直接在目前的 thread 執行 (測試、管理指令用)
+def run_in_background(func, *args, **kwargs):
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+    else:
+        transaction.on_commit(lambda: _executor.submit(_run, func, args, kwargs))
@@ -0,0 +1,32 @@
+# main/bulk.py
+# 列表批次操作共用的工具
+# 勾選的資料或「符合目前篩選條件的全部資料」可能有上萬筆，不逐筆 save()：
+# 依主鍵順序每次取一批 id，用一個 UPDATE ... WHERE id IN (...) 寫入，操作紀錄每批一次 bulk_create
+
+from django.contrib.admin.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+
+BULK_CHUNK_SIZE = 500
+
+
+# 依主鍵順序分批取出 id (keyset 分頁，不用 OFFSET)；前面的批次修改後不再符合條件也不會漏掉後面的資料
+def chunked_ids(queryset, chunk_size=BULK_CHUNK_SIZE):
+    ids_query = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        chunk = ids_query if last_pk is None else ids_query.filter(pk__gt=last_pk)
+        ids = list(chunk[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+# 一批資料各寫一筆操作紀錄，rows 為 (主鍵, 顯示名稱)
+def log_bulk_action(user, model, rows, action_flag, change_message):
+    content_type_id = ContentType.objects.get_for_model(model).id
+    LogEntry.objects.bulk_create([
+        LogEntry(user_id=user.id, content_type_id=content_type_id, object_id=str(pk), object_repr=str(name)[:200],
+                 action_flag=action_flag, change_message=change_message)
+        for pk, name in rows
+    ], batch_size=500)
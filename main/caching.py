@@ -0,0 +1,58 @@
+# main/caching.py
+# 讀取量大的統計/列表查詢結果快取
+# 用「資料版本號」做失效：每個 scope 在 cache 裡存一個版本號，資料有寫入就換一個新的版本號，
+# 讀取時把版本號組進 cache key，舊版本的快取自然不會再被讀到，等 timeout 到期後被清掉。
+# 版本號要所有程序共用才有效，settings.CACHES 不能用各程序各自一份的 LocMemCache
+# 新版本號用亂數而不是 +1：DatabaseCache 的 incr 是先讀再寫，兩個程序同時 +1 會得到同一個版本號
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+
+# scope 名稱，寫入時依照影響範圍遞增
+LEADS_SCOPE = 'leads'
+ENQUIRIES_SCOPE = 'enquiries'
+
+DEFAULT_TIMEOUT = 300
+
+
+def _version_key(scope):
+    return f'data_version:{scope}'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:16]
+
+
+# 取得目前的資料版本號，版本號被清掉 (cache 清空、超過 MAX_ENTRIES 被剔除) 時產生新的，不會回到舊版本號
+def get_data_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key, '')
+    return version
+
+
+# 資料有異動時呼叫，讓這個 scope 底下所有快取失效
+def bump_data_version(*scopes):
+    cache.set_many({_version_key(scope): _new_version() for scope in scopes}, None)
+
+
+# 把 scope 版本號和查詢參數組成 cache key，參數先排序再 hash，確保順序不同也會命中同一個 key
+def build_cache_key(name, scopes, params=None):
+    versions = '-'.join(str(get_data_version(scope)) for scope in scopes)
+    raw = repr(sorted((params or {}).items()))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'{name}:{versions}:{digest}'
+
+
+# 有快取就直接回傳，沒有就呼叫 compute() 計算後存入
+def get_or_compute(name, scopes, params, compute, timeout=DEFAULT_TIMEOUT):
+    key = build_cache_key(name, scopes, params)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, timeout)
+    return result
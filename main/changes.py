@@ -0,0 +1,117 @@
+# main/changes.py
+# 異動資料流 (給報表資料倉儲、離線同步)
+# 依 (updated_at, 編號) 排序往後讀出異動過的資料，加上刪除紀錄 (DeletedRecord)，下游只要同步差異，不用每晚複製整個資料庫
+# cursor 記錄上一頁最後一筆資料和最後一筆刪除紀錄的位置，用同一個 cursor 重讀會得到同樣的下一頁，中斷後可以接著讀
+# 只讀到「現在 - CHANGE_FEED_LAG_SECONDS」為止：寫入時的 updated_at 早於 commit，剛好卡在讀取當下的交易要等下一輪才看得到
+#
+# 注意：
+#   - .update() / bulk_update 不會自動更新 auto_now，寫入這些資料表時要自己帶 updated_at
+#   - 排序鍵、評分、下次追蹤日等由其他資料算出來的欄位不更新 updated_at，也不放進資料流，下游要自己依原始資料計算
+#   - 標記刪除 (deleted_at) 的客戶、報價單直接以刪除送出
+
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from lead_enquiries.models import Enquiry, EnquiryItem, EnquiryTrack
+from leads.models import PotentialCustomer, Contacts, ContactLogs
+from .models import DeletedRecord
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# 資料流名稱: (model, 不輸出的衍生欄位)
+FEEDS = {
+    'customers': (PotentialCustomer, {'company_sort_key', 'score', 'suggested_rank', 'scored_at'}),
+    'contacts': (Contacts, set()),
+    'contact_logs': (ContactLogs, set()),
+    'enquiries': (Enquiry, {'last_tracked_at', 'next_followup_due'}),
+    'enquiry_items': (EnquiryItem, set()),
+    'enquiry_tracks': (EnquiryTrack, set()),
+}
+FEED_LABELS = {model._meta.label_lower for model, _ in FEEDS.values()}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class CursorError(Exception):
+    pass
+
+
+# 直接 DELETE 的地方 (沒有 post_delete signal) 呼叫，記錄這些資料被刪除了
+def record_deletions(model, ids, deleted_at=None):
+    if model._meta.label_lower not in FEED_LABELS or not ids:
+        return
+    deleted_at = deleted_at or timezone.now()
+    DeletedRecord.objects.bulk_create(
+        [DeletedRecord(model=model._meta.label_lower, object_id=pk, deleted_at=deleted_at) for pk in ids])
+
+
+def encode_cursor(position):
+    data = {key: [value[0].isoformat(), value[1]] for key, value in position.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+# cursor 格式 {"u": [updated_at, 編號], "d": [deleted_at, 刪除紀錄編號]}，空的 cursor 從頭讀起
+def decode_cursor(cursor):
+    position = {'u': (_EPOCH, 0), 'd': (_EPOCH, 0)}
+    if not cursor:
+        return position
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        for key in position:
+            if key in data:
+                moment, pk = data[key]
+                position[key] = (datetime.fromisoformat(moment), int(pk))
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise CursorError('cursor 格式錯誤')
+    return position
+
+
+def _after(field, moment, pk, pk_field='pk'):
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, f'{pk_field}__gt': pk})
+
+
+def feed_fields(feed):
+    model, excluded = FEEDS[feed]
+    return [field.attname for field in model._meta.concrete_fields if field.name not in excluded]
+
+
+# 讀出一頁異動，回傳 (異動列表, 下一頁的 cursor, 是否還有更多)
+# 異動依時間排序，每筆為 {"op": "upsert"/"delete", "pk", "at", "data"}，刪除沒有 data
+def read_changes(feed, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    model, _ = FEEDS[feed]
+    position = decode_cursor(cursor)
+    horizon = timezone.now() - timedelta(seconds=getattr(settings, 'CHANGE_FEED_LAG_SECONDS', 5))
+    pk_name = model._meta.pk.attname
+
+    upserts = list(model._base_manager.filter(_after('updated_at', *position['u']), updated_at__lte=horizon)
+                   .order_by('updated_at', 'pk').values(*feed_fields(feed))[:limit + 1])
+    deletions = list(DeletedRecord.objects.filter(_after('deleted_at', *position['d'], pk_field='id'),
+                                                  model=model._meta.label_lower, deleted_at__lte=horizon)
+                     .order_by('deleted_at', 'id').values_list('id', 'object_id', 'deleted_at')[:limit + 1])
+
+    merged = [(row['updated_at'], 'u', row[pk_name], row) for row in upserts]
+    merged += [(deleted_at, 'd', record_id, object_id) for record_id, object_id, deleted_at in deletions]
+    merged.sort(key=lambda change: change[:3])
+    has_more = len(merged) > limit
+    changes = []
+    for moment, kind, pk, row in merged[:limit]:
+        position[kind] = (moment, pk)
+        if kind == 'd':
+            changes.append({'op': 'delete', 'pk': row, 'at': moment})
+        elif row.get('deleted_at'):
+            changes.append({'op': 'delete', 'pk': pk, 'at': moment})
+        else:
+            changes.append({'op': 'upsert', 'pk': pk, 'at': moment, 'data': row})
+    return changes, encode_cursor(position), has_more
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
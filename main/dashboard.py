@@ -0,0 +1,120 @@
+# main/dashboard.py
+# 儀表板的統計數字
+# 各個數字彼此獨立，每個都是一個 COUNT / SUM 查詢，以前在 view 裡一個接一個執行，總時間是全部加起來
+# 改成同時送出：每個查詢用 sync_to_async(thread_sensitive=False) 丟到 thread pool，各自用自己的資料庫連線，再用 asyncio.gather 等全部完成，
+# 總時間約等於最慢的那一個
+# 註：Django 的 acount()/aaggregate() 目前仍是在同一個 thread 裡依序執行 (thread_sensitive=True)，gather 起來並不會同時查詢，所以不用
+#
+# 儀表板頁面本身不查統計，各區塊 (widget) 由瀏覽器另外載入 (見views.dashboard_widget)，頁面先顯示，慢的區塊載入後再補上
+
+import asyncio
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import F, FloatField, Sum
+
+from lead_enquiries.models import Enquiry
+from leads.models import PotentialCustomer
+from .leaderboard import leaderboard
+from .models import DashboardGoal
+
+AMOUNT_NTD = F('items__quantity') * F('items__unit_price') * F('items__exchange_rate')
+
+
+def _amount_ntd(queryset):
+    return queryset.aggregate(total_ntd=Sum(AMOUNT_NTD, output_field=FloatField()))['total_ntd'] or 0
+
+
+def _goal_percentage(value, target):
+    try:
+        return float(value) / float(target) * 100 if target > 0 else 0
+    except (TypeError, ZeroDivisionError):
+        return 0
+
+
+# 客戶區塊的統計，{名稱: 查詢}，每個查詢呼叫後回傳一個數字
+def customer_queries(start, end):
+    customers = PotentialCustomer.objects.filter(created_at__range=(start, end))
+    return {
+        'new_customers_count': customers.count,
+        'inquired_customers_count': customers.filter(enquiries__isnull=False).distinct().count,
+        'success_customers_count': customers.filter(enquiries__status='success').distinct().count,
+    }
+
+
+# 報價區塊的統計
+def enquiry_queries(start, end):
+    enquiries = Enquiry.objects.filter(created_at__range=(start, end))
+    success_enquiries = enquiries.filter(status='success')
+    return {
+        'new_enquiries_count': enquiries.count,
+        'new_enquiries_amount': partial(_amount_ntd, enquiries),
+        'success_enquiries_count': success_enquiries.count,
+        'success_enquiries_amount': partial(_amount_ntd, success_enquiries),
+    }
+
+
+# 依序執行 (效能比較用，見 benchmark_dashboard 指令)
+def run_sequentially(queries):
+    return {name: query() for name, query in queries.items()}
+
+
+# 在 thread pool 的 thread 裡執行，用完關閉這個 thread 的資料庫連線
+def _run_in_thread(query):
+    try:
+        return query()
+    finally:
+        connection.close()
+
+
+# 同時執行所有查詢，回傳 {名稱: 結果}
+async def run_concurrently(queries):
+    results = await asyncio.gather(*(sync_to_async(_run_in_thread, thread_sensitive=False)(query)
+                                     for query in queries.values()))
+    return dict(zip(queries, results))
+
+
+async def _get_goal(period):
+    goal, _ = await DashboardGoal.objects.aget_or_create(period=period)
+    return goal
+
+
+# 各區塊的內容，回傳 template context
+async def customers_widget(period, start, end):
+    goal = await _get_goal(period)
+    context = await run_concurrently({
+        **customer_queries(start, end),
+        'pinned_customers': lambda: list(PotentialCustomer.objects.filter(is_pinned=True)),
+    })
+    context['goal'] = goal
+    context['success_customers_percentage'] = _goal_percentage(context['success_customers_count'],
+                                                               goal.new_customer_target)
+    return context
+
+
+async def enquiries_widget(period, start, end):
+    goal = await _get_goal(period)
+    context = await run_concurrently({
+        **enquiry_queries(start, end),
+        'pinned_enquiries': lambda: list(Enquiry.objects.filter(is_pinned=True).select_related('potential_customer')),
+    })
+    context['goal'] = goal
+    context['new_enquiries_amount_percentage'] = _goal_percentage(context['new_enquiries_amount'],
+                                                                  goal.enquiry_amount_target)
+    context['success_enquiries_amount_percentage'] = _goal_percentage(context['success_enquiries_amount'],
+                                                                      goal.success_amount_target)
+    return context
+
+
+async def leaderboard_widget(period, start, end):
+    board = await sync_to_async(_run_in_thread, thread_sensitive=False)(partial(leaderboard, period, start, end))
+    return {'leaderboard': board}
+
+
+# 區塊名稱: (產生 context 的函式, 樣板)
+WIDGETS = {
+    'customers': (customers_widget, 'main/widgets/customers.html'),
+    'enquiries': (enquiries_widget, 'main/widgets/enquiries.html'),
+    'leaderboard': (leaderboard_widget, 'main/widgets/leaderboard.html'),
+}
@@ -0,0 +1,36 @@
+# main/facets.py
+# 列表頁篩選器的選項筆數 (facet counts)
+
+from django.db.models import Count
+
+
+# 用一次 GROUP BY 取回所有篩選維度組合的筆數，再在 Python 端算出每個維度各選項的筆數
+# 某個維度的筆數只套用「其他」已選擇的篩選器，使用者切換這個篩選器前就能看到會剩下幾筆
+# facet_fields: {'status': 'status', 'owner': 'sales_incharge__username', ...}
+# active_filters: {'status': 'contacted', 'owner': '', ...} 空字串代表沒有篩選
+# 回傳 (facets, total)，total 是套用全部篩選器後的總筆數，可直接給 Paginator 用
+def compute_facets(queryset, facet_fields, active_filters, count=None):
+    count = count or Count('pk')
+    rows = queryset.order_by().values(*facet_fields.values()).annotate(facet_count=count)
+
+    facets = {name: {} for name in facet_fields}
+    total = 0
+    for row in rows:
+        values = {name: row[field] or '' for name, field in facet_fields.items()}
+        n = row['facet_count']
+        mismatched = [name for name in facet_fields
+                      if active_filters.get(name) and str(values[name]) != active_filters[name]]
+        if not mismatched:
+            total += n
+        for name in facet_fields:
+            key = str(values[name])
+            facets[name].setdefault(key, 0)
+            # 只有自己這個維度不符合(或全部符合)時，才計入這個維度的選項筆數
+            if all(m == name for m in mismatched):
+                facets[name][key] += n
+    return facets, total
+
+
+# 把 choices 和筆數組成模板好用的 (value, label, count) list
+def facet_options(choices, counts):
+    return [(value, label, counts.get(str(value), 0)) for value, label in choices]
@@ -0,0 +1,75 @@
+# main/inline_edit.py
+# 列表上直接修改單一欄位 (PATCH)
+# 不讀出整筆資料再 save()，而是一個 UPDATE ... SET 欄位 = 值：其他欄位不會被覆寫成讀取當下的舊值
+# 切換類的欄位 (置頂等) 用 CASE WHEN 在資料庫裡取反，兩個人同時點也不會互相蓋掉
+# .update() 不會觸發 signal，呼叫的地方要自己讓快取失效、標記銷售分析要重算、記錄狀態變更
+
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.http import QueryDict
+from django.utils import timezone
+
+TOGGLE = 'toggle'
+
+
+class PatchError(Exception):
+    pass
+
+
+# 讀出 PATCH 的內容，只接受一個欄位：JSON {"status": "contacted"} 或表單格式 status=contacted
+def parse_patch(request, allowed_fields):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise PatchError('內容不是有效的 JSON')
+        if not isinstance(data, dict):
+            raise PatchError('內容必須是 JSON 物件')
+    else:
+        data = QueryDict(request.body, encoding=request.encoding).dict()
+    if len(data) != 1:
+        raise PatchError('一次只能修改一個欄位')
+    field, value = next(iter(data.items()))
+    if field not in allowed_fields:
+        raise PatchError(f'不能修改欄位 {field}')
+    return field, value
+
+
+# 依 model 欄位的表單欄位驗證並轉換值 (選項、外鍵、布林值等)
+def clean_value(model, field_name, value):
+    formfield = model._meta.get_field(field_name).formfield()
+    try:
+        return formfield.clean(value)
+    except ValidationError as e:
+        raise PatchError('；'.join(e.messages))
+
+
+def _touch(model):
+    return {'updated_at': timezone.now()} if any(field.name == 'updated_at' for field in model._meta.fields) else {}
+
+
+# 把一筆資料的一個欄位設成 value，回傳原本的值 (記錄狀態變更用)
+# 用 UPDATE ... WHERE 欄位 = 原值 比對後寫入，中間被別人改掉就重讀再寫，原值一定是寫入前的最後一個值
+# 不開交易先讀後寫：SQLite 在交易中把讀取鎖升級成寫入鎖時，遇到別人正在寫會直接失敗
+def set_field(queryset, pk, field_name, value):
+    attname = queryset.model._meta.get_field(field_name).attname
+    while True:
+        current = list(queryset.filter(pk=pk).values_list(attname, flat=True)[:1])
+        if not current:
+            raise queryset.model.DoesNotExist
+        if queryset.filter(pk=pk, **{attname: current[0]}).update(**{field_name: value}, **_touch(queryset.model)):
+            return current[0]
+
+
+# 把一筆資料的布林欄位取反，回傳新的值；先寫再讀，同一個交易裡讀到的就是自己寫入的值
+def toggle_field(queryset, pk, field_name):
+    with transaction.atomic():
+        updated = queryset.filter(pk=pk).update(
+            **{field_name: Case(When(**{field_name: True}, then=Value(False)), default=Value(True))},
+            **_touch(queryset.model))
+        if not updated:
+            raise queryset.model.DoesNotExist
+        return queryset.filter(pk=pk).values_list(field_name, flat=True).get()
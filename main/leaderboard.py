@@ -0,0 +1,76 @@
+# main/leaderboard.py
+# 業務排行榜
+# 期間內每位業務的新增客戶數、報價數、報價金額、成交金額，客戶依 sales_incharge、報價單依 created_by 各一次 GROUP BY，
+# 不會每位業務各查一次；結果依期間快取，客戶、報價、個人目標有異動時失效
+
+from django.contrib.auth.models import User
+from django.db.models import Count, F, FloatField, Q, Sum
+
+from lead_enquiries.models import Enquiry
+from leads.models import PotentialCustomer
+from .caching import get_or_compute, LEADS_SCOPE, ENQUIRIES_SCOPE
+from .models import SalesGoal
+
+GOALS_SCOPE = 'goals'
+
+
+def _percentage(value, target):
+    return float(value) / float(target) * 100 if target else None
+
+
+def _compute_leaderboard(period, start, end):
+    customers = (PotentialCustomer.objects.filter(created_at__range=(start, end), sales_incharge__isnull=False)
+                 .values('sales_incharge_id').annotate(n=Count('pk')).order_by())
+    amount = F('items__quantity') * F('items__unit_price') * F('items__exchange_rate')
+    enquiries = (Enquiry.objects.filter(created_at__range=(start, end), created_by__isnull=False)
+                 .values('created_by_id')
+                 .annotate(quotes=Count('pk', distinct=True),
+                           quoted_ntd=Sum(amount, output_field=FloatField()),
+                           won_ntd=Sum(amount, filter=Q(status='success'), output_field=FloatField()))
+                 .order_by())
+
+    stats = {}
+
+    def row(user_id):
+        return stats.setdefault(user_id, {'new_customers': 0, 'quotes': 0, 'quoted_ntd': 0, 'won_ntd': 0})
+
+    for item in customers:
+        row(item['sales_incharge_id'])['new_customers'] = item['n']
+    for item in enquiries:
+        target = row(item['created_by_id'])
+        target['quotes'] = item['quotes']
+        target['quoted_ntd'] = item['quoted_ntd'] or 0
+        target['won_ntd'] = item['won_ntd'] or 0
+
+    goals = {goal.user_id: goal for goal in SalesGoal.objects.filter(period=period)}
+    for user_id in goals:
+        row(user_id)
+    names = dict(User.objects.filter(pk__in=stats).values_list('pk', 'username'))
+
+    board = []
+    for user_id, figures in stats.items():
+        goal = goals.get(user_id)
+        board.append({
+            'user_id': user_id,
+            'username': names.get(user_id, ''),
+            **figures,
+            'goal': {
+                'new_customers': goal.new_customer_target,
+                'quotes': goal.new_enquiry_target,
+                'quoted_ntd': float(goal.enquiry_amount_target),
+                'won_ntd': float(goal.success_amount_target),
+            } if goal else None,
+            'new_customers_percentage': _percentage(figures['new_customers'], goal.new_customer_target) if goal else None,
+            'quotes_percentage': _percentage(figures['quotes'], goal.new_enquiry_target) if goal else None,
+            'quoted_ntd_percentage': _percentage(figures['quoted_ntd'], goal.enquiry_amount_target) if goal else None,
+            'won_ntd_percentage': _percentage(figures['won_ntd'], goal.success_amount_target) if goal else None,
+        })
+    board.sort(key=lambda item: (-item['won_ntd'], -item['quoted_ntd'], item['username']))
+    return board
+
+
+# 期間內的業務排行榜，依成交金額、報價金額排序
+def leaderboard(period, start, end):
+    return get_or_compute('leaderboard', [LEADS_SCOPE, ENQUIRIES_SCOPE, GOALS_SCOPE],
+                          {'period': period, 'start': start.isoformat()},
+                          lambda: _compute_leaderboard(period, start, end))
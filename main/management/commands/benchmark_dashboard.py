@@ -0,0 +1,47 @@
+# 比較儀表板統計依序查詢和同時查詢的耗時 (見main/dashboard.py)
+# 只讀取不寫入，請在資料量接近正式環境的資料庫 (例如正式資料庫的複本) 上執行
+# python manage.py benchmark_dashboard --period yearly --repeat 10
+
+import asyncio
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.dashboard import customer_queries, enquiry_queries, run_concurrently, run_sequentially
+from main.views import get_date_range
+
+
+class Command(BaseCommand):
+    help = '比較儀表板統計依序查詢和同時查詢的耗時'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=['monthly', 'quarterly', 'yearly'], default='yearly', help='統計週期')
+        parser.add_argument('--repeat', type=int, default=5, help='各執行幾次')
+
+    def handle(self, *args, **options):
+        start, end = get_date_range(options['period'])
+        queries = {**customer_queries(start, end), **enquiry_queries(start, end)}
+
+        def measure(run):
+            run() # 第一次執行暖機，不計入
+            timings = []
+            for _ in range(max(options['repeat'], 1)):
+                started = time.perf_counter()
+                result = run()
+                timings.append((time.perf_counter() - started) * 1000)
+            return timings, result
+
+        sequential, expected = measure(lambda: run_sequentially(queries))
+        concurrent, result = measure(lambda: asyncio.run(run_concurrently(queries)))
+        if result != expected:
+            self.stdout.write(self.style.WARNING('兩種方式的結果不同 (執行期間資料有異動？)'))
+
+        # SQLite 的查詢在這個程序裡執行，只有一顆 CPU 時同時查詢不會比較快
+        self.stdout.write(f'{len(queries)} 個查詢，各執行 {len(sequential)} 次，CPU {os.cpu_count()} 核')
+        for label, timings in (('依序查詢', sequential), ('同時查詢', concurrent)):
+            self.stdout.write(f'{label}: 中位數 {statistics.median(timings):.1f} ms，最快 {min(timings):.1f} ms，'
+                              f'最慢 {max(timings):.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'同時查詢的耗時為依序查詢的 {statistics.median(concurrent) / statistics.median(sequential) * 100:.0f}%'))
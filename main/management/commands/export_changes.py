@@ -0,0 +1,63 @@
+# 輸出 cursor 之後異動的資料 (NDJSON，每行一筆，含 feed 名稱)，給報表資料倉儲同步用
+# --state 記錄每個資料流讀到哪裡，下次執行只輸出差異；輸出完成後才更新 state，中途失敗重跑會從上次的位置接著讀
+# python manage.py export_changes --state sync_state.json --output changes.ndjson
+# python manage.py export_changes --feed enquiries --feed enquiry_items --cursor <cursor>
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.changes import FEEDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CursorError, decode_cursor, dumps, read_changes
+
+
+class Command(BaseCommand):
+    help = '輸出異動資料 (NDJSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feed', action='append', choices=sorted(FEEDS), help='只輸出指定的資料流，可重複指定 (預設全部)')
+        parser.add_argument('--state', help='記錄各資料流 cursor 的 JSON 檔，不存在時從頭輸出')
+        parser.add_argument('--cursor', default='', help='從指定的 cursor 開始 (只能搭配單一 --feed)')
+        parser.add_argument('--output', help='輸出檔案 (預設 stdout)')
+        parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='每次讀取的筆數')
+
+    def handle(self, *args, **options):
+        feeds = options['feed'] or list(FEEDS)
+        if options['cursor'] and len(feeds) != 1:
+            raise CommandError('--cursor 只能搭配單一 --feed')
+        page_size = min(max(options['page_size'], 1), MAX_PAGE_SIZE)
+
+        state = {}
+        if options['state'] and os.path.exists(options['state']):
+            with open(options['state'], encoding='utf-8') as f:
+                state = json.load(f)
+        cursors = {feed: options['cursor'] or state.get(feed, '') for feed in feeds}
+        try:
+            for cursor in cursors.values():
+                decode_cursor(cursor)
+        except CursorError as e:
+            raise CommandError(str(e))
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else self.stdout
+        counts = {}
+        try:
+            for feed in feeds:
+                counts[feed] = 0
+                has_more = True
+                while has_more:
+                    changes, cursors[feed], has_more = read_changes(feed, cursors[feed], page_size)
+                    for change in changes:
+                        out.write(dumps({'feed': feed, **change}) + '\n')
+                    counts[feed] += len(changes)
+        finally:
+            if options['output']:
+                out.close()
+
+        if options['state']:
+            state.update(cursors)
+            with open(options['state'], 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+        summary = '、'.join(f'{feed} {count} 筆' for feed, count in counts.items())
+        self.stderr.write(self.style.SUCCESS(f'已輸出 {summary}'))
+        if not options['state'] and len(feeds) == 1:
+            self.stderr.write(f'下次從 cursor {cursors[feeds[0]]} 開始')
@@ -0,0 +1,18 @@
+# 重算銷售分析 cube
+# python manage.py refresh_sales_cube          只重算有異動的月份
+# python manage.py refresh_sales_cube --full   整個重建
+
+from django.core.management.base import BaseCommand
+
+from main.analytics import refresh_cube
+
+
+class Command(BaseCommand):
+    help = '重算銷售分析的彙總資料'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='整個重建，不只重算有異動的月份')
+
+    def handle(self, *args, **options):
+        months = refresh_cube(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'已重算 {months} 個月份'))
@@ -0,0 +1,20 @@
+# 分批寄出寄件匣裡到期的通知，失敗的會延後重試，可排程每幾分鐘執行
+# python manage.py send_notifications --batch-size 50
+
+from django.core.management.base import BaseCommand
+
+from main.notifications import MAX_ATTEMPTS, SEND_BATCH_SIZE, send_pending
+
+
+class Command(BaseCommand):
+    help = '寄出寄件匣裡的通知'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SEND_BATCH_SIZE, help='每批寄送的封數')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='最多嘗試幾次，超過標記為失敗')
+
+    def handle(self, *args, **options):
+        sent, failed = send_pending(options['batch_size'], options['max_attempts'])
+        self.stdout.write(self.style.SUCCESS(f'已寄出 {sent} 封'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} 封寄送失敗，稍後重試'))
@@ -0,0 +1,11 @@
+# main/managers.py
+# 共用的 model manager
+
+from django.db import models
+
+
+# 軟刪除 (tombstone)：deleted_at 有值代表已刪除、等待背景清除，一般查詢看不到
+# 需要包含已刪除資料時改用 model 上的 all_objects
+class LiveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# 既有的客戶、報價單各補一筆「建立」紀錄，之後的停留時間才有起點
+def seed_initial_transitions(apps, schema_editor):
+    StatusTransition = apps.get_model('main', 'StatusTransition')
+    sources = [
+        ('customer', apps.get_model('leads', 'PotentialCustomer')),
+        ('enquiry', apps.get_model('lead_enquiries', 'Enquiry')),
+    ]
+    for entity_type, model in sources:
+        batch = []
+        rows = model.objects.filter(deleted_at__isnull=True).values_list('pk', 'status', 'created_at')
+        for pk, status, created_at in rows.iterator(chunk_size=1000):
+            batch.append(StatusTransition(entity_type=entity_type, object_id=pk, from_status='',
+                                          to_status=status, changed_at=created_at))
+            if len(batch) >= 1000:
+                StatusTransition.objects.bulk_create(batch)
+                batch = []
+        StatusTransition.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        ('leads', '0006_archivedcustomer'),
+        ('lead_enquiries', '0006_archivedenquiry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dashboardgoal',
+            name='new_customer_target',
+            field=models.PositiveIntegerField(default=10, verbose_name='新成交客戶數目標'),
+        ),
+        migrations.CreateModel(
+            name='StatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('customer', '潛在客戶'), ('enquiry', '報價單')], max_length=20, verbose_name='資料類型')),
+                ('object_id', models.IntegerField(verbose_name='資料編號')),
+                ('from_status', models.CharField(blank=True, max_length=50, verbose_name='原狀態')),
+                ('to_status', models.CharField(max_length=50, verbose_name='新狀態')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='變更時間')),
+                ('seconds_in_from_status', models.BigIntegerField(blank=True, null=True, verbose_name='原狀態停留秒數')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='變更者')),
+            ],
+            options={
+                'verbose_name': '狀態變更紀錄',
+                'verbose_name_plural': '狀態變更紀錄',
+                'indexes': [models.Index(fields=['entity_type', 'changed_at'], name='transition_period_idx'), models.Index(fields=['entity_type', 'object_id', 'changed_at'], name='transition_object_idx')],
+            },
+        ),
+        migrations.RunPython(seed_initial_transitions, migrations.RunPython.noop),
+    ]
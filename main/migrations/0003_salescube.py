@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# 既有資料的月份全部標記為待更新，第一次重算時建立 cube
+def mark_existing_months(apps, schema_editor):
+    SalesCubeDirtyMonth = apps.get_model('main', 'SalesCubeDirtyMonth')
+    months = set()
+    for app_label, model_name in [('leads', 'PotentialCustomer'), ('lead_enquiries', 'Enquiry')]:
+        model = apps.get_model(app_label, model_name)
+        for created_at in model.objects.values_list('created_at', flat=True).iterator(chunk_size=2000):
+            months.add(timezone.localtime(created_at).date().replace(day=1))
+    SalesCubeDirtyMonth.objects.bulk_create([SalesCubeDirtyMonth(month=month) for month in months])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_statustransition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesCubeDirtyMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='月份')),
+            ],
+            options={
+                'verbose_name': '銷售分析待更新月份',
+                'verbose_name_plural': '銷售分析待更新月份',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesCubeCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(db_index=True, verbose_name='月份')),
+                ('country', models.CharField(blank=True, max_length=30, verbose_name='國家')),
+                ('company_type', models.CharField(blank=True, max_length=30, verbose_name='公司類型')),
+                ('industries', models.CharField(blank=True, max_length=100, verbose_name='產業別')),
+                ('leads', models.PositiveIntegerField(default=0, verbose_name='新增客戶數')),
+                ('quotes', models.PositiveIntegerField(default=0, verbose_name='報價數')),
+                ('won_quotes', models.PositiveIntegerField(default=0, verbose_name='成交報價數')),
+                ('quoted_ntd', models.FloatField(default=0, verbose_name='報價金額(NTD)')),
+                ('won_ntd', models.FloatField(default=0, verbose_name='成交金額(NTD)')),
+                ('salesperson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='業務人員')),
+            ],
+            options={
+                'verbose_name': '銷售分析彙總',
+                'verbose_name_plural': '銷售分析彙總',
+            },
+        ),
+        migrations.RunPython(mark_existing_months, migrations.RunPython.noop),
+    ]
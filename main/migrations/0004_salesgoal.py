@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_salescube'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesGoal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('monthly', '本月目標'), ('quarterly', '本季目標'), ('yearly', '年度目標')], max_length=10, verbose_name='統計週期')),
+                ('new_customer_target', models.PositiveIntegerField(default=0, verbose_name='新增客戶數目標')),
+                ('new_enquiry_target', models.PositiveIntegerField(default=0, verbose_name='新增報價數目標')),
+                ('enquiry_amount_target', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='新增報價總金額目標')),
+                ('success_amount_target', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='成交總金額目標')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_goals', to=settings.AUTH_USER_MODEL, verbose_name='業務人員')),
+            ],
+            options={
+                'verbose_name': '業務個人目標',
+                'verbose_name_plural': '業務個人目標',
+                'constraints': [models.UniqueConstraint(fields=('user', 'period'), name='unique_sales_goal_per_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_salesgoal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=30, verbose_name='通知類型')),
+                ('dedupe_key', models.CharField(max_length=200, unique=True, verbose_name='去重鍵')),
+                ('email', models.EmailField(max_length=254, verbose_name='收件信箱')),
+                ('subject', models.CharField(max_length=200, verbose_name='主旨')),
+                ('body', models.TextField(verbose_name='內容')),
+                ('status', models.CharField(choices=[('pending', '待寄送'), ('sent', '已寄送'), ('failed', '寄送失敗')], default='pending', max_length=10, verbose_name='狀態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='寄送次數')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次寄送時間')),
+                ('last_error', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='寄送時間')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='收件人')),
+            ],
+            options={
+                'verbose_name': '通知寄件匣',
+                'verbose_name_plural': '通知寄件匣',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='資料類型')),
+                ('object_id', models.BigIntegerField(verbose_name='資料編號')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='刪除時間')),
+            ],
+            options={
+                'verbose_name': '刪除紀錄',
+                'verbose_name_plural': '刪除紀錄',
+                'indexes': [models.Index(fields=['model', 'deleted_at', 'id'], name='deleted_record_feed_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesCubeState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='版本')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True, verbose_name='最後重算時間')),
+            ],
+            options={
+                'verbose_name': '銷售分析狀態',
+                'verbose_name_plural': '銷售分析狀態',
+            },
+        ),
+    ]
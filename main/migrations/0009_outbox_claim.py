@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_salescubestate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32, verbose_name='認領代碼'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', '待寄送'), ('sending', '寄送中'), ('sent', '已寄送'), ('failed', '寄送失敗')], default='pending', max_length=10, verbose_name='狀態'),
+        ),
+    ]
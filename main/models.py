@@ -1,6 +1,8 @@
 # main/models.py
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 class DashboardGoal(models.Model):
     PERIOD_CHOICES = [
@@ -29,4 +31,153 @@ class DashboardGoal(models.Model):
 
     class Meta:
         verbose_name = '儀表板目標設定'
-        verbose_name_plural = '儀表板目標設定'
\ No newline at end of file
+        verbose_name_plural = '儀表板目標設定'
+
+
+# 業務個人目標
+# 每位業務每個週期一筆，排行榜用來顯示各自的達成率 (整體目標仍是 DashboardGoal)
+class SalesGoal(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sales_goals', verbose_name='業務人員')
+    period = models.CharField(max_length=10, choices=DashboardGoal.PERIOD_CHOICES, verbose_name='統計週期')
+    new_customer_target = models.PositiveIntegerField(default=0, verbose_name='新增客戶數目標')
+    new_enquiry_target = models.PositiveIntegerField(default=0, verbose_name='新增報價數目標')
+    enquiry_amount_target = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='新增報價總金額目標')
+    success_amount_target = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='成交總金額目標')
+
+    class Meta:
+        verbose_name = '業務個人目標'
+        verbose_name_plural = '業務個人目標'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period'], name='unique_sales_goal_per_period'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.get_period_display()}'
+
+
+# 狀態變更紀錄
+# 客戶、報價單的狀態是直接覆寫的，這裡每次變更都新增一筆 (只新增不修改)，用來統計轉換率、各階段停留時間
+# 寫入時順便算好離開前一個狀態時已經停留了多久，報表只要一次GROUP BY (見transitions.py)
+class StatusTransition(models.Model):
+    ENTITY_CHOICES = [
+        ('customer', '潛在客戶'),
+        ('enquiry', '報價單'),
+    ]
+    entity_type = models.CharField(max_length=20, choices=ENTITY_CHOICES, verbose_name='資料類型')
+    object_id = models.IntegerField(verbose_name='資料編號')
+    from_status = models.CharField(max_length=50, blank=True, verbose_name='原狀態') # 空字串代表新建立
+    to_status = models.CharField(max_length=50, verbose_name='新狀態')
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name='變更時間')
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='變更者')
+    # 在原狀態停留的秒數，新建立時為空
+    seconds_in_from_status = models.BigIntegerField(null=True, blank=True, verbose_name='原狀態停留秒數')
+
+    class Meta:
+        verbose_name = '狀態變更紀錄'
+        verbose_name_plural = '狀態變更紀錄'
+        indexes = [
+            # 報表依期間篩選後依狀態分組
+            models.Index(fields=['entity_type', 'changed_at'], name='transition_period_idx'),
+            # 寫入時找同一筆資料的上一次變更
+            models.Index(fields=['entity_type', 'object_id', 'changed_at'], name='transition_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_entity_type_display()} {self.object_id}: {self.from_status or "-"} → {self.to_status}'
+
+
+# 銷售分析 cube
+# 依 業務 × 國家 × 公司類型 × 產業組合 × 月份 預先彙總好的數字，樞紐分析直接讀這張表 (見analytics.py)
+# 產業是多選欄位，這裡存排序後的組合字串 (例如 "automotive,medical")，依產業分組時才展開
+class SalesCubeCell(models.Model):
+    month = models.DateField(db_index=True, verbose_name='月份') # 每月1日
+    salesperson = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='業務人員')
+    country = models.CharField(max_length=30, blank=True, verbose_name='國家')
+    company_type = models.CharField(max_length=30, blank=True, verbose_name='公司類型')
+    industries = models.CharField(max_length=100, blank=True, verbose_name='產業別')
+    leads = models.PositiveIntegerField(default=0, verbose_name='新增客戶數')
+    quotes = models.PositiveIntegerField(default=0, verbose_name='報價數')
+    won_quotes = models.PositiveIntegerField(default=0, verbose_name='成交報價數')
+    quoted_ntd = models.FloatField(default=0, verbose_name='報價金額(NTD)')
+    won_ntd = models.FloatField(default=0, verbose_name='成交金額(NTD)')
+
+    class Meta:
+        verbose_name = '銷售分析彙總'
+        verbose_name_plural = '銷售分析彙總'
+
+
+# 需要重算的月份，客戶/報價/品項異動時標記，重算時取出並清除
+class SalesCubeDirtyMonth(models.Model):
+    month = models.DateField(unique=True, verbose_name='月份')
+
+    class Meta:
+        verbose_name = '銷售分析待更新月份'
+        verbose_name_plural = '銷售分析待更新月份'
+
+
+# 銷售分析 cube 的版本，只有一列
+# 每次重算完 +1，各程序比對這個版本號決定要不要重新讀取記憶體裡的 cube；重算時也鎖住這一列，避免多個程序同時重算
+class SalesCubeState(models.Model):
+    version = models.PositiveBigIntegerField(default=0, verbose_name='版本')
+    refreshed_at = models.DateTimeField(null=True, blank=True, verbose_name='最後重算時間')
+
+    class Meta:
+        verbose_name = '銷售分析狀態'
+        verbose_name_plural = '銷售分析狀態'
+
+
+# 通知寄件匣
+# 產生通知和寄信分開：排程指令只把通知寫進這裡，另一個指令再分批寄出 (見notifications.py)
+# dedupe_key 不可重複，同一則通知重跑也只會寄一次；寄送失敗會延後重試，超過次數標記為失敗
+class NotificationOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('pending', '待寄送'),
+        ('sending', '寄送中'),
+        ('sent', '已寄送'),
+        ('failed', '寄送失敗'),
+    ]
+    kind = models.CharField(max_length=30, verbose_name='通知類型')
+    dedupe_key = models.CharField(max_length=200, unique=True, verbose_name='去重鍵')
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name='收件人')
+    email = models.EmailField(verbose_name='收件信箱')
+    subject = models.CharField(max_length=200, verbose_name='主旨')
+    body = models.TextField(verbose_name='內容')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='狀態')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='寄送次數')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='下次寄送時間')
+    # 寄送指令先用一個 UPDATE 認領要寄的通知 (status=sending)，同時執行的另一個指令不會再寄一次
+    claim_token = models.CharField(max_length=32, blank=True, verbose_name='認領代碼')
+    last_error = models.TextField(blank=True, verbose_name='錯誤訊息')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='寄送時間')
+
+    class Meta:
+        verbose_name = '通知寄件匣'
+        verbose_name_plural = '通知寄件匣'
+        indexes = [
+            # 寄送指令依狀態找到期的通知
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.email}: {self.subject}'
+
+
+# 刪除紀錄 (tombstone)
+# 資料刪除後就查不到了，異動資料流 (見changes.py) 要靠這裡告訴下游哪些資料被刪掉
+# 一般刪除由 signals 寫入，直接 DELETE 的地方 (清除、封存) 由 lead_enquiries.purge.raw_delete_in_chunks 寫入
+class DeletedRecord(models.Model):
+    model = models.CharField(max_length=100, verbose_name='資料類型') # app_label.model_name
+    object_id = models.BigIntegerField(verbose_name='資料編號')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='刪除時間')
+
+    class Meta:
+        verbose_name = '刪除紀錄'
+        verbose_name_plural = '刪除紀錄'
+        indexes = [
+            # 異動資料流依 (刪除時間, 編號) 往後讀
+            models.Index(fields=['model', 'deleted_at', 'id'], name='deleted_record_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
@@ -0,0 +1,117 @@
+# main/notifications.py
+# 通知寄件匣的寫入和寄送
+# 通知一律在管理指令裡產生、寄送，不佔用網頁請求的時間；寄信走 Django 的 email backend (開發時為 console)
+# 寄送前先認領 (status=sending)，同時執行兩個寄送指令也不會重複寄出；
+# 指令中途結束留下的 sending 通知，超過 CLAIM_TIMEOUT 後會再被認領重寄
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+SEND_BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(minutes=5)
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+# 寫入一批通知，dedupe_key 已存在的會略過；回傳新寫入的筆數
+def enqueue_notifications(notifications):
+    keys = [notification.dedupe_key for notification in notifications]
+    existing = set(NotificationOutbox.objects.filter(dedupe_key__in=keys).values_list('dedupe_key', flat=True))
+    new = [notification for notification in notifications if notification.dedupe_key not in existing]
+    NotificationOutbox.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+# 第 n 次失敗後延後 5、10、20... 分鐘再重試
+def _retry_delay(attempts):
+    return RETRY_BASE_DELAY * (2 ** (attempts - 1))
+
+
+# 認領一批到期的通知：條件式 UPDATE 只會改到還沒被別人認領的，再用自己的認領代碼讀回來
+def _claim_batch(batch_size, now):
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', next_attempt_at__lte=now)
+    ids = list(NotificationOutbox.objects.filter(due).order_by('next_attempt_at', 'pk')
+               .values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    NotificationOutbox.objects.filter(due, pk__in=ids).update(status='sending', claim_token=token,
+                                                              next_attempt_at=now + CLAIM_TIMEOUT)
+    return list(NotificationOutbox.objects.filter(claim_token=token, status='sending').order_by('pk'))
+
+
+def _record_failure(notification, error, now, max_attempts):
+    notification.last_error = str(error)[:1000]
+    if notification.attempts >= max_attempts:
+        notification.status = 'failed'
+    else:
+        notification.status = 'pending'
+        notification.next_attempt_at = now + _retry_delay(notification.attempts)
+
+
+# 寄出一批到期的通知，整批共用一個 SMTP 連線；回傳 (寄出, 失敗, 認領筆數)
+def send_pending_batch(batch_size=SEND_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    now = timezone.now()
+    batch = _claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0, 0
+
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # 連不上郵件伺服器，整批都算一次失敗，延後重試
+        logger.exception('無法連線到郵件伺服器')
+        for notification in batch:
+            notification.attempts += 1
+            _record_failure(notification, e, now, max_attempts)
+        failed = batch
+    else:
+        try:
+            for notification in batch:
+                notification.attempts += 1
+                message = EmailMessage(notification.subject, notification.body, settings.DEFAULT_FROM_EMAIL,
+                                       [notification.email], connection=connection)
+                try:
+                    message.send()
+                except Exception as e:
+                    _record_failure(notification, e, now, max_attempts)
+                    failed.append(notification)
+                else:
+                    notification.status = 'sent'
+                    notification.sent_at = timezone.now()
+                    notification.last_error = ''
+                    sent.append(notification)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception('關閉郵件伺服器連線失敗')
+
+    for notification in batch:
+        notification.claim_token = ''
+    NotificationOutbox.objects.bulk_update(sent + failed, ['status', 'attempts', 'next_attempt_at', 'last_error',
+                                                           'sent_at', 'claim_token'])
+    return len(sent), len(failed), len(batch)
+
+
+# 一批一批寄到沒有到期的通知為止
+def send_pending(batch_size=SEND_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    total_sent = total_failed = 0
+    while True:
+        sent, failed, claimed = send_pending_batch(batch_size, max_attempts)
+        total_sent += sent
+        total_failed += failed
+        if claimed < batch_size:
+            return total_sent, total_failed
@@ -0,0 +1,44 @@
+# main/signals.py
+# 個人目標有異動時，讓排行榜的快取失效
+# 客戶、報價單等資料刪除時寫入刪除紀錄 (異動資料流用)
+# 新的操作紀錄即時推送給連線中的瀏覽器
+
+from django.contrib.admin.models import LogEntry
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from leads.models import Contacts, ContactLogs
+from .activity import activity_hub, build_event
+from .caching import bump_data_version
+from .changes import FEEDS, record_deletions
+from .leaderboard import GOALS_SCOPE
+from .models import SalesGoal
+
+
+@receiver([post_save, post_delete], sender=SalesGoal)
+def invalidate_goal_cache(sender, **kwargs):
+    bump_data_version(GOALS_SCOPE)
+
+
+# 異動資料流要知道哪些資料被刪除 (直接 DELETE 的地方由 raw_delete_in_chunks 記錄)
+def record_feed_deletion(sender, instance, **kwargs):
+    record_deletions(sender, [instance.pk])
+
+
+for feed_model, _ in FEEDS.values():
+    post_delete.connect(record_feed_deletion, sender=feed_model)
+
+
+# 刪除聯絡人時 Django 會用 UPDATE 把聯絡紀錄的聯絡人設為空，不會更新 updated_at，先在這裡更新
+@receiver(pre_delete, sender=Contacts)
+def touch_contact_logs(sender, instance, **kwargs):
+    ContactLogs.objects.filter(contact=instance).update(updated_at=timezone.now())
+
+
+# 同一個程序寫入的操作紀錄 commit 後直接推送；其他程序和 bulk_create 寫入的由 activity_hub 輪詢補送
+@receiver(post_save, sender=LogEntry)
+def publish_log_entry(sender, instance, created, **kwargs):
+    if created and activity_hub.has_subscribers():
+        transaction.on_commit(lambda: activity_hub.publish([build_event(instance)]))
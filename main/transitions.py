@@ -0,0 +1,121 @@
+# main/transitions.py
+# 狀態變更紀錄的寫入和報表
+# 報表 (漏斗、轉換、各階段停留時間) 都從同一個 GROUP BY (原狀態, 新狀態) 的查詢算出來，結果依期間快取
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from lead_enquiries.models import STATUS_CHOICES as ENQUIRY_STATUS_CHOICES
+from leads.models import PotentialCustomer
+from .caching import get_or_compute, LEADS_SCOPE, ENQUIRIES_SCOPE
+from .models import StatusTransition
+
+CUSTOMER = 'customer'
+ENQUIRY = 'enquiry'
+
+STATUS_CHOICES_BY_ENTITY = {
+    CUSTOMER: PotentialCustomer.STATUS_CHOICES,
+    ENQUIRY: ENQUIRY_STATUS_CHOICES,
+}
+# 狀態變更時客戶/報價單本身也會存檔，用同一個資料版本讓快取失效
+SCOPE_BY_ENTITY = {
+    CUSTOMER: LEADS_SCOPE,
+    ENQUIRY: ENQUIRIES_SCOPE,
+}
+
+
+# 記錄一次狀態變更，狀態沒變就不記
+# from_status 為空字串代表新建立；停留時間從同一筆資料的上一次變更 (沒有的話從建立時間) 算起
+def record_transition(entity_type, obj, from_status, to_status, user=None, changed_at=None):
+    if from_status == to_status:
+        return None
+    changed_at = changed_at or timezone.now()
+    seconds = None
+    if from_status:
+        entered_at = (StatusTransition.objects.filter(entity_type=entity_type, object_id=obj.pk)
+                      .order_by('-changed_at', '-pk').values_list('changed_at', flat=True).first()) or obj.created_at
+        seconds = max(int((changed_at - entered_at).total_seconds()), 0)
+    return StatusTransition.objects.create(
+        entity_type=entity_type,
+        object_id=obj.pk,
+        from_status=from_status or '',
+        to_status=to_status,
+        changed_at=changed_at,
+        changed_by=user if user is not None and user.is_authenticated else None,
+        seconds_in_from_status=seconds,
+    )
+
+
+# 批次記錄狀態變更 (批次修改狀態用)，rows 為 (物件編號, 原狀態, 建立時間)，狀態沒變的略過
+# 上一次變更時間用一個 GROUP BY 查詢取得，再一次 bulk_create 寫入
+def record_transitions(entity_type, rows, to_status, user=None, changed_at=None):
+    rows = [(pk, from_status, created_at) for pk, from_status, created_at in rows if from_status != to_status]
+    if not rows:
+        return []
+    changed_at = changed_at or timezone.now()
+    last_changed = dict(StatusTransition.objects
+                        .filter(entity_type=entity_type, object_id__in=[pk for pk, _, _ in rows])
+                        .values('object_id').annotate(last=Max('changed_at')).order_by()
+                        .values_list('object_id', 'last'))
+    changed_by = user if user is not None and user.is_authenticated else None
+    return StatusTransition.objects.bulk_create([
+        StatusTransition(
+            entity_type=entity_type,
+            object_id=pk,
+            from_status=from_status or '',
+            to_status=to_status,
+            changed_at=changed_at,
+            changed_by=changed_by,
+            seconds_in_from_status=(max(int((changed_at - (last_changed.get(pk) or created_at)).total_seconds()), 0)
+                                    if from_status else None),
+        )
+        for pk, from_status, created_at in rows
+    ], batch_size=500)
+
+
+def _compute_status_report(entity_type, start, end):
+    labels = dict(STATUS_CHOICES_BY_ENTITY[entity_type])
+    rows = (StatusTransition.objects
+            .filter(entity_type=entity_type, changed_at__range=(start, end))
+            .values('from_status', 'to_status')
+            .annotate(transitions=Count('pk'),
+                      objects=Count('object_id', distinct=True),
+                      timed=Count('seconds_in_from_status'),
+                      total_seconds=Sum('seconds_in_from_status'))
+            .order_by())
+
+    entered = {}   # 進入各狀態的次數
+    left = {}      # 離開各狀態的次數
+    stage_seconds = {}
+    stage_timed = {}
+    conversions = []
+    for row in rows:
+        entered[row['to_status']] = entered.get(row['to_status'], 0) + row['transitions']
+        if not row['from_status']:
+            continue
+        left[row['from_status']] = left.get(row['from_status'], 0) + row['transitions']
+        stage_seconds[row['from_status']] = stage_seconds.get(row['from_status'], 0) + (row['total_seconds'] or 0)
+        stage_timed[row['from_status']] = stage_timed.get(row['from_status'], 0) + row['timed']
+        conversions.append(row)
+
+    funnel = [{'status': value, 'label': label, 'entered': entered.get(value, 0)}
+              for value, label in STATUS_CHOICES_BY_ENTITY[entity_type]]
+    stages = [{'status': value, 'label': label, 'left': left.get(value, 0),
+               'avg_days': (stage_seconds[value] / stage_timed[value] / 86400) if stage_timed.get(value) else None}
+              for value, label in STATUS_CHOICES_BY_ENTITY[entity_type]]
+    # 轉換率：從某狀態離開的紀錄中，轉到各新狀態的比例
+    conversion_rows = [{
+        'from_label': labels.get(row['from_status'], row['from_status']),
+        'to_label': labels.get(row['to_status'], row['to_status']),
+        'transitions': row['transitions'],
+        'objects': row['objects'],
+        'rate': row['transitions'] / left[row['from_status']] * 100,
+    } for row in sorted(conversions, key=lambda r: (r['from_status'], -r['transitions']))]
+    return {'funnel': funnel, 'stages': stages, 'conversions': conversion_rows}
+
+
+# 期間內的狀態報表，period 只用來組成快取鍵 (同一期間的 end 每次都不同)
+def status_report(entity_type, period, start, end):
+    return get_or_compute('status_report', [SCOPE_BY_ENTITY[entity_type]],
+                          {'entity': entity_type, 'period': period, 'start': start.isoformat()},
+                          lambda: _compute_status_report(entity_type, start, end))
@@ -7,4 +7,8 @@ app_name = 'main'
 
 urlpatterns = [
     path('', views.dashboard, name='main'),
+    path('dashboard/<str:widget>/', views.dashboard_widget, name='dashboard_widget'),
+    path('reports/status/', views.status_report, name='status_report'),
+    path('reports/pivot/', views.sales_pivot, name='sales_pivot'),
+    path('activity/stream/', views.activity_stream, name='activity_stream'),
 ]
\ No newline at end of file
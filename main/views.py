@@ -1,12 +1,24 @@
 # main/views.py
 
+import asyncio
+import csv
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.utils.encoding import escape_uri_path
 from leads.models import PotentialCustomer
-from lead_enquiries.models import Enquiry
-from .models import DashboardGoal
-from django.db.models import Sum, Count, Q, F, ExpressionWrapper, FloatField
+from . import analytics, transitions
+from .activity import activity_hub, entries_after, format_event
+from .dashboard import WIDGETS
+from .transitions import CUSTOMER, STATUS_CHOICES_BY_ENTITY
+
+ACTIVITY_KEEPALIVE_SECONDS = 15
 
 
 # 根據傳入的週期字串，計算開始與結束日期
@@ -25,86 +37,154 @@ def get_date_range(period):
         end_date = timezone.now()
     return start_date, end_date
 
-# 儀錶板
+# 儀錶板 - 頁面只有外框，各區塊由瀏覽器向 dashboard_widget 載入
 @login_required
-def dashboard(request):
+async def dashboard(request):
     period = request.GET.get('period', 'monthly')
-    start_date, end_date = get_date_range(period)
-
-    goal, _ = DashboardGoal.objects.get_or_create(period=period)
-
-    customers_in_period = PotentialCustomer.objects.filter(created_at__range=(start_date, end_date))
-    enquiries_in_period = Enquiry.objects.filter(created_at__range=(start_date, end_date))
-
-    # 客戶區塊統計表
-    new_customers_count = customers_in_period.count()
-    inquired_customers_count = PotentialCustomer.objects.filter(created_at__range=(start_date, end_date),
-                                                                enquiries__isnull=False).distinct().count()
-    success_customers_count = PotentialCustomer.objects.filter(created_at__range=(start_date, end_date),
-                                                               enquiries__status='success').distinct().count()
-    pinned_customers = PotentialCustomer.objects.filter(is_pinned=True)
-
-    # 報價區塊統計表
-    new_enquiries_count = enquiries_in_period.count()
-
-    # 計算新增報價總額
-    new_enquiries_amount_agg = enquiries_in_period.aggregate(
-        total_ntd=Sum(
-            F('items__quantity') * F('items__unit_price') * F('items__exchange_rate'),
-            output_field=FloatField()
-        )
-    )
-    new_enquiries_amount = new_enquiries_amount_agg['total_ntd'] or 0
-
-    success_enquiries = enquiries_in_period.filter(status='success')
-    success_enquiries_count = success_enquiries.count()
-
-    # 計算成交報價總額
-    success_enquiries_amount_agg = success_enquiries.aggregate(
-        total_ntd=Sum(
-            F('items__quantity') * F('items__unit_price') * F('items__exchange_rate'),
-            output_field=FloatField()
-        )
-    )
-    success_enquiries_amount = success_enquiries_amount_agg['total_ntd'] or 0
-
-    pinned_enquiries = Enquiry.objects.filter(is_pinned=True)
-
-    # 百分比計算
-    try:
-        success_customers_percentage = (success_customers_count / goal.new_customer_target) * 100 if goal.new_customer_target > 0 else 0
-    except (TypeError, ZeroDivisionError):
-        success_customers_percentage = 0
-
-    try:
-        new_enquiries_amount_percentage = (float(new_enquiries_amount) / float(
-            goal.enquiry_amount_target)) * 100 if goal.enquiry_amount_target > 0 else 0
-    except (TypeError, ZeroDivisionError):
-        new_enquiries_amount_percentage = 0
+    # 樣板會用到 request.user 和 context processor (操作紀錄)，要在同步的 thread 裡 render
+    return await sync_to_async(render)(request, 'main/main.html', {'period': period})
 
-    try:
-        success_enquiries_amount_percentage = (float(success_enquiries_amount) / float(
-            goal.success_amount_target)) * 100 if goal.success_amount_target > 0 else 0
-    except (TypeError, ZeroDivisionError):
-        success_enquiries_amount_percentage = 0
+# 儀錶板的一個區塊，區塊內各統計同時查詢 (見dashboard.py)
+@login_required
+async def dashboard_widget(request, widget):
+    if widget not in WIDGETS:
+        raise Http404
+    period = request.GET.get('period', 'monthly')
+    start_date, end_date = get_date_range(period)
+    build_context, template_name = WIDGETS[widget]
+    context = await build_context(period, start_date, end_date)
+    context['period'] = period
+    html = await sync_to_async(render_to_string)(template_name, context)
+    return HttpResponse(html)
 
+# 狀態轉換報表：各狀態進入次數 (漏斗)、狀態間的轉換率、各狀態平均停留天數
+@login_required
+def status_report(request):
+    period = request.GET.get('period', 'monthly')
+    entity = request.GET.get('entity', CUSTOMER)
+    if entity not in STATUS_CHOICES_BY_ENTITY:
+        entity = CUSTOMER
+    start_date, end_date = get_date_range(period)
+    report = transitions.status_report(entity, period, start_date, end_date)
     context = {
         'period': period,
-        'goal': goal,
-        # 客戶數據
-        'new_customers_count': new_customers_count,
-        'inquired_customers_count': inquired_customers_count,
-        'success_customers_count': success_customers_count,
-        'pinned_customers': pinned_customers,
-        # 報價數據
-        'new_enquiries_count': new_enquiries_count,
-        'new_enquiries_amount': new_enquiries_amount,
-        'success_enquiries_count': success_enquiries_count,
-        'success_enquiries_amount': success_enquiries_amount,
-        'pinned_enquiries': pinned_enquiries,
-        # 百分比數據
-        'success_customers_percentage': success_customers_percentage,
-        'new_enquiries_amount_percentage': new_enquiries_amount_percentage,
-        'success_enquiries_amount_percentage': success_enquiries_amount_percentage,
+        'entity': entity,
+        'start_date': start_date,
+        'funnel': report['funnel'],
+        'stages': report['stages'],
+        'conversions': report['conversions'],
+    }
+    return render(request, 'main/status_report.html', context)
+
+# 樞紐分析各維度值的顯示名稱
+def _pivot_labels(dim, values):
+    if dim == 'salesperson':
+        names = dict(User.objects.filter(pk__in=values).values_list('pk', 'username'))
+        return [names.get(value, '(未指定)') for value in values]
+    choices = {
+        'country': dict(PotentialCustomer.CountryChoices.choices),
+        'company_type': dict(PotentialCustomer.COMPANY_TYPE_CHOICES),
+        'industry': dict(PotentialCustomer.INDUSTRY_CHOICES),
+    }.get(dim, {})
+    return [choices.get(value, value) or '(未填)' for value in values]
+
+# 銷售樞紐分析
+# 從預先彙總的cube計算，用numpy做切片、加總；有異動的月份由背景工作重算 (見analytics.py)，這裡只讀取
+@login_required
+def sales_pivot(request):
+    cube = analytics.get_cube()
+
+    row_dim = request.GET.get('rows', 'salesperson')
+    col_dim = request.GET.get('cols', 'month')
+    measure = request.GET.get('measure', 'quoted_ntd')
+    if row_dim not in analytics.DIMENSIONS:
+        row_dim = 'salesperson'
+    if col_dim not in analytics.DIMENSIONS or col_dim == row_dim:
+        col_dim = ''
+    if measure not in analytics.MEASURES:
+        measure = 'quoted_ntd'
+    today = timezone.localdate()
+    year, month = divmod(today.year * 12 + today.month - 12, 12)  # 預設最近12個月
+    default_from = f'{year}-{month + 1:02d}'
+    month_from = request.GET.get('from', default_from)
+    month_to = request.GET.get('to', '')
+    filters = {dim: request.GET.get(dim, '') for dim in ('salesperson', 'country', 'company_type', 'industry')}
+    if not filters['salesperson'].isdigit():
+        filters['salesperson'] = ''
+
+    result = cube.pivot(row_dim, col_dim, measure, filters, month_from, month_to)
+    row_labels = _pivot_labels(row_dim, result['rows'])
+    col_labels = _pivot_labels(col_dim, result['cols']) if col_dim else []
+    rows = list(zip(row_labels, result['matrix'], result['row_totals']))
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response.write('\ufeff')  # 加入 BOM，讓 Excel 正確辨識 UTF-8
+        filename = escape_uri_path(f"銷售分析_{analytics.MEASURES[measure]}_{timezone.now().date()}.csv")
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        writer = csv.writer(response)
+        writer.writerow([analytics.DIMENSIONS[row_dim]] + col_labels + ['總計'])
+        for label, values, total in rows:
+            writer.writerow([label] + [round(value, 2) for value in values] + [round(total, 2)])
+        writer.writerow(['總計'] + [round(value, 2) for value in result['col_totals']] + [round(result['total'], 2)])
+        return response
+
+    context = {
+        'dimensions': analytics.DIMENSIONS.items(),
+        'measures': analytics.MEASURES.items(),
+        'row_dim': row_dim,
+        'col_dim': col_dim,
+        'measure': measure,
+        'month_from': month_from,
+        'month_to': month_to,
+        'filters': filters,
+        'salesperson_options': User.objects.filter(is_active=True).order_by('username').values_list('pk', 'username'),
+        'country_options': PotentialCustomer.CountryChoices.choices,
+        'company_type_options': PotentialCustomer.COMPANY_TYPE_CHOICES,
+        'industry_options': PotentialCustomer.INDUSTRY_CHOICES,
+        'col_labels': col_labels,
+        'rows': rows,
+        'col_totals': result['col_totals'],
+        'total': result['total'],
+        'is_amount': measure.endswith('_ntd'),
+        'csv_query': request.GET.urlencode(),
     }
-    return render(request, 'main/main.html', context)
\ No newline at end of file
+    context['refreshed_at'], context['pending_months'] = analytics.cube_status()
+    return render(request, 'main/sales_pivot.html', context)
+
+
+# SSE 事件流：連線期間持續送出新的操作紀錄，閒置時定期送註解行保持連線
+# 瀏覽器斷線重連時會帶 Last-Event-ID，先補送中間漏掉的操作紀錄
+async def _activity_events(queue, backlog):
+    try:
+        for event in backlog:
+            yield format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), ACTIVITY_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        activity_hub.unsubscribe(queue)
+
+
+# 操作紀錄即時推送 (見activity.py)，需以 ASGI 執行 (例如 uvicorn)
+# WSGI 下一個連線會一直佔住一個 worker，回傳 204 讓瀏覽器不再重連，操作紀錄視窗維持頁面載入時的內容
+@login_required
+async def activity_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    after = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    # 先訂閱再補送，中間寫入的操作紀錄不會漏掉 (重複的由瀏覽器依編號略過)
+    queue = activity_hub.subscribe(asyncio.get_running_loop())
+    try:
+        backlog = await sync_to_async(entries_after)(int(after)) if after and after.isdigit() else []
+    except Exception:
+        activity_hub.unsubscribe(queue)
+        raise
+    response = StreamingHttpResponse(_activity_events(queue, backlog), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # nginx 不要緩衝，事件才會馬上送到瀏覽器
+    return response